@@ -0,0 +1,362 @@
+"""
+Пакетная обработка файлов клиентов без интерфейса:
+загрузка → предобработка → кластеризация → экспорт меток.
+
+Каждый файл обрабатывается в отдельном процессе пула. Вместо диалогов
+способы обработки пропусков и выбросов задаются флагами. Для каждого файла
+в выходном каталоге создаются CSV с меткой кластера и журнал обработки,
+а по всему пакету — отчёт о времени этапов.
+
+Примеры:
+    python batch_cli.py exports/ --output-dir results --method kmeans --clusters 5 --workers 8
+    python batch_cli.py a.csv b.xlsx --nan-policy drop --outlier-policy remove --save-model
+    python batch_cli.py exports/ --incremental   # еженедельное обновление по дописанным строкам
+    python batch_cli.py big.csv --method ensemble --runs 16 --selection silhouette --workers 1
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+METHODS = ('kmeans', 'ensemble', 'coreset', 'minibatch', 'streaming', 'dbscan', 'som')
+STAGES = ('import', 'load', 'preprocess', 'reduce', 'cluster', 'silhouette', 'export', 'model')
+REPORT_FIELDS = ['file', 'status', 'error', 'mode', 'rows', 'new_rows', 'kept_rows', 'clusters', 'noise', 'silhouette', 'seconds'] + \
+                [f'{stage}_seconds' for stage in STAGES] + ['output']
+
+# Переменные окружения, ограничивающие число потоков BLAS/OpenMP в одном процессе
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def find_input_files(paths, patterns=('*.csv', '*.xlsx')):
+    """
+    Файлы для обработки: перечисленные явно и найденные в каталогах по шаблонам.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in patterns:
+                files.extend(glob.glob(os.path.join(path, pattern)))
+        else:
+            files.append(path)
+    return sorted(dict.fromkeys(os.path.abspath(path) for path in files))
+
+
+def output_paths(file_path, output_dir):
+    # Метки, модель и журнал файла называются по имени исходного файла
+    base = os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0])
+    return {'labels': base + '_clusters.csv', 'model': base + '_model.npz', 'log': base + '.log',
+            'incremental': base + '_incremental.npz'}
+
+
+def id_column(data):
+    # Идентификатор клиента для поиска новых строк; без него строки сравниваются по всем значениям
+    from data_processing import ID_COLUMNS
+    return next((col for col in ID_COLUMNS if col in data.columns), None)
+
+
+def init_worker(threads):
+    # Вызывается в каждом процессе пула до импорта numpy, чтобы процессы не делили ядра между собой
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+
+def cluster_labels(clustering, method, scaled_data, options):
+    import numpy as np
+
+    if method == 'kmeans':
+        return clustering.kmeans_clustering(scaled_data, options['clusters'])
+    if method == 'ensemble':
+        return clustering.ensemble_clustering(
+            scaled_data, options['clusters'], n_runs=options['runs'], algorithms=options['ensemble_algorithms'],
+            selection=options['selection'], n_jobs=options['ensemble_jobs'],
+        )
+    if method == 'coreset':
+        return clustering.coreset_kmeans_clustering(scaled_data, options['clusters'], coreset_size=options['coreset_size'])
+    if method == 'minibatch':
+        return clustering.mini_batch_kmeans_clustering(scaled_data, options['clusters'], batch_size=options['batch_size'])
+    if method == 'dbscan':
+        return clustering.dbscan_clustering(scaled_data, options['eps'], options['min_samples'])
+    positions = clustering.som_clustering(scaled_data, options['som_size'], options['som_iterations'])
+    # Метки SOM — номера занятых узлов, как в интерфейсе
+    _, labels = np.unique(positions, axis=0, return_inverse=True)
+    return labels.ravel()
+
+
+def write_streamed_labels(loader, file_path, labels, output_path):
+    # Строки исходного файла читаются повторно порциями и дополняются меткой из memmap
+    offset = 0
+    for chunk in loader.iter_chunks(file_path):
+        chunk = chunk.assign(Cluster=labels[offset:offset + len(chunk)])
+        chunk.to_csv(output_path, mode='w' if offset == 0 else 'a', header=(offset == 0), index=False)
+        offset += len(chunk)
+
+
+def run_pipeline(file_path, options, paths, timer, record):
+    # Библиотеки загружаются в рабочем процессе (после init_worker); время учитывается отдельно
+    with timer.stage('import'):
+        import numpy as np
+        from clustering import Clustering
+        from data_processing import DataProcessor
+
+    processor = DataProcessor(cache_size=0, dataset_cache=None if options['cache'] else False,
+                              low_memory=options['low_memory'], interactive=False)
+    clustering = Clustering()
+    method = options['method']
+
+    def failure(default):
+        messages = processor.messagebox.errors or processor.messagebox.warnings
+        return RuntimeError(messages[-1] if messages else default)
+
+    # Состояние прошлого запуска: обновляются только центры по дописанным строкам
+    incremental = None
+    if options['incremental'] and os.path.exists(paths['incremental']):
+        from incremental import IncrementalClustering
+        incremental = IncrementalClustering.load(paths['incremental'])
+
+    if method == 'streaming':
+        if not file_path.endswith('.csv'):
+            raise ValueError("Потоковый K-Means поддерживает только CSV")
+        loader = processor.streaming_loader
+        with timer.stage('cluster'):
+            streamed = clustering.streaming_kmeans_clustering(
+                file_path, options['clusters'], loader, n_passes=options['passes'],
+                labels_path=loader.temp_path('.npy'),
+            )
+        labels = streamed['labels']
+        record.update(rows=len(labels), kept_rows=len(labels))
+        scaled_data, silhouette_labels = streamed['sample_data'], streamed['sample_labels']
+    else:
+        with timer.stage('load'):
+            data = processor.load_data(file_path)
+        if data is None:
+            raise failure("Не удалось загрузить файл")
+        if incremental is not None:
+            with timer.stage('cluster'):
+                labels, row_mask, report = incremental.update(data, drift_tolerance=options['drift_tolerance'])
+            labels = labels[row_mask]
+            record.update(rows=len(data), kept_rows=int(row_mask.sum()), new_rows=report['new_rows'],
+                          mode='incremental+refit' if report['refined'] else 'incremental')
+            scaled_data = incremental.state.transform(data)[0][row_mask] if options['silhouette'] else None
+            silhouette_labels = labels
+        else:
+            with timer.stage('preprocess'):
+                scaled_data, _, row_mask = processor.preprocess_data(
+                    data, nan_policy=options['nan_policy'], outlier_policy=options['outlier_policy'],
+                    outlier_rule=options['outlier_rule'],
+                )
+            if scaled_data is None:
+                raise failure("Ошибка предобработки")
+            if options['reduction']:
+                with timer.stage('reduce'):
+                    scaled_data = clustering.reduce_dimensions(scaled_data, options['reduction'])
+            with timer.stage('cluster'):
+                labels = cluster_labels(clustering, method, scaled_data, options)
+            record.update(rows=len(data), kept_rows=int(row_mask.sum()), new_rows=len(data), mode='full')
+            silhouette_labels = labels
+            if options['incremental']:
+                from incremental import IncrementalClustering
+                incremental = IncrementalClustering.start(
+                    data, scaled_data, row_mask, processor.last_state, labels, clustering.last_fit['centers'],
+                    id_column=id_column(data), method=method,
+                )
+
+    unique = np.unique(labels)
+    record['clusters'] = int(np.sum(unique >= 0))
+    record['noise'] = int(np.sum(labels == -1))
+    if options['silhouette'] and record['clusters'] > 1 and record['noise'] == 0:
+        with timer.stage('silhouette'):
+            silhouette = clustering.estimate_silhouette(scaled_data, silhouette_labels)
+        record['silhouette'] = round(float(silhouette['score']), 4)
+
+    with timer.stage('export'):
+        if method == 'streaming':
+            write_streamed_labels(processor.streaming_loader, file_path, labels, paths['labels'])
+        else:
+            processor.save_with_clusters(data, row_mask, labels, paths['labels'])
+    record['output'] = paths['labels']
+
+    if incremental is not None:
+        with timer.stage('model'):
+            incremental.save(paths['incremental'])
+    if options['save_model']:
+        with timer.stage('model'):
+            if incremental is not None:
+                model = incremental.to_model(method=method, source=file_path)
+            else:
+                model = clustering.export_model(processor.last_state, reduction=clustering.reduction,
+                                                method=method, source=file_path)
+            model.save(paths['model'])
+
+
+def process_file(file_path, options):
+    """
+    Обработка одного файла в рабочем процессе. Возвращает строку отчёта;
+    исключения не выходят наружу, а записываются в отчёт и журнал файла.
+    """
+    paths = output_paths(file_path, options['output_dir'])
+    record = {field: '' for field in REPORT_FIELDS}
+    record.update(file=file_path, status='ok')
+    timer = StageTimer()
+    started = time.perf_counter()
+    with open(paths['log'], 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            run_pipeline(file_path, options, paths, timer, record)
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=log)
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    for stage, seconds in timer.timings.items():
+        record[f'{stage}_seconds'] = round(seconds, 3)
+    return record
+
+
+def is_up_to_date(file_path, output_dir):
+    labels_path = output_paths(file_path, output_dir)['labels']
+    return os.path.exists(labels_path) and os.path.getmtime(labels_path) >= os.path.getmtime(file_path)
+
+
+def write_report(records, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def run_batch(files, options, workers):
+    """
+    Обработка файлов пулом из workers процессов (1 — в текущем процессе).
+    Крупные файлы запускаются первыми, чтобы пакет не ждал один долгий файл в конце.
+    """
+    files = sorted(files, key=os.path.getsize, reverse=True)
+    records = []
+
+    def report(record):
+        records.append(record)
+        status = "готово" if record['status'] == 'ok' else f"ошибка — {record['error']}"
+        print(f"[{len(records)}/{len(files)}] {os.path.basename(record['file'])}: {status}, {record['seconds']:.1f} с")
+
+    if workers <= 1:
+        for file_path in files:
+            report(process_file(file_path, options))
+        return records
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(process_file, file_path, options): file_path for file_path in files}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # Процесс завершился аварийно (например, нехватка памяти)
+                record = {field: '' for field in REPORT_FIELDS}
+                record.update(file=futures[future], status='error', error=f"{type(e).__name__}: {e}", seconds=0.0)
+            report(record)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная кластеризация файлов клиентов без интерфейса")
+    parser.add_argument('inputs', nargs='+', help="Файлы CSV/XLSX или каталоги с ними")
+    parser.add_argument('--output-dir', default='batch_results', help="Каталог для меток, моделей и отчёта")
+    parser.add_argument('--pattern', default='*.csv,*.xlsx', help="Шаблоны файлов в каталогах через запятую")
+    parser.add_argument('--method', choices=METHODS, default='kmeans')
+    parser.add_argument('--clusters', type=int, default=5, help="Количество кластеров (K-Means)")
+    parser.add_argument('--coreset-size', type=int, default=20000, help="Строк в coreset (K-Means по coreset)")
+    parser.add_argument('--runs', type=int, default=8, help="Запусков с разными seed (ансамбль K-Means)")
+    parser.add_argument('--selection', choices=('inertia', 'silhouette', 'calinski_harabasz', 'davies_bouldin'),
+                        default='inertia', help="Критерий выбора лучшего запуска (ансамбль K-Means)")
+    parser.add_argument('--with-minibatch', action='store_true',
+                        help="Добавить в ансамбль столько же запусков MiniBatch K-Means")
+    parser.add_argument('--batch-size', type=int, default=4096, help="Размер мини-пакета (MiniBatch K-Means)")
+    parser.add_argument('--passes', type=int, default=3, help="Проходов по файлу (потоковый K-Means)")
+    parser.add_argument('--eps', type=float, default=0.5, help="Радиус соседства (DBSCAN)")
+    parser.add_argument('--min-samples', type=int, default=5, help="Минимум соседей (DBSCAN)")
+    parser.add_argument('--som-size', type=int, default=10, help="Размер карты (SOM)")
+    parser.add_argument('--som-iterations', type=int, default=10, help="Эпох обучения (SOM)")
+    parser.add_argument('--nan-policy', choices=('median', 'drop'), default='median',
+                        help="Пропуски: заполнить медианой или удалить строки")
+    parser.add_argument('--outlier-policy', choices=('cap', 'remove'), default='cap',
+                        help="Выбросы: ограничить пороговыми значениями или удалить строки")
+    parser.add_argument('--outlier-rule', choices=('zscore', 'iqr', 'mad'), default='zscore',
+                        help="Правило поиска выбросов: Z-оценка, межквартильный размах или медианное отклонение")
+    parser.add_argument('--silhouette', action='store_true', help="Оценить коэффициент силуэта")
+    parser.add_argument('--save-model', action='store_true', help="Сохранить модель для оценки новых данных")
+    parser.add_argument('--low-memory', action='store_true', help="Режим экономии памяти (float32, потоковое чтение)")
+    parser.add_argument('--no-cache', action='store_true', help="Не использовать дисковый кэш разобранных файлов")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Процессов в пуле")
+    parser.add_argument('--incremental', action='store_true',
+                        help="K-Means: при повторном запуске дообучать центры по дописанным строкам")
+    parser.add_argument('--drift-tolerance', type=float, default=0.1,
+                        help="Допустимый рост инерции на новых строках до уточнения K-Means по всем строкам")
+    parser.add_argument('--reduction', choices=('pca', 'randomized_pca', 'random_projection'),
+                        help="Снизить размерность перед кластеризацией (PCA до 95%% дисперсии или случайная проекция)")
+    parser.add_argument('--skip-existing', action='store_true', help="Пропускать файлы с актуальными метками")
+    parser.add_argument('--report', help="Путь к отчёту CSV (по умолчанию batch_report.csv в выходном каталоге)")
+    args = parser.parse_args(argv)
+
+    if args.incremental and args.method not in ('kmeans', 'ensemble', 'coreset', 'minibatch'):
+        parser.error("Инкрементальный режим поддерживается только для kmeans, ensemble, coreset и minibatch")
+    if args.reduction and (args.incremental or args.method == 'streaming'):
+        parser.error("Снижение размерности не поддерживается в инкрементальном и потоковом режимах")
+    files = find_input_files(args.inputs, [pattern for pattern in args.pattern.split(',') if pattern])
+    if not files:
+        parser.error("Не найдено файлов для обработки")
+    names = [os.path.splitext(os.path.basename(path))[0] for path in files]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        parser.error(f"Файлы с одинаковыми именами перезапишут результаты друг друга: {', '.join(duplicates)}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.skip_existing:
+        skipped = [path for path in files if is_up_to_date(path, args.output_dir)]
+        files = [path for path in files if path not in skipped]
+        print(f"Пропущено файлов с актуальными метками: {len(skipped)}")
+
+    options = {
+        'output_dir': args.output_dir, 'method': args.method, 'clusters': args.clusters,
+        'coreset_size': args.coreset_size, 'batch_size': args.batch_size, 'passes': args.passes,
+        'eps': args.eps, 'min_samples': args.min_samples,
+        'som_size': args.som_size, 'som_iterations': args.som_iterations, 'nan_policy': args.nan_policy,
+        'outlier_policy': args.outlier_policy, 'outlier_rule': args.outlier_rule,
+        'silhouette': args.silhouette, 'save_model': args.save_model,
+        'low_memory': args.low_memory, 'cache': not args.no_cache,
+        'incremental': args.incremental, 'drift_tolerance': args.drift_tolerance, 'reduction': args.reduction,
+        'runs': args.runs, 'selection': args.selection,
+        'ensemble_algorithms': ('kmeans', 'minibatch') if args.with_minibatch else ('kmeans',),
+    }
+    workers = max(1, min(args.workers, len(files)))
+    # Запуски ансамбля параллельны только при одном процессе пакета, иначе ядра уже заняты файлами
+    options['ensemble_jobs'] = -1 if workers == 1 else 1
+    print(f"Файлов: {len(files)}, процессов: {workers}, метод: {args.method}")
+    started = time.perf_counter()
+    records = run_batch(files, options, workers)
+    elapsed = time.perf_counter() - started
+
+    report_path = args.report or os.path.join(args.output_dir, 'batch_report.csv')
+    write_report(sorted(records, key=lambda record: record['file']), report_path)
+    failed = sum(record['status'] != 'ok' for record in records)
+    busy = sum(record['seconds'] or 0.0 for record in records)
+    print(f"Готово за {elapsed:.1f} с (сумма по файлам {busy:.1f} с): успешно {len(records) - failed}, "
+          f"с ошибками {failed}. Отчёт: {report_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Бенчмарки этапов обработки на синтетических данных о клиентах.
+
+Для каждого размера набора данных измеряются время и пик памяти (RSS) этапов:
+загрузка (с дисковым кэшем и без), предобработка, K-Means, ансамбль K-Means, MiniBatch K-Means,
+потоковый K-Means, DBSCAN, SOM, перебор k (метод локтя), коэффициент силуэта
+и построение диаграммы кластеров. Результаты сохраняются в JSON и могут
+сравниваться с базовой линией, записанной на той же машине с теми же версиями
+библиотек (базовая линия в репозиторий не входит: её записывают локально).
+
+Примеры (из корня репозитория):
+    python -m benchmarks.run_benchmarks --scales 10k,100k,1M --output results.json
+    python -m benchmarks.run_benchmarks --scales 10k,100k --output baseline.json
+    python -m benchmarks.run_benchmarks --scales 10k,100k --baseline baseline.json
+    python -m benchmarks.run_benchmarks --compare-only results.json --baseline baseline.json
+    python -m benchmarks.run_benchmarks --scales 100k --trace trace.json
+    python -m benchmarks.run_benchmarks --scales 100k --features 200 --reduction pca,random_projection
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+import sklearn
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SyntheticSpec, ensure_csv  # noqa: E402
+from clustering import Clustering  # noqa: E402
+from coreset import approximation_report  # noqa: E402
+from data_processing import DataProcessor  # noqa: E402
+from dataset_cache import DatasetCache  # noqa: E402
+from instrumentation import TRACER  # noqa: E402
+from memory import MemoryTracker  # noqa: E402
+from reduction import REDUCTION_METHODS  # noqa: E402
+from visualization import FigureManager, Visualization  # noqa: E402
+
+STAGES = ('load', 'load_cached', 'preprocess', 'kmeans', 'ensemble_kmeans', 'coreset_kmeans', 'minibatch_kmeans', 'streaming_kmeans',
+          'dbscan', 'som', 'elbow', 'coreset_elbow', 'silhouette', 'render')
+
+# Наибольший размер данных, на котором этап запускается по умолчанию (None — без ограничения)
+DEFAULT_LIMITS = {
+    'kmeans': 5000000,
+    'ensemble_kmeans': 2000000,
+    'dbscan': 100000,
+    'som': 2000000,
+    'elbow': 1000000,
+}
+
+# Этапы, которые повторяются на данных сниженной размерности (--reduction) как «этап@способ»
+REDUCED_STAGES = ('kmeans', 'ensemble_kmeans', 'coreset_kmeans', 'minibatch_kmeans', 'dbscan', 'som', 'elbow', 'coreset_elbow',
+                  'silhouette', 'render')
+
+# Поля meta, которые должны совпадать у результатов и базовой линии
+ENVIRONMENT_KEYS = ('machine', 'cpu_model', 'cpu_count', 'python', 'numpy', 'pandas', 'sklearn')
+
+
+class OffscreenFigures(FigureManager):
+    """
+    Менеджер фигур без Tk: графики рисуются во внеэкранный холст Agg.
+    """
+
+    def axes(self, frame, canvas_attr):
+        canvas = self.canvases.get((frame, canvas_attr))
+        if canvas is None:
+            canvas = FigureCanvasAgg(Figure(figsize=self.figsize))
+            self.canvases[(frame, canvas_attr)] = canvas
+        fig = canvas.figure
+        fig.clear()
+        return fig, fig.add_subplot()
+
+
+def cpu_model():
+    # Модель процессора: platform.processor() в Linux обычно пуст, тогда берётся /proc/cpuinfo
+    model = platform.processor()
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return model
+
+
+def parse_scale(text):
+    multipliers = {'k': 1000, 'm': 1000000}
+    text = text.strip().lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+class BenchmarkRunner:
+    def __init__(self, work_dir, repeat=1, limits=None, n_clusters=5, spec_options=None, coreset_size=20000,
+                 reductions=(), ensemble_runs=8):
+        self.work_dir = work_dir
+        self.ensemble_runs = ensemble_runs
+        self.coreset_size = coreset_size
+        self.reductions = reductions
+        self.repeat = repeat
+        self.limits = DEFAULT_LIMITS if limits is None else limits
+        self.n_clusters = n_clusters
+        self.spec_options = spec_options or {}
+        self.memory = MemoryTracker()
+        self.results = []
+
+    def measure(self, rows, stage, func):
+        """
+        Запуск этапа repeat раз: минимальное время и наибольший прирост памяти.
+        func вызывается заново для каждого повтора (с новыми объектами, без кэшей в памяти).
+        """
+        records = []
+        value = None
+        for _ in range(self.repeat):
+            with self.memory.stage(f'{stage} ({rows})'):
+                value = func()
+            records.append(self.memory.stages[-1])
+        mb = 1024 ** 2
+        self.results.append({
+            'rows': rows,
+            'stage': stage,
+            'seconds': min(record['seconds'] for record in records),
+            'peak_mb': max(record['peak'] for record in records) / mb,
+            'delta_mb': max(record['peak'] - record['start'] for record in records) / mb,
+        })
+        return value
+
+    def skipped(self, rows, stage, reason):
+        print(f"{stage} ({rows}): пропущен — {reason}")
+        self.results.append({'rows': rows, 'stage': stage, 'skipped': reason})
+
+    def run_scale(self, rows, stages):
+        spec = SyntheticSpec(rows, n_clusters=self.n_clusters, **self.spec_options)
+        path = ensure_csv(spec, self.work_dir)
+        cache_dir = os.path.join(self.work_dir, 'dataset_cache')
+
+        def processor(**kwargs):
+            return DataProcessor(cache_size=0, dataset_cache=False, interactive=False, **kwargs)
+
+        if 'load' in stages:
+            data = self.measure(rows, 'load', lambda: processor().load_data(path))
+        else:
+            data = processor().load_data(path)
+        if 'load_cached' in stages:
+            cached_processor = processor()
+            cached_processor.dataset_cache = DatasetCache(cache_dir)
+            cached_processor.load_data(path)  # Заполнение кэша
+            self.measure(rows, 'load_cached', lambda: cached_processor.load_data(path))
+
+        def preprocess():
+            return processor().preprocess_data(data, nan_policy='median', outlier_policy='cap')
+
+        scaled_data, columns, _ = self.measure(rows, 'preprocess', preprocess) if 'preprocess' in stages \
+            else preprocess()
+        if 'streaming_kmeans' in stages and not self.over_limit(rows, 'streaming_kmeans'):
+            loader = processor().streaming_loader
+            self.measure(rows, 'streaming_kmeans', lambda: Clustering().streaming_kmeans_clustering(
+                path, self.n_clusters, loader, n_passes=2, labels_path=loader.temp_path('.npy')))
+        self.run_clustering_stages(rows, stages, scaled_data, columns)
+
+        for method in self.reductions:
+            # Те же этапы на данных сниженной размерности; время снижения — отдельный этап
+            reducer = Clustering()
+            reduced = self.measure(rows, f'reduce@{method}', lambda: reducer.reduce_dimensions(scaled_data, method))
+            print(f"{method}: {reducer.reduction.describe()}")
+            self.results[-1]['components'] = reducer.reduction.n_components
+            reduced_stages = [stage for stage in stages if stage in REDUCED_STAGES]
+            self.run_clustering_stages(rows, reduced_stages, reduced, columns, f'@{method}', reducer.reduction)
+
+    def over_limit(self, rows, stage):
+        limit = self.limits.get(stage.split('@')[0])
+        if limit is not None and rows > limit:
+            self.skipped(rows, stage, f'больше {limit} строк')
+            return True
+        return False
+
+    def run_clustering_stages(self, rows, stages, scaled_data, columns, suffix='', reduction=None):
+        """
+        Этапы кластеризации, перебора k, силуэта и отрисовки на готовой матрице;
+        suffix добавляется к имени этапа (для данных сниженной размерности).
+        """
+        labels = None
+        # Центры полного K-Means — эталон для оценки погрешности coreset
+        full_fit = Clustering()
+
+        for stage in stages:
+            if stage in ('load', 'load_cached', 'preprocess', 'streaming_kmeans'):
+                continue
+            name = stage + suffix
+            if self.over_limit(rows, name):
+                continue
+            if stage == 'kmeans':
+                labels = self.measure(rows, name, lambda: full_fit.kmeans_clustering(scaled_data, self.n_clusters))
+            elif stage == 'ensemble_kmeans':
+                ensemble_fit = Clustering()
+                self.measure(rows, name, lambda: ensemble_fit.ensemble_clustering(
+                    scaled_data, self.n_clusters, n_runs=self.ensemble_runs))
+                self.ensemble_spread(ensemble_fit.last_ensemble)
+            elif stage == 'coreset_kmeans':
+                coreset_fit = Clustering()
+                self.measure(rows, name, lambda: coreset_fit.coreset_kmeans_clustering(
+                    scaled_data, self.n_clusters, coreset_size=self.coreset_size))
+                if full_fit.last_fit is not None:
+                    self.coreset_error(coreset_fit.last_fit['centers'], full_fit.last_fit['centers'], scaled_data)
+            elif stage == 'minibatch_kmeans':
+                self.measure(rows, name, lambda: Clustering().mini_batch_kmeans_clustering(
+                    scaled_data, self.n_clusters, batch_size=4096))
+            elif stage == 'dbscan':
+                self.measure(rows, name, lambda: Clustering().dbscan_clustering(scaled_data, eps=0.5, min_samples=10))
+            elif stage == 'som':
+                self.measure(rows, name, lambda: Clustering().som_clustering(scaled_data, som_size=10, iterations=10))
+            elif stage == 'elbow':
+                self.measure(rows, name, lambda: Clustering().calculate_elbow_method(
+                    scaled_data, k_range=range(2, 9), n_jobs=1))
+            elif stage == 'coreset_elbow':
+                self.measure(rows, name, lambda: Clustering().calculate_elbow_method(
+                    scaled_data, k_range=range(2, 9), n_jobs=1, coreset_size=self.coreset_size))
+            elif stage in ('silhouette', 'render'):
+                if labels is None:
+                    labels = Clustering().mini_batch_kmeans_clustering(scaled_data, self.n_clusters, batch_size=4096)
+                if stage == 'silhouette':
+                    self.measure(rows, name, lambda: Clustering().estimate_silhouette(scaled_data, labels))
+                else:
+                    self.measure(rows, name, lambda: self.render(scaled_data, labels, columns, reduction))
+
+    def coreset_error(self, centers, reference_centers, scaled_data):
+        # Погрешность coreset относительно полного K-Means дописывается к результату этапа
+        report = approximation_report(scaled_data, centers, reference_centers)
+        self.results[-1].update(relative_error=report['relative_error'], ari=report['ari'])
+        print(f"coreset_kmeans: inertia {report['inertia']:.1f} против {report['reference_inertia']:.1f} "
+              f"({report['relative_error']:+.2%}), ARI {report['ari']:.4f}")
+
+    def ensemble_spread(self, report):
+        # Разброс inertia по seed и наименьшее согласие с лучшим запуском дописываются к результату этапа
+        self.results[-1].update(best_inertia=report['best']['inertia'], worst_inertia=report['inertia']['max'],
+                                min_ari_to_best=report['ari_to_best']['min'])
+
+    def render(self, scaled_data, labels, columns, reduction=None):
+        visualization = Visualization()
+        visualization.figures = OffscreenFigures()
+        visualization.visualize_clusters(scaled_data, labels, columns, None, 'canvas', reduction=reduction)
+
+    def reduction_summary(self):
+        """
+        Время этапов до и после снижения размерности для каждого размера данных и способа.
+        """
+        seconds = {(r['rows'], r['stage']): r['seconds'] for r in self.results if 'skipped' not in r}
+        lines = [f"{'этап':<18}{'способ':<20}{'строк':>10}{'без, с':>10}{'с, с':>10}{'×':>7}"]
+        for (rows, stage), reduced in seconds.items():
+            base_stage, _, method = stage.partition('@')
+            if not method or base_stage == 'reduce' or (rows, base_stage) not in seconds:
+                continue
+            full = seconds[(rows, base_stage)]
+            lines.append(f"{base_stage:<18}{method:<20}{rows:>10}{full:>10.3f}{reduced:>10.3f}"
+                         f"{full / max(reduced, 1e-9):>7.2f}")
+        return lines
+
+    def report(self, scales, stages):
+        return {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'sklearn': sklearn.__version__,
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'cpu_model': cpu_model(),
+                'cpu_count': os.cpu_count(),
+                'repeat': self.repeat,
+                'scales': scales,
+                'stages': list(stages),
+                'spec': self.spec_options,
+            },
+            'results': self.results,
+        }
+
+
+def environment_mismatch(results, baseline):
+    """
+    Различия окружения (машина, процессор, версии библиотек) между результатами
+    и базовой линией: список (ключ, база, текущее). Время и память, измеренные
+    в разных окружениях, не сравниваются.
+    """
+    current, base = results.get('meta', {}), baseline.get('meta', {})
+    return [(key, base.get(key), current.get(key)) for key in ENVIRONMENT_KEYS
+            if base.get(key) != current.get(key)]
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.05):
+    """
+    Сравнение с базовой линией по совпадающим (размер, этап).
+    Регрессия — время или прирост памяти больше базового более чем на tolerance
+    (очень короткие этапы, до min_seconds, по времени не сравниваются).
+    Возвращает список строк отчёта и количество регрессий.
+    """
+    base = {(r['rows'], r['stage']): r for r in baseline['results'] if 'skipped' not in r}
+    lines = [f"{'этап':<18}{'строк':>10}{'время, с':>12}{'база, с':>10}{'×':>7}{'память, МБ':>12}{'база':>8}"]
+    regressions = 0
+    for r in results['results']:
+        b = base.get((r['rows'], r['stage']))
+        if 'skipped' in r or b is None:
+            continue
+        ratio = r['seconds'] / b['seconds'] if b['seconds'] > 0 else float('inf')
+        slower = ratio > 1 + tolerance and max(r['seconds'], b['seconds']) >= min_seconds
+        heavier = r['delta_mb'] > b['delta_mb'] * (1 + tolerance) + 16
+        flag = ''
+        if slower or heavier:
+            regressions += 1
+            flag = '  РЕГРЕССИЯ' + (' (время)' if slower else '') + (' (память)' if heavier else '')
+        lines.append(f"{r['stage']:<18}{r['rows']:>10}{r['seconds']:>12.3f}{b['seconds']:>10.3f}{ratio:>7.2f}"
+                     f"{r['delta_mb']:>12.0f}{b['delta_mb']:>8.0f}{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки кластеризации клиентов на синтетических данных")
+    parser.add_argument('--scales', default='10k,100k,1M', help="Размеры наборов данных, например 10k,100k,1M,10M")
+    parser.add_argument('--stages', default=','.join(STAGES), help="Этапы через запятую")
+    parser.add_argument('--repeat', type=int, default=1, help="Повторов каждого этапа (берётся лучшее время)")
+    parser.add_argument('--clusters', type=int, default=5)
+    parser.add_argument('--features', type=int, default=8)
+    parser.add_argument('--nan-rate', type=float, default=0.01)
+    parser.add_argument('--outlier-rate', type=float, default=0.005)
+    parser.add_argument('--encoding', default='utf-8', help="Кодировка CSV, например utf-8 или cp1251")
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--coreset-size', type=int, default=20000, help="Строк в coreset (этапы coreset_*)")
+    parser.add_argument('--runs', type=int, default=8, help="Запусков с разными seed (этап ensemble_kmeans)")
+    parser.add_argument('--reduction', default='',
+                        help=f"Повторить этапы кластеризации после снижения размерности: {', '.join(REDUCTION_METHODS)}")
+    parser.add_argument('--no-limits', action='store_true', help="Запускать все этапы на всех размерах")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'clustering_benchmarks'),
+                        help="Каталог для сгенерированных файлов (переиспользуются между запусками)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="JSON с результатами для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Допустимое ухудшение, доля")
+    parser.add_argument('--compare-only', help="Только сравнить готовый JSON с базовой линией")
+    parser.add_argument('--trace', help="Сохранить трассировку этапов в формате Chrome Trace (JSON)")
+    args = parser.parse_args(argv)
+
+    if args.compare_only:
+        with open(args.compare_only, encoding='utf-8') as f:
+            results = json.load(f)
+    else:
+        scales = [parse_scale(scale) for scale in args.scales.split(',')]
+        stages = [stage for stage in args.stages.split(',') if stage]
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            parser.error(f"Неизвестные этапы: {sorted(unknown)}")
+        reductions = [method for method in args.reduction.split(',') if method]
+        unknown = set(reductions) - set(REDUCTION_METHODS)
+        if unknown:
+            parser.error(f"Неизвестные способы снижения размерности: {sorted(unknown)}")
+        spec_options = {
+            'n_features': args.features, 'nan_rate': args.nan_rate, 'outlier_rate': args.outlier_rate,
+            'encoding': args.encoding, 'delimiter': args.delimiter,
+        }
+        runner = BenchmarkRunner(args.work_dir, repeat=args.repeat, limits={} if args.no_limits else None,
+                                 n_clusters=args.clusters, spec_options=spec_options, coreset_size=args.coreset_size,
+                                 reductions=reductions, ensemble_runs=args.runs)
+        TRACER.enabled = TRACER.enabled or bool(args.trace)
+        for rows in scales:
+            runner.run_scale(rows, stages)
+        if reductions:
+            print("\n".join(runner.reduction_summary()))
+        if args.trace:
+            TRACER.export_chrome_trace(args.trace)
+            print(f"Трассировка сохранена в {args.trace}")
+        results = runner.report(scales, stages)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatch = environment_mismatch(results, baseline)
+        if mismatch:
+            print("Базовая линия записана в другом окружении, сравнение не выполняется:")
+            for key, base_value, value in mismatch:
+                print(f"  {key}: база {base_value}, текущее {value}")
+            return 2
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print("\n".join(lines))
+        print(f"Регрессий: {regressions}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Бенчмарк времени запуска: импорт модулей приложения и тяжёлых библиотек.
+
+Каждый модуль импортируется в отдельном процессе с -X importtime, поэтому
+время не зависит от уже загруженных модулей. Для gui дополнительно
+выводятся самые долгие вложенные импорты и список тяжёлых модулей,
+оказавшихся загруженными при запуске.
+
+Примеры (из корня репозитория):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modules gui,clustering --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lazy_import import HEAVY_MODULES  # noqa: E402
+
+DEFAULT_MODULES = ('gui',) + HEAVY_MODULES
+
+
+def import_profile(module):
+    """
+    Импорт модуля в новом процессе. Возвращает (общее время, с; {модуль: собственное время, с}).
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    own = {}
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        own[name.strip()] = int(self_us) / 1e6
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+    return total, own
+
+
+def measure(modules, repeat=3):
+    results = []
+    for module in modules:
+        try:
+            runs = [import_profile(module) for _ in range(repeat)]
+        except RuntimeError as e:
+            print(f"{module}: ошибка импорта — {e}")
+            results.append({'module': module, 'error': str(e)})
+            continue
+        best_total, own = min(runs, key=lambda run: run[0])
+        results.append({
+            'module': module,
+            'seconds': best_total,
+            'modules_loaded': len(own),
+            'heavy_loaded': [name for name in HEAVY_MODULES if name in own],
+            'slowest': sorted(own.items(), key=lambda item: item[1], reverse=True)[:10],
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время импорта модулей при запуске приложения")
+    parser.add_argument('--modules', default=','.join(DEFAULT_MODULES), help="Модули через запятую")
+    parser.add_argument('--repeat', type=int, default=3, help="Повторов (берётся лучшее время)")
+    parser.add_argument('--output', help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    results = measure([module for module in args.modules.split(',') if module], args.repeat)
+    print(f"{'модуль':<40}{'время, с':>10}{'модулей':>10}")
+    for r in results:
+        if 'error' not in r:
+            print(f"{r['module']:<40}{r['seconds']:>10.3f}{r['modules_loaded']:>10}")
+    gui = next((r for r in results if r['module'] == 'gui' and 'error' not in r), None)
+    if gui is not None:
+        print("\nЗапуск gui — самые долгие импорты (собственное время):")
+        for name, seconds in gui['slowest']:
+            print(f"  {name:<38}{seconds:>10.3f}")
+        print("Тяжёлые модули, загруженные при запуске:", ', '.join(gui['heavy_loaded']) or "нет")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
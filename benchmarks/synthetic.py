@@ -0,0 +1,120 @@
+"""
+Генератор синтетических данных о клиентах для бенчмарков.
+
+Числовые признаки — смесь гауссовых кластеров с заданным разбросом,
+к которой добавляются пропуски и выбросы. Кроме признаков в файле есть
+идентификатор и дата (исключаются при кластеризации), текстовый столбец
+с числами (проверяет приведение к числовому типу) и категориальный столбец
+с кириллицей (проверяет определение кодировки).
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FEATURE_NAMES = ['Income', 'Recency', 'MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts',
+                 'MntSweetProducts', 'MntGoldProds', 'NumWebPurchases', 'NumStorePurchases']
+REGIONS = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург']
+
+
+class SyntheticSpec:
+    """
+    Параметры синтетического набора данных.
+    """
+
+    def __init__(self, rows, n_features=8, n_clusters=5, cluster_std=1.0, nan_rate=0.01, outlier_rate=0.005,
+                 text_numeric=True, encoding='utf-8', delimiter=',', random_state=42):
+        self.rows = rows
+        self.n_features = n_features
+        self.n_clusters = n_clusters
+        self.cluster_std = cluster_std
+        self.nan_rate = nan_rate
+        self.outlier_rate = outlier_rate
+        self.text_numeric = text_numeric
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.random_state = random_state
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def key(self):
+        return hashlib.blake2b(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+
+    @property
+    def feature_names(self):
+        names = FEATURE_NAMES[:self.n_features]
+        return names + [f'Feature_{i + 1}' for i in range(len(names), self.n_features)]
+
+
+def generate_chunk(spec, rng, centers, start, rows):
+    """
+    Порция строк: признаки, идентификатор, дата, текстовый и категориальный столбцы.
+    Возвращает (DataFrame, истинные метки кластеров).
+    """
+    labels = rng.integers(0, spec.n_clusters, rows)
+    features = centers[labels] + rng.normal(scale=spec.cluster_std, size=(rows, spec.n_features))
+    # Признаки в «денежном» масштабе: у каждого столбца своё среднее и разброс
+    features = 100.0 + 20.0 * features * (1 + np.arange(spec.n_features)) / spec.n_features
+    outliers = rng.random((rows, spec.n_features)) < spec.outlier_rate / spec.n_features
+    features[outliers] *= rng.uniform(5, 20, outliers.sum())
+    features[rng.random((rows, spec.n_features)) < spec.nan_rate] = np.nan
+
+    frame = pd.DataFrame(np.round(features, 2), columns=spec.feature_names)
+    frame.insert(0, 'CustomerID', np.arange(start, start + rows))
+    frame['Dt_Customer'] = (np.datetime64('2020-01-01') + rng.integers(0, 1500, rows)).astype(str)
+    frame['Region'] = np.asarray(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), rows)]
+    if spec.text_numeric:
+        # Числа в виде текста с редкими нечисловыми значениями
+        visits = rng.poisson(5, rows).astype(str).astype(object)
+        visits[rng.random(rows) < 0.001] = 'н/д'
+        frame['NumWebVisitsMonth'] = visits
+    return frame, labels
+
+
+def make_centers(spec):
+    rng = np.random.default_rng(spec.random_state)
+    return rng.uniform(-4, 4, size=(spec.n_clusters, spec.n_features)) * spec.cluster_std
+
+
+def generate_frame(spec):
+    """
+    Весь набор данных в памяти (для небольших размеров).
+    """
+    rng = np.random.default_rng(spec.random_state + 1)
+    frame, labels = generate_chunk(spec, rng, make_centers(spec), 0, spec.rows)
+    return frame, labels
+
+
+def write_csv(spec, path, chunk_rows=250000):
+    """
+    Запись набора данных в CSV порциями; истинные метки сохраняются рядом (.labels.npy).
+    """
+    rng = np.random.default_rng(spec.random_state + 1)
+    centers = make_centers(spec)
+    labels_path = path + '.labels.npy'
+    labels = np.lib.format.open_memmap(labels_path, mode='w+', dtype=np.int16, shape=(spec.rows,))
+    temp_path = path + '.tmp'
+    for start in range(0, spec.rows, chunk_rows):
+        rows = min(chunk_rows, spec.rows - start)
+        frame, chunk_labels = generate_chunk(spec, rng, centers, start, rows)
+        frame.to_csv(temp_path, mode='w' if start == 0 else 'a', header=(start == 0), index=False,
+                     sep=spec.delimiter, encoding=spec.encoding)
+        labels[start:start + rows] = chunk_labels
+    labels.flush()
+    os.replace(temp_path, path)
+    return path
+
+
+def ensure_csv(spec, work_dir):
+    """
+    Путь к CSV для параметров spec; файл генерируется только если его ещё нет.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, f'customers_{spec.rows}_{spec.key()}.csv')
+    if not os.path.exists(path):
+        print(f"Генерация {spec.rows} строк: {path}")
+        write_csv(spec, path)
+    return path
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from column_stats import ColumnStats
+
+
+class ClusterProfiles:
+    """
+    Профили кластеров, вычисляемые один раз после присвоения меток.
+
+    Обратный индекс: позиции строк исходного DataFrame, упорядоченные по кластерам,
+    и границы участка каждого кластера, поэтому участники кластера выбираются
+    срезом за O(1). Для каждого кластера хранятся ColumnStats по числовым
+    столбцам (количество, среднее, дисперсия, минимум, максимум и выборка строк
+    для квантилей).
+    """
+
+    def __init__(self, cluster_ids, offsets, member_rows, columns, stats):
+        self.cluster_ids = cluster_ids
+        self.offsets = offsets
+        self.member_rows = member_rows
+        self.columns = list(columns)
+        self.stats = stats
+        self._position = {int(cluster): i for i, cluster in enumerate(cluster_ids)}
+
+    @classmethod
+    def build(cls, data, labels, row_mask=None, columns=None, reservoir_size=2000):
+        """
+        data — исходный DataFrame, labels — метки строк, отмеченных row_mask
+        (None — все строки), columns — столбцы для статистик (по умолчанию числовые).
+        """
+        labels = np.asarray(labels)
+        rows = np.arange(len(data)) if row_mask is None else np.flatnonzero(row_mask)
+        if columns is None:
+            columns = [col for col in data.columns if pd.api.types.is_numeric_dtype(data[col])]
+        order = np.argsort(labels, kind='stable')
+        cluster_ids, starts = np.unique(labels[order], return_index=True)
+        offsets = np.append(starts, len(labels))
+        member_rows = rows[order]
+
+        stats = []
+        for i in range(len(cluster_ids)):
+            members = member_rows[offsets[i]:offsets[i + 1]]
+            stats.append(ColumnStats.from_matrix(cls.numeric_block(data, members, columns),
+                                                 reservoir_size=reservoir_size))
+        return cls(cluster_ids, offsets, member_rows, columns, stats)
+
+    @staticmethod
+    def numeric_block(data, rows, columns):
+        frame = data.iloc[rows]
+        matrix = np.empty((len(rows), len(columns)))
+        for j, col in enumerate(columns):
+            values = frame[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors='coerce')
+            matrix[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return matrix
+
+    def __len__(self):
+        return len(self.cluster_ids)
+
+    def members(self, cluster):
+        # Позиции строк исходного DataFrame, входящих в кластер (срез без копирования)
+        i = self._position[int(cluster)]
+        return self.member_rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def size(self, cluster):
+        i = self._position[int(cluster)]
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def overview(self):
+        """
+        Размер, доля и средние значения столбцов по кластерам.
+        """
+        sizes = np.diff(self.offsets)
+        means = pd.DataFrame([s.mean for s in self.stats], columns=self.columns)
+        means.insert(0, 'Доля', sizes / max(sizes.sum(), 1))
+        means.insert(0, 'Размер', sizes)
+        means.index = pd.Index(self.cluster_ids, name='Cluster')
+        return means
+
+    def describe(self, cluster):
+        """
+        Подробный профиль одного кластера: статистики по каждому столбцу.
+        """
+        s = self.stats[self._position[int(cluster)]]
+        q25, median, q75 = s.quantiles([0.25, 0.5, 0.75]) if s.rows else np.full((3, len(self.columns)), np.nan)
+        # Для столбцов без значений статистики не определены
+        empty = s.count == 0
+        profile = pd.DataFrame({
+            'count': s.count,
+            'mean': np.where(empty, np.nan, s.mean),
+            'std': np.where(empty, np.nan, s.std(ddof=1)),
+            'min': np.where(empty, np.nan, s.min),
+            '25%': q25,
+            '50%': median,
+            '75%': q75,
+            'max': np.where(empty, np.nan, s.max),
+        }, index=pd.Index(self.columns, name='Столбец'))
+        return profile
+
+    def export(self, data, cluster, file_path, chunk_size=100000):
+        # Запись строк одного кластера в CSV порциями
+        members = np.sort(self.members(cluster))
+        for start in range(0, len(members), chunk_size):
+            chunk = data.iloc[members[start:start + chunk_size]].assign(Cluster=cluster)
+            chunk.to_csv(file_path, mode='w' if start == 0 else 'a', header=(start == 0), index=False)
+        if len(members) == 0:
+            data.iloc[:0].to_csv(file_path, index=False)
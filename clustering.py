@@ -1,51 +1,417 @@
-from sklearn.cluster import KMeans, DBSCAN, MiniBatchKMeans
-from sklearn.metrics import silhouette_score
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
 from minisom import MiniSom
+from joblib import Parallel, delayed, effective_n_jobs
+from silhouette import SilhouetteEngine
+from som_engine import BatchSOM
+from density import NeighborGraphDBSCAN
+from model_bundle import ClusterModel
+from preprocess_state import PreprocessState
+from column_stats import ColumnStats
+from instrumentation import traced
+from coreset import Coreset, assign_to_centers
+from reduction import Reduction
+from ensemble import EnsembleClustering
 import numpy as np
+import os
+import tempfile
+import time
+
+# Критерии выбора числа кластеров; для Davies-Bouldin лучше меньшее значение
+ELBOW_CRITERIA = ('silhouette', 'calinski_harabasz', 'davies_bouldin')
+
+
+def make_kmeans(n_clusters, use_mini_batch=False, init=None):
+    # При заданных начальных центрах достаточно одного запуска
+    if init is None:
+        init_args = {'random_state': 42}
+    else:
+        init_args = {'init': init, 'n_init': 1, 'random_state': 42}
+    if use_mini_batch:
+        return MiniBatchKMeans(n_clusters=n_clusters, batch_size=100, **init_args)
+    return KMeans(n_clusters=n_clusters, **init_args)
+
+
+def score_labels(scaled_data, labels, criterion='silhouette', sample_size=5000):
+    if criterion == 'silhouette':
+        # Внутри параллельного перебора k движок работает в одном процессе
+        engine = SilhouetteEngine(n_jobs=1)
+        if sample_size is not None and sample_size < len(scaled_data):
+            return engine.sampled(scaled_data, labels, sample_size=sample_size)['score']
+        return engine.exact_score(scaled_data, labels)
+    if criterion == 'calinski_harabasz':
+        return calinski_harabasz_score(scaled_data, labels)
+    if criterion == 'davies_bouldin':
+        return davies_bouldin_score(scaled_data, labels)
+    raise ValueError(f"Неизвестный критерий: {criterion}")
+
+
+def fit_candidate(scaled_data, k, use_mini_batch=False, init=None, criterion='silhouette', sample_size=5000,
+                  sample_weight=None):
+    # Одна точка перебора k; функция уровня модуля, чтобы её можно было передать в рабочий процесс
+    start = time.perf_counter()
+    kmeans = make_kmeans(k, use_mini_batch, init)
+    labels = kmeans.fit_predict(scaled_data, sample_weight=sample_weight)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score = score_labels(scaled_data, labels, criterion, sample_size)
+    score_time = time.perf_counter() - start
+    return {
+        'k': k,
+        'inertia': kmeans.inertia_,
+        'score': score,
+        'centers': kmeans.cluster_centers_,
+        'timing': {'fit': fit_time, 'score': score_time},
+    }
+
+
+def extend_centers(scaled_data, centers, sample_size=10000, random_state=42):
+    """
+    Начальные центры для k+1 кластеров: центры для k плюс одна точка,
+    выбранная по правилу k-means++ (вероятность пропорциональна квадрату расстояния).
+    """
+    rng = np.random.default_rng(random_state + len(centers))
+    if len(scaled_data) > sample_size:
+        sample = scaled_data[rng.choice(len(scaled_data), sample_size, replace=False)]
+    else:
+        sample = scaled_data
+    sq_dist = ((sample[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    total = sq_dist.sum()
+    if total > 0:
+        new_center = sample[rng.choice(len(sample), p=sq_dist / total)]
+    else:
+        new_center = sample[rng.integers(len(sample))]
+    return np.vstack([centers, new_center])
+
 
 class Clustering:
+    def __init__(self):
+        self.silhouette_engine = SilhouetteEngine()
+        self.som_model = None
+        # Граф соседей переиспользуется между запусками DBSCAN на тех же данных
+        self.density_model = NeighborGraphDBSCAN()
+        # Обученная модель последнего запуска (для сохранения через export_model)
+        self.last_fit = None
+        # Проекция снижения размерности и результат для последних данных и настроек
+        self.reduction = None
+        self._reduction_key = None
+        self._reduction_source = None
+        self._reduced = None
+        # Сводка последнего запуска ансамбля (разброс по seed и согласие запусков)
+        self.last_ensemble = None
+
+    @traced('Clustering.reduce_dimensions')
+    def reduce_dimensions(self, scaled_data, method='pca', variance=0.95, n_components=None):
+        """
+        Снижение размерности масштабированных данных перед кластеризацией.
+        Проекция и результат кэшируются: повторный вызов с теми же данными
+        и настройками (перебор k, подбор eps, кластеризация) не обучает её заново.
+        """
+        key = (method, variance, n_components)
+        if self._reduction_source is scaled_data and self._reduction_key == key:
+            return self._reduced
+        start = time.perf_counter()
+        reduction = Reduction.fit(scaled_data, method, variance=variance, n_components=n_components)
+        reduced = reduction.transform(scaled_data)
+        print(f"Снижение размерности ({reduction.describe()}) за {time.perf_counter() - start:.2f} с")
+        self.reduction = reduction
+        self._reduction_key = key
+        self._reduction_source = scaled_data
+        self._reduced = reduced
+        return reduced
+
+    @traced('Clustering.kmeans_clustering')
     def kmeans_clustering(self, scaled_data, n_clusters):
         kmeans = KMeans(n_clusters=n_clusters, random_state=42)
         clusters = kmeans.fit_predict(scaled_data)
+        self.last_fit = {'kind': 'kmeans', 'centers': kmeans.cluster_centers_}
         return clusters
 
+    @traced('Clustering.mini_batch_kmeans_clustering')
     def mini_batch_kmeans_clustering(self, scaled_data, n_clusters, batch_size=100):
         mbk = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=42)
         clusters = mbk.fit_predict(scaled_data)
+        self.last_fit = {'kind': 'kmeans', 'centers': mbk.cluster_centers_}
         return clusters
 
+    @traced('Clustering.streaming_kmeans_clustering')
+    def streaming_kmeans_clustering(self, file_path, n_clusters, loader, n_passes=3, batch_size=4096,
+                                    labels_path=None, sample_size=50000, clip=3.0, progress=None):
+        """
+        K-Means без загрузки всего файла в память.
+
+        Проход 1 — накопление статистик столбцов (ColumnStats) по порциям файла;
+        проходы 2..n_passes+1 — MiniBatchKMeans.partial_fit по перемешанным мини-пакетам
+        каждой порции; последний проход — присвоение меток с записью в файл .npy
+        (np.memmap). Пропуски заменяются средним (0 после масштабирования),
+        значения за пределами ±clip стандартных отклонений ограничиваются.
+        Для графиков и силуэта сохраняется случайная выборка масштабированных строк.
+        """
+        encoding, delimiter = loader.detect_format(file_path)
+        header = loader.read_head(file_path, encoding, delimiter)
+        _, columns = loader.detect_columns(header)
+        strict = loader.strict_columns(header, columns)
+        del header
+
+        def chunks(coerced=None):
+            for chunk in loader.iter_chunks(file_path, encoding, delimiter, usecols=columns):
+                yield loader.to_float32(chunk, columns, strict, coerced)
+
+        def scaled(matrix):
+            matrix = column_stats.scale_matrix(matrix.astype(np.float64))
+            np.nan_to_num(matrix, copy=False, nan=0.0)
+            np.clip(matrix, -clip, clip, out=matrix)
+            return matrix
+
+        column_stats = ColumnStats(len(columns))
+        n_rows = 0
+        # До конца первого прохода число строк известно только приблизительно (по размеру файла)
+        estimated_rows = loader.estimate_rows(file_path) if progress is not None else 0
+        coerced = {}
+        for matrix in chunks(coerced):
+            column_stats.update(matrix)
+            n_rows += len(matrix)
+            if progress is not None:
+                progress(n_rows, max(estimated_rows, n_rows) * (n_passes + 2), 'Масштабирование')
+        loader.report_coerced(coerced)
+        total_work = n_rows * (n_passes + 2)
+        done = n_rows
+
+        rng = np.random.default_rng(42)
+        mbk = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=42, n_init=3)
+        for epoch in range(n_passes):
+            for matrix in chunks():
+                matrix = scaled(matrix)
+                order = rng.permutation(len(matrix))
+                for start in range(0, len(matrix), batch_size):
+                    batch = matrix[order[start:start + batch_size]]
+                    # Первый пакет должен содержать не меньше точек, чем кластеров
+                    if not hasattr(mbk, 'cluster_centers_') and len(batch) < n_clusters:
+                        continue
+                    mbk.partial_fit(batch)
+                done += len(matrix)
+                if progress is not None:
+                    progress(done, total_work, f'Обучение, проход {epoch + 1}/{n_passes}')
+
+        if labels_path is None:
+            fd, labels_path = tempfile.mkstemp(suffix='.npy')
+            os.close(fd)
+        labels = np.lib.format.open_memmap(labels_path, mode='w+', dtype=np.int32, shape=(n_rows,))
+        sample_fraction = min(1.0, sample_size / max(n_rows, 1))
+        sample_parts = []
+        sample_labels = []
+        inertia = 0.0
+        position = 0
+        for matrix in chunks():
+            matrix = scaled(matrix)
+            chunk_labels = mbk.predict(matrix)
+            labels[position:position + len(matrix)] = chunk_labels
+            inertia += ((matrix - mbk.cluster_centers_[chunk_labels]) ** 2).sum()
+            selected = rng.random(len(matrix)) < sample_fraction
+            sample_parts.append(matrix[selected])
+            sample_labels.append(chunk_labels[selected])
+            position += len(matrix)
+            done += len(matrix)
+            if progress is not None:
+                progress(done, total_work, 'Присвоение меток')
+        labels.flush()
+
+        # Те же преобразования в терминах PreprocessState: пропуски — средним,
+        # ограничение ±clip стандартных отклонений до масштабирования
+        mean, scale = column_stats.mean, column_stats.scale
+        state = PreprocessState(
+            columns, mean, scale, nan_policy='mean', fill_values=mean,
+            outlier_policy='cap', lower=mean - clip * scale, upper=mean + clip * scale,
+        )
+        self.last_fit = {'kind': 'kmeans', 'centers': mbk.cluster_centers_, 'state': state}
+
+        return {
+            'labels': labels,
+            'labels_path': labels_path,
+            'columns': columns,
+            'model': mbk,
+            'column_stats': column_stats,
+            'state': state,
+            'inertia': inertia,
+            'sample_data': np.vstack(sample_parts) if sample_parts else np.empty((0, len(columns))),
+            'sample_labels': np.concatenate(sample_labels) if sample_labels else np.empty(0, dtype=np.int32),
+        }
+
+    @traced('Clustering.coreset_kmeans_clustering')
+    def coreset_kmeans_clustering(self, scaled_data, n_clusters, coreset_size=20000, method='lightweight',
+                                  strata=None, use_mini_batch=False, n_init=10):
+        """
+        K-Means по взвешенному coreset вместо всех строк: центры обучаются
+        на coreset с весами, затем все строки присваиваются ближайшим центрам порциями.
+        """
+        coreset = Coreset.build(scaled_data, coreset_size, method, strata)
+        kmeans = make_kmeans(n_clusters, use_mini_batch)
+        # Coreset мал, поэтому несколько запусков из разных начальных центров почти ничего не стоят
+        kmeans.set_params(n_init=n_init)
+        kmeans.fit(coreset.points, sample_weight=coreset.weights)
+        clusters, inertia = assign_to_centers(scaled_data, kmeans.cluster_centers_)
+        print(f"K-Means по coreset: {len(coreset)} из {len(scaled_data)} строк, inertia на всех строках {inertia:.2f}")
+        self.last_fit = {'kind': 'kmeans', 'centers': kmeans.cluster_centers_}
+        return clusters
+
+    @traced('Clustering.ensemble_clustering')
+    def ensemble_clustering(self, scaled_data, n_clusters, n_runs=8, algorithms=('kmeans',), selection='inertia',
+                            sample_size=5000, n_jobs=-1, progress=None):
+        """
+        Несколько запусков K-Means с разными seed параллельно (см. EnsembleClustering);
+        метки строк — по центрам лучшего запуска, сводка по запускам — в self.last_ensemble.
+        """
+        ensemble = EnsembleClustering(n_clusters, n_runs, algorithms, selection, sample_size, n_jobs=n_jobs)
+        ensemble.fit(scaled_data, progress=progress)
+        best = ensemble.best
+        clusters, _ = assign_to_centers(scaled_data, best['centers'])
+        report = ensemble.report()
+        print(f"Ансамбль из {len(ensemble.runs)} запусков: лучший — {best['algorithm']}, seed {best['seed']}, "
+              f"inertia {best['inertia']:.2f} (разброс {report['inertia']['min']:.2f}–{report['inertia']['max']:.2f}), "
+              f"ARI с лучшим не ниже {report['ari_to_best']['min']:.3f}")
+        self.last_fit = {'kind': 'kmeans', 'centers': best['centers']}
+        self.last_ensemble = report
+        return clusters
+
+    @traced('Clustering.dbscan_clustering')
     def dbscan_clustering(self, scaled_data, eps=0.5, min_samples=5):
-        dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-        clusters = dbscan.fit_predict(scaled_data)
+        clusters = self.density_model.fit_predict(scaled_data, eps, min_samples)
+        self.last_fit = {
+            'kind': 'dbscan', 'data': scaled_data, 'labels': clusters,
+            'core_mask': self.density_model.core_sample_mask_, 'eps': eps,
+        }
         return clusters
 
-    def som_clustering(self, scaled_data, som_size=10, iterations=100):
-        som = MiniSom(som_size, som_size, scaled_data.shape[1], sigma=1.0, learning_rate=0.5)
-        som.random_weights_init(scaled_data)
-        som.train_random(scaled_data, iterations)
-        positions = []
-        for x in scaled_data:
-            w = som.winner(x)
-            positions.append(w)
-        positions = np.array(positions)
+    @traced('Clustering.suggest_dbscan_eps')
+    def suggest_dbscan_eps(self, scaled_data, min_samples=5):
+        # k-distance кривая по выборке и рекомендуемое eps в точке её излома
+        k_distances = self.density_model.k_distance(scaled_data, k=min_samples)
+        return k_distances, self.density_model.suggest_eps(k_distances)
+
+    @traced('Clustering.som_clustering')
+    def som_clustering(self, scaled_data, som_size=10, iterations=10, progress=None, mode='batch'):
+        """
+        SOM-кластеризация; возвращает позиции BMU для каждого образца.
+        mode='batch' — пакетное обучение BatchSOM, iterations задаёт число эпох;
+        mode='online' — MiniSom.train_random, iterations задаёт число случайных шагов.
+        Обученная карта сохраняется в self.som_model (веса, ошибки квантования и топографии).
+        """
+        if mode == 'batch':
+            som = BatchSOM(som_size, som_size)
+            som.fit(scaled_data, epochs=iterations, progress=progress)
+        else:
+            minisom = MiniSom(som_size, som_size, scaled_data.shape[1], sigma=1.0, learning_rate=0.5)
+            minisom.random_weights_init(scaled_data)
+            minisom.train_random(scaled_data, iterations)
+            # Веса MiniSom переносятся в BatchSOM для векторного поиска BMU
+            som = BatchSOM(som_size, som_size)
+            som.weights = minisom.get_weights().reshape(-1, scaled_data.shape[1]).astype(np.float64)
+            som.evaluate(scaled_data)
+        self.som_model = som
+        bmus = som.bmu(scaled_data)
+        # Метки кластеров — номера занятых узлов по порядку, как np.unique по позициям
+        used_nodes = np.unique(bmus)
+        self.last_fit = {'kind': 'som', 'centers': som.weights[used_nodes]}
+        positions = som.grid[bmus]
         return positions  # Возвращаем позиции BMU для каждого образца
 
-    def calculate_elbow_method(self, scaled_data, use_mini_batch=False):
-        inertia = []
-        silhouette_scores = []
-        K = range(2, 11)
+    def export_model(self, state, reduction=None, **meta):
+        """
+        Модель последнего запуска кластеризации вместе с параметрами предобработки.
+        Для потокового K-Means параметры предобработки берутся из самого запуска.
+        reduction — проекция, если кластеризация шла по данным сниженной размерности.
+        """
+        fit = self.last_fit
+        if fit is None:
+            raise ValueError("Нет обученной модели: сначала выполните кластеризацию")
+        if 'state' in fit:
+            state, reduction = fit['state'], None
+        if fit['kind'] == 'dbscan':
+            core = fit['core_mask']
+            return ClusterModel('dbscan', state, fit['data'][core], fit['labels'][core], eps=fit['eps'], meta=meta,
+                                reduction=reduction)
+        centers = fit['centers']
+        return ClusterModel(fit['kind'], state, centers, np.arange(len(centers)), meta=meta, reduction=reduction)
+
+    @traced('Clustering.calculate_elbow_method')
+    def calculate_elbow_method(self, scaled_data, use_mini_batch=False, progress=None, k_range=range(2, 11),
+                               criterion='silhouette', sample_size=5000, warm_start=False, n_jobs=-1,
+                               early_stop_tol=None, patience=2, coreset_size=None, coreset_method='lightweight'):
+        """
+        Перебор количества кластеров.
+
+        Без warm_start значения k обучаются параллельно пакетами по n_jobs процессов.
+        С warm_start перебор последовательный: центры для k+1 инициализируются центрами для k
+        и одной новой точкой, поэтому каждому k хватает одного запуска KMeans.
+        criterion — 'silhouette' (по выборке из sample_size точек), 'calinski_harabasz'
+        или 'davies_bouldin'. early_stop_tol — остановка, когда относительное уменьшение
+        inertia меньше порога patience раз подряд (кривая вышла на плато).
+        coreset_size — перебор по взвешенному coreset из стольких строк вместо всех данных
+        (inertia — взвешенная оценка для всех строк, критерии считаются по строкам coreset).
+        Возвращает (K, inertia, scores, timings), timings — время обучения и оценки для каждого k.
+        """
+        K = list(k_range)
+        sample_weight = None
+        if coreset_size is not None and coreset_size < len(scaled_data):
+            coreset = Coreset.build(scaled_data, coreset_size, coreset_method)
+            scaled_data, sample_weight = coreset.points, coreset.weights
+        results = []
+        batch_size = 1 if warm_start else max(1, effective_n_jobs(n_jobs))
+        flat_steps = 0
+        position = 0
 
-        for k in K:
-            if use_mini_batch:
-                kmeans = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=100)
+        while position < len(K):
+            batch = K[position:position + batch_size]
+            if warm_start:
+                init = None
+                if results and results[-1]['k'] == batch[0] - 1:
+                    init = extend_centers(scaled_data, results[-1]['centers'])
+                batch_results = [fit_candidate(scaled_data, batch[0], use_mini_batch, init, criterion, sample_size,
+                                               sample_weight)]
+            elif len(batch) == 1:
+                batch_results = [fit_candidate(scaled_data, batch[0], use_mini_batch, None, criterion, sample_size,
+                                               sample_weight)]
             else:
-                kmeans = KMeans(n_clusters=k, random_state=42)
-            labels = kmeans.fit_predict(scaled_data)
-            inertia.append(kmeans.inertia_)
-            silhouette_avg = silhouette_score(scaled_data, labels)
-            silhouette_scores.append(silhouette_avg)
-        return K, inertia, silhouette_scores
+                batch_results = Parallel(n_jobs=len(batch))(
+                    delayed(fit_candidate)(scaled_data, k, use_mini_batch, None, criterion, sample_size, sample_weight)
+                    for k in batch
+                )
+
+            stop = False
+            for result in batch_results:
+                results.append(result)
+                # Промежуточный результат для отображения по ходу расчёта
+                if progress is not None:
+                    progress(len(results), len(K), (result['k'], result['inertia'], result['score']))
+                if early_stop_tol is not None and len(results) > 1:
+                    previous = results[-2]['inertia']
+                    improvement = (previous - result['inertia']) / previous if previous > 0 else 0.0
+                    flat_steps = flat_steps + 1 if improvement < early_stop_tol else 0
+                    if flat_steps >= patience:
+                        stop = True
+                        break
+            if stop:
+                print(f"Кривая локтя вышла на плато при k={results[-1]['k']}, перебор остановлен.")
+                break
+            position += len(batch)
+
+        K = [result['k'] for result in results]
+        inertia = [result['inertia'] for result in results]
+        scores = [result['score'] for result in results]
+        timings = [result['timing'] for result in results]
+        return K, inertia, scores, timings
+
+    def select_optimal_k(self, K, scores, criterion='silhouette'):
+        if criterion == 'davies_bouldin':
+            return K[int(np.argmin(scores))]
+        return K[int(np.argmax(scores))]
 
     def calculate_silhouette(self, scaled_data, clusters):
-        score = silhouette_score(scaled_data, clusters)
-        return score
\ No newline at end of file
+        score = self.estimate_silhouette(scaled_data, clusters)['score']
+        return score
+
+    @traced('Clustering.estimate_silhouette')
+    def estimate_silhouette(self, scaled_data, clusters, exact_threshold=20000, sample_size=10000):
+        # Точный расчёт порциями для небольших данных, стратифицированная оценка с доверительным интервалом для больших
+        return self.silhouette_engine.estimate(scaled_data, clusters, exact_threshold, sample_size)
@@ -0,0 +1,189 @@
+import numpy as np
+
+# Правила поиска выбросов и пороги по умолчанию для каждого
+OUTLIER_RULES = ('zscore', 'iqr', 'mad')
+OUTLIER_THRESHOLDS = {'zscore': 3.0, 'iqr': 1.5, 'mad': 3.5}
+
+
+class ColumnStats:
+    """
+    Статистики столбцов числовой матрицы за один векторный проход: количество
+    непропущенных значений, среднее, сумма квадратов отклонений (M2), минимум
+    и максимум. Пропуски (NaN) не учитываются.
+
+    Статистики порций объединяются методом Чана (merge), поэтому их можно
+    накапливать по потоку порций. При reservoir_size > 0 дополнительно хранится
+    случайная выборка строк (reservoir sampling) для приближённых квантилей;
+    пока строк не больше reservoir_size, квантили точные.
+    """
+
+    def __init__(self, n_columns, reservoir_size=0, block_size=65536, random_state=42):
+        self.n_columns = n_columns
+        self.block_size = block_size
+        self.reservoir_size = reservoir_size
+        self.rows = 0
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+        self._rng = np.random.default_rng(random_state)
+        self._reservoir = np.empty((reservoir_size, n_columns)) if reservoir_size else None
+        self._filled = 0
+
+    @classmethod
+    def from_matrix(cls, matrix, reservoir_size=0, **kwargs):
+        stats = cls(matrix.shape[1], reservoir_size=reservoir_size, **kwargs)
+        stats.update(matrix)
+        return stats
+
+    def update(self, matrix):
+        for start in range(0, len(matrix), self.block_size):
+            block = np.asarray(matrix[start:start + self.block_size], dtype=np.float64)
+            self._merge_moments(*self._block_moments(block))
+            if self._reservoir is not None:
+                self._sample(block)
+            self.rows += len(block)
+        return self
+
+    def _block_moments(self, block):
+        missing = np.isnan(block)
+        if not missing.any():
+            count = np.full(self.n_columns, len(block), dtype=np.int64)
+            mean = block.mean(axis=0) if len(block) else np.zeros(self.n_columns)
+            deviations = block - mean
+            return count, mean, np.einsum('ij,ij->j', deviations, deviations), block.min(axis=0, initial=np.inf), \
+                block.max(axis=0, initial=-np.inf)
+        present = ~missing
+        count = present.sum(axis=0)
+        mean = np.where(present, block, 0.0).sum(axis=0) / np.maximum(count, 1)
+        deviations = np.where(present, block - mean, 0.0)
+        return count, mean, np.einsum('ij,ij->j', deviations, deviations), \
+            np.where(present, block, np.inf).min(axis=0, initial=np.inf), \
+            np.where(present, block, -np.inf).max(axis=0, initial=-np.inf)
+
+    def _merge_moments(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        safe_total = np.maximum(total, 1)
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+        np.minimum(self.min, minimum, out=self.min)
+        np.maximum(self.max, maximum, out=self.max)
+
+    def _sample(self, block):
+        # Алгоритм R: строка с порядковым номером i попадает в выборку с вероятностью k / (i + 1)
+        take = min(self.reservoir_size - self._filled, len(block))
+        if take:
+            self._reservoir[self._filled:self._filled + take] = block[:take]
+            self._filled += take
+        if take == len(block):
+            return
+        positions = self.rows + np.arange(take, len(block))
+        slots = (self._rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+        accepted = np.flatnonzero(slots < self.reservoir_size)
+        # Порядок важен: более поздняя строка вытесняет более раннюю в том же слоте
+        self._reservoir[slots[accepted]] = block[take + accepted]
+
+    def merge(self, other):
+        """
+        Объединение со статистиками другой порции тех же столбцов.
+        """
+        if self._reservoir is not None and other._reservoir is not None:
+            rows = self.rows + other.rows
+            if self._filled + other._filled <= self.reservoir_size:
+                self._reservoir[self._filled:self._filled + other._filled] = other._reservoir[:other._filled]
+                self._filled += other._filled
+            elif rows:
+                # Из каждой выборки берётся доля строк, пропорциональная числу исходных строк
+                from_other = min(other._filled, int(round(self.reservoir_size * other.rows / rows)))
+                from_self = min(self._filled, self.reservoir_size - from_other)
+                own = self._reservoir[self._rng.choice(self._filled, from_self, replace=False)]
+                foreign = other._reservoir[self._rng.choice(other._filled, from_other, replace=False)]
+                self._filled = from_self + from_other
+                self._reservoir[:self._filled] = np.vstack([own, foreign])
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        self.rows += other.rows
+        return self
+
+    def var(self, ddof=0):
+        return self.m2 / np.maximum(self.count - ddof, 1)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.var(ddof))
+
+    @property
+    def scale(self):
+        # Масштаб как в StandardScaler: стандартное отклонение, для постоянных столбцов 1
+        std = self.std()
+        return np.where(std > 0, std, 1.0)
+
+    def quantiles(self, q):
+        if self._reservoir is None or self._filled == 0:
+            raise ValueError("Квантили недоступны: выборка строк не накапливалась")
+        return np.nanquantile(self._reservoir[:self._filled], q, axis=0)
+
+    def mad(self):
+        # Медиана абсолютных отклонений от медианы по выборке строк
+        sample = self._reservoir[:self._filled]
+        return np.nanmedian(np.abs(sample - self.quantiles(0.5)), axis=0)
+
+    def limits(self, method='zscore', threshold=3.0):
+        """
+        Нижняя и верхняя границы нормальных значений по столбцам.
+        'zscore' — среднее ± threshold стандартных отклонений (несмещённая оценка, как pandas std);
+        'iqr' — [Q1 - threshold·IQR, Q3 + threshold·IQR]; 'mad' — медиана ± threshold·1.4826·MAD.
+        Для 'iqr' и 'mad' нужна выборка строк (reservoir_size > 0). Столбцы с нулевым
+        IQR или MAD (например, двоичные признаки) не ограничиваются: границы бесконечны.
+        """
+        if method == 'zscore':
+            std = self.std(ddof=1)
+            return self.mean - threshold * std, self.mean + threshold * std
+        if method == 'iqr':
+            q1, q3 = self.quantiles([0.25, 0.75])
+            center_low, center_high, spread = q1, q3, threshold * (q3 - q1)
+        elif method == 'mad':
+            median = self.quantiles(0.5)
+            center_low, center_high, spread = median, median, threshold * 1.4826 * self.mad()
+        else:
+            raise ValueError(f"Неизвестное правило выбросов: {method}")
+        lower = np.where(spread > 0, center_low - spread, -np.inf)
+        upper = np.where(spread > 0, center_high + spread, np.inf)
+        return lower, upper
+
+    def outlier_mask(self, matrix, method='zscore', threshold=3.0):
+        """
+        Строки, в которых хотя бы одно значение выходит за границы правила.
+        Для 'zscore' используется |z| > threshold (z-оценка со смещённым
+        стандартным отклонением, как scipy.stats.zscore); постоянные столбцы
+        и пропуски выбросами не считаются.
+        """
+        mask = np.zeros(len(matrix), dtype=bool)
+        if method == 'zscore':
+            std = self.std()
+            # Для постоянного столбца порог бесконечен
+            bound = np.where(std > 0, threshold * std, np.inf)
+            lower, upper = self.mean - bound, self.mean + bound
+        else:
+            lower, upper = self.limits(method, threshold)
+        for start in range(0, len(matrix), self.block_size):
+            block = matrix[start:start + self.block_size]
+            mask[start:start + self.block_size] = ((block < lower) | (block > upper)).any(axis=1)
+        return mask
+
+    def zscore(self, matrix, out=None):
+        std = self.std()
+        inverse = np.divide(1.0, std, out=np.zeros_like(std), where=std > 0)
+        out = np.subtract(matrix, self.mean, out=out)
+        out *= inverse
+        return out
+
+    def cap(self, matrix, method='zscore', threshold=3.0, out=None):
+        lower, upper = self.limits(method, threshold)
+        return np.clip(matrix, lower, upper, out=out)
+
+    def scale_matrix(self, matrix, out=None):
+        out = np.subtract(matrix, self.mean, out=out)
+        out /= self.scale
+        return out
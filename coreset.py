@@ -0,0 +1,119 @@
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from model_bundle import nearest_centers
+
+CORESET_METHODS = ('lightweight', 'uniform', 'stratified')
+
+
+class Coreset:
+    """
+    Взвешенное подмножество строк, заменяющее полный набор данных при обучении.
+
+    points — выбранные строки, weights — сколько исходных строк представляет
+    каждая (сумма весов примерно равна числу строк), indices — позиции строк
+    в исходной матрице. Обучение с sample_weight=weights на coreset
+    приближает обучение на всех строках.
+
+    Способы построения:
+    'lightweight' — lightweight coreset для K-Means (Bachem и др., 2018):
+        вероятность выбора строки — половина равномерной и половина
+        пропорциональная квадрату расстояния до общего среднего, поэтому
+        удалённые и малочисленные группы представлены лучше, чем в случайной выборке;
+    'uniform' — случайная выборка без повторений с равными весами;
+    'stratified' — выборка из каждой группы strata пропорционально её размеру
+        (хотя бы одна строка из группы), вес — размер группы / число выбранных строк.
+    """
+
+    def __init__(self, points, weights, indices, method):
+        self.points = points
+        self.weights = weights
+        self.indices = indices
+        self.method = method
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def build(cls, data, size, method='lightweight', strata=None, random_state=42, chunk_size=65536):
+        if method not in CORESET_METHODS:
+            raise ValueError(f"Неизвестный способ построения coreset: {method}")
+        n_rows = len(data)
+        if size >= n_rows:
+            return cls(np.asarray(data, dtype=np.float64), np.ones(n_rows), np.arange(n_rows), 'full')
+        rng = np.random.default_rng(random_state)
+
+        if method == 'lightweight':
+            sq_dist = cls.squared_distances_to_mean(data, chunk_size)
+            total = sq_dist.sum()
+            probability = np.full(n_rows, 1.0 / n_rows)
+            if total > 0:
+                probability = 0.5 * probability + 0.5 * sq_dist / total
+            sampled = rng.choice(n_rows, size, replace=True, p=probability)
+            # Повторно выбранные строки объединяются с суммарным весом
+            indices, repeats = np.unique(sampled, return_counts=True)
+            weights = repeats / (size * probability[indices])
+        elif method == 'uniform':
+            indices = np.sort(rng.choice(n_rows, size, replace=False))
+            weights = np.full(size, n_rows / size)
+        else:
+            if strata is None:
+                raise ValueError("Для стратифицированной выборки нужны группы строк (strata)")
+            indices, weights = cls.stratified_indices(np.asarray(strata), size, rng)
+
+        # Строки читаются по возрастанию позиций (для memmap — последовательно)
+        points = np.asarray(data[indices], dtype=np.float64)
+        return cls(points, weights, indices, method)
+
+    @staticmethod
+    def squared_distances_to_mean(data, chunk_size=65536):
+        mean = np.zeros(data.shape[1])
+        for start in range(0, len(data), chunk_size):
+            mean += np.asarray(data[start:start + chunk_size], dtype=np.float64).sum(axis=0)
+        mean /= max(len(data), 1)
+        sq_dist = np.empty(len(data))
+        for start in range(0, len(data), chunk_size):
+            deviations = np.asarray(data[start:start + chunk_size], dtype=np.float64) - mean
+            sq_dist[start:start + chunk_size] = np.einsum('ij,ij->i', deviations, deviations)
+        return sq_dist
+
+    @staticmethod
+    def stratified_indices(strata, size, rng):
+        groups, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+        allocation = np.minimum(counts, np.maximum(1, np.round(size * counts / len(strata)).astype(np.int64)))
+        # Случайный порядок внутри каждой группы: сортировка по (группа, случайный ключ)
+        order = np.lexsort((rng.random(len(strata)), inverse))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        parts = [order[start:start + take] for start, take in zip(starts, allocation)]
+        indices = np.concatenate(parts)
+        weights = np.repeat(counts / allocation, allocation)
+        position = np.argsort(indices)
+        return indices[position], weights[position]
+
+
+def assign_to_centers(data, centers, chunk_size=65536):
+    """
+    Метки ближайших центров и сумма квадратов расстояний (inertia) для всех строк, порциями.
+    """
+    labels = np.empty(len(data), dtype=np.int32)
+    inertia = 0.0
+    for start in range(0, len(data), chunk_size):
+        index, distances = nearest_centers(data[start:start + chunk_size], centers)
+        labels[start:start + len(index)] = index
+        inertia += float(np.dot(distances, distances))
+    return labels, inertia
+
+
+def approximation_report(data, centers, reference_centers, chunk_size=65536):
+    """
+    Погрешность центров, найденных по coreset, относительно центров полного обучения:
+    inertia обоих решений на всех строках, относительная разница и согласие меток (ARI).
+    """
+    labels, cost = assign_to_centers(data, centers, chunk_size)
+    reference_labels, reference_cost = assign_to_centers(data, reference_centers, chunk_size)
+    return {
+        'inertia': cost,
+        'reference_inertia': reference_cost,
+        'relative_error': cost / reference_cost - 1.0 if reference_cost > 0 else 0.0,
+        'ari': float(adjusted_rand_score(reference_labels, labels)),
+    }
@@ -1,150 +1,347 @@
 # data_processing.py
+import os
 import pandas as pd
 import numpy as np
-from tkinter import messagebox
-from sklearn.preprocessing import StandardScaler
-import csv
-import chardet
-from scipy import stats
+from preprocess_cache import PreprocessCache, dataset_fingerprint
+from streaming_loader import StreamingCSVLoader, detect_csv_format
+from dataset_cache import DatasetCache
+from preprocess_state import PreprocessState
+from column_stats import OUTLIER_RULES, OUTLIER_THRESHOLDS, ColumnStats
+from instrumentation import TRACER, traced
+
+# Идентификаторные столбцы, которые не участвуют в кластеризации
+ID_COLUMNS = ['CustomerID', 'InvoiceNo', 'ID', 'No', 'Date', 'Time', 'Dt_Customer']
+
+# CSV крупнее этого размера по умолчанию загружаются потоково
+STREAMING_THRESHOLD_BYTES = 256 * 1024 ** 2
+
+# Строк в выборке для квантилей (правила выбросов 'iqr' и 'mad')
+QUANTILE_SAMPLE_SIZE = 100000
+
+
+class ConsoleMessages:
+    """
+    Замена tkinter.messagebox для работы без интерфейса (пакетный режим, бенчмарки):
+    на вопросы выбирается ответ «да», тексты сообщений, предупреждений и ошибок
+    сохраняются в infos, warnings и errors. В консоль сообщения выводит сам DataProcessor.
+    """
+
+    def __init__(self):
+        self.infos = []
+        self.warnings = []
+        self.errors = []
+
+    def showinfo(self, title, message):
+        self.infos.append(message)
+
+    def showwarning(self, title, message):
+        self.warnings.append(message)
+
+    def showerror(self, title, message):
+        self.errors.append(message)
+
+    def askyesno(self, title, message):
+        print(f"{title}: {message} — да")
+        return True
 
 
 class DataProcessor:
-    def load_data(self, file_path):
+    def __init__(self, cache_size=8, dataset_cache=None, low_memory=False, interactive=True):
+        # Кэш результатов предобработки и запомненные ответы пользователя по каждому набору данных
+        self.preprocess_cache = PreprocessCache(max_entries=cache_size)
+        self.policy_choices = {}
+        self.streaming_loader = StreamingCSVLoader(ID_COLUMNS)
+        # Дисковый кэш разобранных файлов; None — кэш по умолчанию, False — без кэша
+        self.dataset_cache = DatasetCache() if dataset_cache is None else dataset_cache
+        # Параметры последней предобработки (для сохранения модели и оценки новых данных)
+        self.last_state = None
+        # Режим экономии памяти: CSV читаются потоково, признаки хранятся одной матрицей float32
+        self.low_memory = low_memory
+        # Без интерфейса диалоги заменяются выводом в консоль
+        self._messagebox = None if interactive else ConsoleMessages()
+
+    @property
+    def messagebox(self):
+        if self._messagebox is None:
+            from tkinter import messagebox  # Tk импортируется только при первом диалоге
+            self._messagebox = messagebox
+        return self._messagebox
+
+    def set_low_memory(self, enabled):
+        if enabled != self.low_memory:
+            self.low_memory = enabled
+            # Результаты предобработки в другом типе данных больше не нужны
+            self.preprocess_cache.clear()
+
+    @traced('DataProcessor.load_data')
+    def load_data(self, file_path, streaming=None):
+        """
+        streaming: True — потоковая загрузка числовых столбцов в float32 memmap,
+        False — обычное чтение, None — выбор по размеру файла (в режиме экономии памяти — всегда потоково).
+        """
         try:
             if file_path.endswith('.csv'):
-                # Определение кодировки файла с использованием chardet
-                with open(file_path, 'rb') as f:
-                    result = chardet.detect(f.read(100000))
-                    encoding = result['encoding']
-
-                # Определение разделителя автоматически
-                with open(file_path, 'r', encoding=encoding) as csvfile:
-                    sample = csvfile.read(1024)
-                    sniffer = csv.Sniffer()
-                    try:
-                        dialect = sniffer.sniff(sample)
-                        delimiter = dialect.delimiter
-                    except csv.Error:
-                        delimiter = ','  # По умолчанию запятая
-
-                # Чтение CSV с определенным разделителем
-                data = pd.read_csv(file_path, encoding=encoding, delimiter=delimiter)
-
+                if streaming is None:
+                    streaming = self.low_memory or os.path.getsize(file_path) >= STREAMING_THRESHOLD_BYTES
+                variant = 'streaming' if streaming else 'full'
             elif file_path.endswith('.xlsx'):
-                data = pd.read_excel(file_path)
+                variant = 'excel'
             else:
                 raise ValueError("Неподдерживаемый формат файла. Пожалуйста, загрузите файл CSV или Excel.")
 
+            data = self.load_cached(file_path, variant)
+            if data is None:
+                if variant == 'streaming':
+                    data = self.streaming_loader.load(file_path)
+                elif variant == 'full':
+                    # Кодировка и разделитель определяются по одному чтению начала файла
+                    with TRACER.span('detect_csv_format'):
+                        encoding, delimiter = detect_csv_format(file_path)
+
+                    # Чтение CSV с определенным разделителем
+                    with TRACER.span('read_csv', encoding=encoding) as span:
+                        data = pd.read_csv(file_path, encoding=encoding, delimiter=delimiter)
+                        span['rows'] = len(data)
+                else:
+                    with TRACER.span('read_excel') as span:
+                        data = pd.read_excel(file_path)
+                        span['rows'] = len(data)
+                with TRACER.span('dataset_cache.store', rows=len(data)):
+                    self.store_cached(file_path, data, variant)
+
             if data.shape[0] < 10:
-                messagebox.showwarning("Предупреждение", "Недостаточно данных для анализа.")
+                self.messagebox.showwarning("Предупреждение", "Недостаточно данных для анализа.")
+                print("Недостаточно данных для анализа.")
                 return None
             return data
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при загрузке файла: {e}")
+            self.messagebox.showerror("Ошибка", f"Ошибка при загрузке файла: {e}")
+            print(f"Ошибка при загрузке файла: {e}")
+            return None
+
+    def load_cached(self, file_path, variant):
+        if not self.dataset_cache:
+            return None
+        try:
+            data = self.dataset_cache.load(file_path, variant)
+        except Exception as e:
+            # Повреждённый кэш не должен мешать загрузке файла
+            print(f"Не удалось прочитать кэш данных: {e}")
             return None
+        if data is not None:
+            print("Данные загружены из дискового кэша:", self.dataset_cache.stats())
+        return data
+
+    def store_cached(self, file_path, data, variant):
+        if not self.dataset_cache:
+            return
+        try:
+            self.dataset_cache.store(file_path, data, variant)
+        except Exception as e:
+            print(f"Не удалось сохранить данные в кэш: {e}")
+
+    @traced('DataProcessor.preprocess_data')
+    def preprocess_data(self, data, nan_policy=None, outlier_policy=None, outlier_rule='zscore', messages=None):
+        """
+        Предобработка: выбор числовых столбцов, пропуски, выбросы, масштабирование.
 
-    def preprocess_data(self, data):
-        numeric_columns = self.find_numeric_columns(data)
+        nan_policy: 'median' или 'drop', outlier_policy: 'remove' или 'cap';
+        None — спросить пользователя (ответ запоминается для этого набора данных).
+        outlier_rule — правило поиска выбросов: 'zscore' (|z| > 3), 'iqr' (1.5 IQR
+        за квартилями) или 'mad' (3.5 приведённых MAD от медианы), см. ColumnStats.limits.
+        messages — замена self.messagebox для этого вызова (например, ConsoleMessages
+        при предобработке в фоновом потоке, где диалоги Tk недоступны).
+        Возвращает (масштабированные данные, столбцы, маска сохранённых строк);
+        найденные параметры предобработки сохраняются в self.last_state.
+        """
+        if outlier_rule not in OUTLIER_RULES:
+            raise ValueError(f"Неизвестное правило выбросов: {outlier_rule}")
+        fingerprint = dataset_fingerprint(data)
+        # Выбросы по разным правилам разные, поэтому ответы запоминаются для пары (данные, правило)
+        remembered = self.policy_choices.get((fingerprint, outlier_rule))
+        if remembered is not None:
+            # None в запомненном выборе означает, что вопрос для этих данных не возникал
+            nan_policy = None if remembered[0] is None else (nan_policy or remembered[0])
+            outlier_policy = None if remembered[1] is None else (outlier_policy or remembered[1])
+            cache_key = PreprocessCache.make_key(fingerprint, nan_policy, outlier_policy, outlier_rule)
+            cached = self.preprocess_cache.get(cache_key)
+            if cached is not None:
+                print("Результат предобработки взят из кэша:", self.preprocess_cache.stats())
+                self.last_state = cached[3]
+                return cached[:3]
+        else:
+            self.preprocess_cache.record_miss()
+
+        result, state, nan_policy, outlier_policy = self._preprocess(
+            data, nan_policy, outlier_policy, outlier_rule, messages or self.messagebox
+        )
+        if result[0] is None:
+            return result
+        self.last_state = state
+
+        self.policy_choices[(fingerprint, outlier_rule)] = (nan_policy, outlier_policy)
+        cache_key = PreprocessCache.make_key(fingerprint, nan_policy, outlier_policy, outlier_rule)
+        self.preprocess_cache.put(cache_key, result + (state,))
+        print("Результат предобработки сохранён в кэш:", self.preprocess_cache.stats())
+        return result
+
+    def _preprocess(self, data, nan_policy, outlier_policy, outlier_rule, messages):
+        # Возвращает результат, параметры предобработки и фактически применённые способы обработки
+        # (None — не требовалось)
+        failed = (None, None, None), None, None, None
+        with TRACER.span('detect_numeric_columns', rows=len(data)):
+            numeric_columns, converted = self._detect_numeric_columns(data, messages)
         if numeric_columns is None:
-            return None, None
-        data_cleaned = data[numeric_columns]
+            return failed
+        # Единственная копия данных: все дальнейшие шаги изменяют эту матрицу на месте
+        dtype = np.float32 if self.low_memory else np.float64
+        with TRACER.span('numeric_matrix', rows=len(data)):
+            matrix = self.numeric_matrix(data, numeric_columns, converted, dtype)
+        # Позиции сохранённых строк исходного DataFrame
+        kept_rows = np.arange(len(matrix))
+        applied_nan_policy = None
+        applied_outlier_policy = None
+        fill_values = None
+        lower_limits = upper_limits = None
 
         print("Начальные данные после выбора числовых столбцов:")
-        print(data_cleaned.head())
+        print(pd.DataFrame(matrix[:5], columns=numeric_columns))
 
         # Обработка пропущенных значений
-        if data_cleaned.isnull().sum().sum() > 0:
-            response = messagebox.askyesno(
-                "Обработка пропущенных значений",
-                "В данных имеются пропущенные значения. Заполнить их медианными значениями?"
-            )
-            if response:
-                data_cleaned = data_cleaned.fillna(data_cleaned.median())
-                messagebox.showinfo("Информация", "Пропущенные значения заполнены медианными значениями.")
+        missing = np.isnan(matrix)
+        if missing.any():
+            if nan_policy is None:
+                response = messages.askyesno(
+                    "Обработка пропущенных значений",
+                    "В данных имеются пропущенные значения. Заполнить их медианными значениями?"
+                )
+                nan_policy = 'median' if response else 'drop'
+            applied_nan_policy = nan_policy
+            if nan_policy == 'median':
+                fill_values = np.nanmedian(matrix, axis=0)
+                np.copyto(matrix, np.broadcast_to(fill_values, matrix.shape), where=missing)
+                messages.showinfo("Информация", "Пропущенные значения заполнены медианными значениями.")
                 print("Пропущенные значения заполнены медианными значениями.")
             else:
-                data_cleaned = data_cleaned.dropna()
-                messagebox.showinfo("Информация", "Строки с пропущенными значениями удалены.")
+                complete_rows = ~missing.any(axis=1)
+                matrix = matrix[complete_rows]
+                kept_rows = kept_rows[complete_rows]
+                messages.showinfo("Информация", "Строки с пропущенными значениями удалены.")
                 print("Строки с пропущенными значениями удалены.")
+        del missing
 
         # Проверка на наличие пропущенных значений после обработки
-        if data_cleaned.isnull().sum().sum() > 0:
-            messagebox.showerror("Ошибка", "После обработки пропущенных значений в данных всё ещё есть NaN.")
+        if np.isnan(matrix).any():
+            messages.showerror("Ошибка", "После обработки пропущенных значений в данных всё ещё есть NaN.")
             print("После обработки пропущенных значений в данных всё ещё есть NaN.")
-            return None, None
-
-        # Обработка аномально больших значений (удаление выбросов на основе Z-скора)
-        try:
-            z_scores = np.abs(stats.zscore(data_cleaned))
-            print("Z-scores вычислены успешно.")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при вычислении Z-скоров: {e}")
-            print(f"Ошибка при вычислении Z-скоров: {e}")
-            return None, None
+            return failed
 
-        # Замена возможных NaN в z_scores на 0, чтобы избежать проблем
-        z_scores = np.nan_to_num(z_scores, nan=0.0)
+        # Обработка аномальных значений по выбранному правилу (Z-оценка, IQR или MAD);
+        # статистики столбцов считаются за один проход и используются для поиска и ограничения выбросов,
+        # для IQR и MAD вместе с ними накапливается выборка строк для квантилей
+        reservoir_size = 0 if outlier_rule == 'zscore' else QUANTILE_SAMPLE_SIZE
+        with TRACER.span('column_stats', rows=len(matrix)):
+            column_stats = ColumnStats.from_matrix(matrix, reservoir_size=reservoir_size)
+        print("Статистики столбцов вычислены успешно.")
 
-        threshold = 3
-        outliers = (z_scores > threshold).any(axis=1)
+        threshold = OUTLIER_THRESHOLDS[outlier_rule]
+        outliers = column_stats.outlier_mask(matrix, outlier_rule, threshold)
         num_outliers = np.sum(outliers)
         print(f"Обнаружено выбросов: {num_outliers}")
 
         if num_outliers > 0:
-            response = messagebox.askyesno(
-                "Обработка выбросов",
-                f"В данных обнаружено {num_outliers} выбросов. Удалить их?"
-            )
-            if response:
-                data_cleaned = data_cleaned[~outliers]
-                messagebox.showinfo("Информация", f"Выбросы удалены. Оставлено {data_cleaned.shape[0]} записей.")
-                print(f"Выбросы удалены. Оставлено {data_cleaned.shape[0]} записей.")
+            if outlier_policy is None:
+                response = messages.askyesno(
+                    "Обработка выбросов",
+                    f"В данных обнаружено {num_outliers} выбросов. Удалить их?"
+                )
+                outlier_policy = 'remove' if response else 'cap'
+            applied_outlier_policy = outlier_policy
+            if outlier_policy == 'remove':
+                if num_outliers == len(matrix):
+                    # Правило отметило все строки (например, MAD на многомодальных данных)
+                    messages.showerror("Ошибка", "Все записи отмечены как выбросы: выберите другое правило "
+                                                 "или замену выбросов пороговыми значениями.")
+                    print("Все записи отмечены как выбросы.")
+                    return failed
+                matrix = matrix[~outliers]
+                kept_rows = kept_rows[~outliers]
+                messages.showinfo("Информация", f"Выбросы удалены. Оставлено {matrix.shape[0]} записей.")
+                print(f"Выбросы удалены. Оставлено {matrix.shape[0]} записей.")
             else:
                 # Альтернативный способ обработки выбросов: замена на пороговые значения
-                data_cleaned = self.cap_outliers(data_cleaned, z_scores, threshold)
-                messagebox.showinfo("Информация", "Выбросы заменены на пороговые значения.")
+                lower_limits, upper_limits = column_stats.limits(outlier_rule, threshold)
+                np.clip(matrix, lower_limits, upper_limits, out=matrix)
+                messages.showinfo("Информация", "Выбросы заменены на пороговые значения.")
                 print("Выбросы заменены на пороговые значения.")
+            # Статистики изменённых данных: для проверки выбросов и масштабирования
+            column_stats = ColumnStats.from_matrix(matrix, reservoir_size=reservoir_size)
 
         # Проверка на наличие выбросов после обработки
-        try:
-            z_scores_after = np.abs(stats.zscore(data_cleaned))
-            z_scores_after = np.nan_to_num(z_scores_after, nan=0.0)
-            if np.any(z_scores_after > threshold):
-                messagebox.showwarning("Предупреждение", "В данных всё ещё присутствуют выбросы.")
-                print("В данных всё ещё присутствуют выбросы.")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при проверке выбросов: {e}")
-            print(f"Ошибка при проверке выбросов: {e}")
+        if column_stats.outlier_mask(matrix, outlier_rule, threshold).any():
+            messages.showwarning("Предупреждение", "В данных всё ещё присутствуют выбросы.")
+            print("В данных всё ещё присутствуют выбросы.")
 
-        # Масштабирование данных
-        scaler = StandardScaler()
-        try:
-            scaled_data = scaler.fit_transform(data_cleaned)
-            print("Данные масштабированы успешно.")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при масштабировании данных: {e}")
-            print(f"Ошибка при масштабировании данных: {e}")
-            return None, None
+        # Масштабирование данных (как StandardScaler, на месте)
+        with TRACER.span('scale_matrix', rows=len(matrix)):
+            scaled_data = column_stats.scale_matrix(matrix, out=matrix)
+        print("Данные масштабированы успешно.")
 
         # Проверка на наличие NaN после масштабирования
         if np.isnan(scaled_data).any():
-            messagebox.showerror("Ошибка", "После масштабирования данные содержат NaN.")
+            messages.showerror("Ошибка", "После масштабирования данные содержат NaN.")
             print("После масштабирования данные содержат NaN.")
-            return None, None
+            return failed
 
         print("Масштабированные данные:")
         print(scaled_data[:5])
 
-        return scaled_data, data_cleaned.columns
+        row_mask = np.zeros(len(data), dtype=bool)
+        row_mask[kept_rows] = True
+        columns = pd.Index(numeric_columns)
+        state = PreprocessState(
+            columns, column_stats.mean, column_stats.scale,
+            nan_policy=applied_nan_policy, fill_values=fill_values,
+            outlier_policy=applied_outlier_policy, lower=lower_limits, upper=upper_limits, outlier_rule=outlier_rule,
+        )
+        result = (scaled_data, columns, row_mask)
+        return result, state, applied_nan_policy, applied_outlier_policy
+
+    def numeric_matrix(self, data, numeric_columns, converted=None, dtype=np.float64):
+        # Матрица выбранных столбцов; converted — столбцы, уже приведённые к числовому типу
+        converted = converted or {}
+        matrix = np.empty((len(data), len(numeric_columns)), dtype=dtype)
+        for j, col in enumerate(numeric_columns):
+            values = converted[col] if col in converted else data[col]
+            matrix[:, j] = values.to_numpy(dtype=dtype, na_value=np.nan)
+        return matrix
+
+    def save_with_clusters(self, data, row_mask, clusters, file_path, chunk_size=100000):
+        """
+        Запись сохранённых строк с метками кластеров в CSV порциями:
+        столбец Cluster присоединяется к каждой порции, полная копия данных не создаётся.
+        """
+        rows = np.flatnonzero(row_mask)
+        for start in range(0, len(rows), chunk_size):
+            chunk = data.iloc[rows[start:start + chunk_size]]
+            chunk = chunk.assign(Cluster=clusters[start:start + chunk_size])
+            chunk.to_csv(file_path, mode='w' if start == 0 else 'a', header=(start == 0), index=False)
+        if len(rows) == 0:
+            data.iloc[:0].assign(Cluster=[]).to_csv(file_path, index=False)
 
     def find_numeric_columns(self, data):
+        numeric_columns, _ = self._detect_numeric_columns(data)
+        return numeric_columns
+
+    def _detect_numeric_columns(self, data, messages=None):
+        # Возвращает числовые столбцы и словарь столбцов, преобразованных в числовой тип
         # Исключение идентификаторных столбцов на основе точных названий
-        exclude_columns_exact = ['CustomerID', 'InvoiceNo', 'ID', 'No', 'Date', 'Time', 'Dt_Customer']
-        exclude_columns = [col for col in data.columns if col in exclude_columns_exact]
+        exclude_columns = [col for col in data.columns if col in ID_COLUMNS]
 
         # Оставшиеся столбцы пытаемся преобразовать в числовые
         potential_numeric = [col for col in data.columns if col not in exclude_columns]
         numeric_columns = []
+        converted = {}
         for col in potential_numeric:
             # Если столбец уже числовой
             if pd.api.types.is_numeric_dtype(data[col]):
@@ -153,27 +350,15 @@ class DataProcessor:
                 # Попытка конвертации в числовой тип
                 converted_col = pd.to_numeric(data[col], errors='coerce')
                 if converted_col.notnull().sum() >= 2:  # Требуется минимум 2 ненулевых значения
-                    data[col] = converted_col
+                    converted[col] = converted_col
                     numeric_columns.append(col)
 
         if len(numeric_columns) < 2:
-            messagebox.showerror("Ошибка", "Недостаточно числовых столбцов для кластеризации.")
+            (messages or self.messagebox).showerror("Ошибка", "Недостаточно числовых столбцов для кластеризации.")
             print("Недостаточно числовых столбцов для кластеризации.")
-            return None
+            return None, None
 
         # Вывод найденных числовых столбцов для отладки
         print("Найденные числовые столбцы для кластеризации:", numeric_columns)
 
-        return numeric_columns
-
-    def cap_outliers(self, data, z_scores, threshold):
-        """
-        Замена выбросов на пороговые значения.
-        """
-        data_capped = data.copy()
-        for col in data.columns:
-            upper_limit = data[col].mean() + threshold * data[col].std()
-            lower_limit = data[col].mean() - threshold * data[col].std()
-            data_capped[col] = np.where(data[col] > upper_limit, upper_limit,
-                                        np.where(data[col] < lower_limit, lower_limit, data[col]))
-        return data_capped
+        return numeric_columns, converted
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+# Каталог кэша можно переопределить переменной окружения
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CLUSTERING_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'customer_clustering')
+)
+
+# Размер порции при хэшировании всего файла
+HASH_READ_SIZE = 1024 ** 2
+
+
+class DatasetCache:
+    """
+    Дисковый кэш разобранных наборов данных.
+
+    Ключ — путь, размер, время изменения и хэш всего содержимого файла (один
+    последовательный проход, дешёвый по сравнению с разбором CSV). С sampled_hash=True
+    хэшируются только hash_blocks блоков, равномерно распределённых по файлу: это быстрее
+    для очень больших файлов, но правка того же размера вне этих блоков с сохранённым
+    временем изменения (cp -p, rsync) останется незамеченной.
+
+    Числовые столбцы одного типа хранятся одной матрицей .npy и при чтении
+    отображаются в память, остальные столбцы сериализуются pickle. Общий размер
+    ограничен max_bytes, при превышении удаляются давно не использованные записи (LRU).
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=5 * 1024 ** 3, sampled_hash=False, hash_blocks=16,
+                 block_size=64 * 1024):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.sampled_hash = sampled_hash
+        self.hash_blocks = hash_blocks
+        self.block_size = block_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def file_key(self, file_path, variant=''):
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(f"{file_path}|{stat.st_size}|{stat.st_mtime_ns}|{variant}".encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            if not self.sampled_hash or stat.st_size <= self.hash_blocks * self.block_size:
+                for block in iter(lambda: f.read(HASH_READ_SIZE), b''):
+                    hasher.update(block)
+            else:
+                for offset in np.linspace(0, stat.st_size - self.block_size, self.hash_blocks).astype(np.int64):
+                    f.seek(int(offset))
+                    hasher.update(f.read(self.block_size))
+        return hasher.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, file_path, variant=''):
+        entry_dir = self._entry_dir(self.file_key(file_path, variant))
+        manifest_path = os.path.join(entry_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            self.misses += 1
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        groups = sorted(manifest['groups'], key=lambda group: len(group['columns']), reverse=True)
+        if groups:
+            # Самая крупная группа образует основной блок DataFrame без копирования
+            main = groups[0]
+            matrix = np.load(os.path.join(entry_dir, main['file']), mmap_mode='r')
+            data = pd.DataFrame(matrix, columns=main['columns'], copy=False)
+        else:
+            data = pd.DataFrame(index=pd.RangeIndex(manifest['rows']))
+        position = {col: i for i, col in enumerate(manifest['columns'])}
+
+        def insert(col, values):
+            loc = sum(1 for existing in data.columns if position[existing] < position[col])
+            data.insert(loc, col, values)
+
+        for group in groups[1:]:
+            matrix = np.load(os.path.join(entry_dir, group['file']), mmap_mode='r')
+            for j, col in enumerate(group['columns']):
+                insert(col, matrix[:, j])
+        for col, file_name in manifest['objects']:
+            insert(col, pd.read_pickle(os.path.join(entry_dir, file_name)))
+
+        os.utime(manifest_path)
+        self.hits += 1
+        return data
+
+    def store(self, file_path, data, variant=''):
+        key = self.file_key(file_path, variant)
+        entry_dir = self._entry_dir(key)
+        temp_dir = entry_dir + f'.tmp{os.getpid()}'
+        os.makedirs(temp_dir, exist_ok=True)
+
+        groups = {}
+        objects = []
+        for i, (col, dtype) in enumerate(data.dtypes.items()):
+            if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+                groups.setdefault(dtype.str, []).append(col)
+            else:
+                file_name = f'col_{i}.pkl'
+                data[col].to_pickle(os.path.join(temp_dir, file_name))
+                objects.append((col, file_name))
+
+        manifest_groups = []
+        for n, (dtype_str, columns) in enumerate(groups.items()):
+            file_name = f'group_{n}.npy'
+            np.save(os.path.join(temp_dir, file_name), np.ascontiguousarray(data[columns].to_numpy()))
+            manifest_groups.append({'file': file_name, 'dtype': dtype_str, 'columns': columns})
+
+        manifest = {
+            'source': os.path.abspath(file_path),
+            'rows': len(data),
+            'columns': list(data.columns),
+            'groups': manifest_groups,
+            'objects': objects,
+            'created': time.time(),
+        }
+        with open(os.path.join(temp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(temp_dir, entry_dir)
+        self.evict(keep=key)
+
+    def entries(self):
+        # (время последнего доступа, размер, ключ) для всех записей кэша
+        result = []
+        if not os.path.isdir(self.cache_dir):
+            return result
+        for key in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(key)
+            manifest_path = os.path.join(entry_dir, 'manifest.json')
+            if not os.path.exists(manifest_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            result.append((os.path.getmtime(manifest_path), size, key))
+        return result
+
+    def evict(self, keep=None):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+        }
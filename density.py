@@ -0,0 +1,94 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import NearestNeighbors
+
+
+class NeighborGraphDBSCAN:
+    """
+    DBSCAN поверх закэшированного графа соседей.
+
+    Пространственный индекс и разреженный граф соседей в радиусе graph_eps
+    строятся один раз; любой запуск с eps <= graph_eps и любым min_samples
+    только фильтрует рёбра графа, находит компоненты связности ядровых точек
+    и присоединяет пограничные точки. Если запрошен eps больше построенного,
+    граф перестраивается с запасом headroom.
+    Пограничная точка, достижимая из нескольких кластеров, получает метку
+    одного из них (как и в DBSCAN, выбор не определён порядком обхода).
+    """
+
+    def __init__(self, headroom=1.25, n_jobs=-1):
+        self.headroom = headroom
+        self.n_jobs = n_jobs
+        self.graph = None
+        self.graph_eps = None
+        self._data = None
+        self._row_ids = None
+        self.core_sample_mask_ = None
+
+    def build(self, scaled_data, max_eps):
+        index = NearestNeighbors(radius=max_eps, n_jobs=self.n_jobs).fit(scaled_data)
+        # X=None: соседи без самой точки, расстояния хранятся явно (в том числе нулевые)
+        graph = index.radius_neighbors_graph(None, mode='distance')
+        self.graph = graph.tocsr()
+        self.graph_eps = max_eps
+        self._data = scaled_data
+        self._row_ids = np.repeat(np.arange(graph.shape[0]), np.diff(self.graph.indptr))
+        print(f"Граф соседей построен: eps={max_eps:.4f}, рёбер {self.graph.nnz}")
+
+    def ensure_graph(self, scaled_data, eps):
+        if self._data is not scaled_data or self.graph_eps is None or eps > self.graph_eps:
+            self.build(scaled_data, eps * self.headroom)
+
+    def fit_predict(self, scaled_data, eps=0.5, min_samples=5):
+        self.ensure_graph(scaled_data, eps)
+        n = self.graph.shape[0]
+        rows = self._row_ids
+        cols = self.graph.indices
+        within = self.graph.data <= eps
+
+        # min_samples, как и в DBSCAN, учитывает саму точку
+        degree = np.bincount(rows[within], minlength=n) + 1
+        core = degree >= min_samples
+
+        labels = np.full(n, -1, dtype=np.int64)
+        core_edges = within & core[rows] & core[cols]
+        core_graph = sparse.csr_matrix(
+            (np.ones(core_edges.sum(), dtype=np.int8), (rows[core_edges], cols[core_edges])), shape=(n, n)
+        )
+        _, components = connected_components(core_graph, directed=False)
+        # Номера кластеров — последовательные номера компонент, содержащих ядровые точки
+        _, core_labels = np.unique(components[core], return_inverse=True)
+        labels[core] = core_labels.ravel()
+
+        self.core_sample_mask_ = core
+        border_edges = within & ~core[rows] & core[cols]
+        border_points, first_edge = np.unique(rows[border_edges], return_index=True)
+        labels[border_points] = labels[cols[border_edges][first_edge]]
+        return labels
+
+    def k_distance(self, scaled_data, k=5, sample_size=20000, random_state=42):
+        """
+        Отсортированные расстояния до k-го соседя (считая саму точку) для выборки строк.
+        """
+        rng = np.random.default_rng(random_state)
+        if len(scaled_data) > sample_size:
+            sample = scaled_data[rng.choice(len(scaled_data), sample_size, replace=False)]
+        else:
+            sample = scaled_data
+        index = NearestNeighbors(n_neighbors=k, n_jobs=self.n_jobs).fit(scaled_data)
+        distances, _ = index.kneighbors(sample)
+        return np.sort(distances[:, -1])
+
+    def suggest_eps(self, k_distances):
+        """
+        Точка «колена» k-distance кривой: наибольшее отклонение от хорды
+        между первой и последней точками (в нормированных координатах).
+        """
+        if len(k_distances) < 3:
+            return float(k_distances[-1])
+        x = np.linspace(0.0, 1.0, len(k_distances))
+        span = k_distances[-1] - k_distances[0]
+        y = (k_distances - k_distances[0]) / span if span > 0 else np.zeros_like(k_distances)
+        knee = int(np.argmax(x - y))
+        return float(k_distances[knee])
@@ -0,0 +1,153 @@
+import time
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import adjusted_rand_score
+
+from model_bundle import nearest_centers
+
+ENSEMBLE_ALGORITHMS = ('kmeans', 'minibatch')
+# Критерии выбора лучшего запуска; для inertia и Davies-Bouldin лучше меньшее значение
+SELECTION_CRITERIA = ('inertia', 'silhouette', 'calinski_harabasz', 'davies_bouldin')
+
+
+def fit_run(scaled_data, algorithm, n_clusters, seed, selection, sample_index, batch_size=4096):
+    """
+    Один запуск ансамбля; функция уровня модуля, чтобы её можно было передать в рабочий процесс.
+    Возвращает центры, inertia на всех строках, оценку по выборке строк и метки этой выборки
+    (по ним считается согласие запусков между собой).
+    """
+    from clustering import score_labels
+
+    start = time.perf_counter()
+    if algorithm == 'minibatch':
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=1, random_state=seed)
+    else:
+        model = KMeans(n_clusters=n_clusters, n_init=1, random_state=seed)
+    model.fit(scaled_data)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sample = np.asarray(scaled_data[sample_index], dtype=np.float64)
+    sample_labels, _ = nearest_centers(sample, model.cluster_centers_)
+    if selection == 'inertia':
+        score = float(model.inertia_)
+    elif len(np.unique(sample_labels)) > 1:
+        score = float(score_labels(sample, sample_labels, selection, sample_size=None))
+    else:
+        score = np.nan
+    return {
+        'algorithm': algorithm,
+        'seed': seed,
+        'inertia': float(model.inertia_),
+        'score': score,
+        'iterations': int(model.n_iter_),
+        'centers': model.cluster_centers_,
+        'sample_labels': sample_labels.astype(np.int32),
+        'timing': {'fit': fit_time, 'score': time.perf_counter() - start},
+    }
+
+
+def spread(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    return {'min': float(values.min()), 'median': float(np.median(values)), 'max': float(values.max()),
+            'std': float(values.std())}
+
+
+class EnsembleClustering:
+    """
+    Несколько запусков K-Means с разными начальными центрами (seed) и, по желанию,
+    разными алгоритмами, параллельно в пуле процессов.
+
+    Масштабированная матрица не копируется в каждый процесс: joblib сохраняет её
+    один раз во временный файл и открывает в рабочих процессах только для чтения
+    (np.memmap). Лучший запуск выбирается по inertia на всех строках или по
+    критерию качества (силуэт, Calinski-Harabasz, Davies-Bouldin) на общей
+    выборке строк. Разброс inertia и оценок по запускам и согласие меток с лучшим
+    запуском (ARI на той же выборке) показывают, насколько устойчиво решение.
+    """
+
+    def __init__(self, n_clusters, n_runs=8, algorithms=('kmeans',), selection='inertia', sample_size=5000,
+                 batch_size=4096, n_jobs=-1, random_state=42):
+        unknown = set(algorithms) - set(ENSEMBLE_ALGORITHMS)
+        if unknown:
+            raise ValueError(f"Неизвестные алгоритмы ансамбля: {sorted(unknown)}")
+        if selection not in SELECTION_CRITERIA:
+            raise ValueError(f"Неизвестный критерий выбора: {selection}")
+        self.n_clusters = n_clusters
+        self.n_runs = n_runs
+        self.algorithms = tuple(algorithms)
+        self.selection = selection
+        self.sample_size = sample_size
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.runs = []
+        self.best_index = None
+
+    @property
+    def best(self):
+        return self.runs[self.best_index]
+
+    def tasks(self):
+        # Каждый алгоритм запускается n_runs раз с одинаковым набором seed
+        return [(algorithm, self.random_state + i) for algorithm in self.algorithms for i in range(self.n_runs)]
+
+    def fit(self, scaled_data, progress=None):
+        rng = np.random.default_rng(self.random_state)
+        if len(scaled_data) > self.sample_size:
+            sample_index = np.sort(rng.choice(len(scaled_data), self.sample_size, replace=False))
+        else:
+            sample_index = np.arange(len(scaled_data))
+        tasks = self.tasks()
+        n_jobs = min(effective_n_jobs(self.n_jobs), len(tasks))
+        # Результаты приходят по мере готовности, чтобы показывать ход расчёта
+        runs = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r', return_as='generator')(
+            delayed(fit_run)(scaled_data, algorithm, self.n_clusters, seed, self.selection, sample_index,
+                             self.batch_size)
+            for algorithm, seed in tasks
+        )
+        self.runs = []
+        for run in runs:
+            self.runs.append(run)
+            if progress is not None:
+                progress(len(self.runs), len(tasks), (run['algorithm'], run['seed'], run['score']))
+        scores = np.array([run['score'] for run in self.runs])
+        if np.isnan(scores).all():
+            scores = np.array([run['inertia'] for run in self.runs])
+            higher_is_better = False
+        else:
+            higher_is_better = self.selection in ('silhouette', 'calinski_harabasz')
+        if higher_is_better:
+            self.best_index = int(np.nanargmax(scores))
+        else:
+            self.best_index = int(np.nanargmin(scores))
+        return self
+
+    def report(self):
+        """
+        Сводка по запускам: лучший запуск, разброс inertia и оценок, согласие меток (ARI)
+        каждого запуска с лучшим и среднее попарное согласие.
+        """
+        best_labels = self.best['sample_labels']
+        ari_to_best = [float(adjusted_rand_score(best_labels, run['sample_labels'])) for run in self.runs]
+        pairwise = [adjusted_rand_score(a['sample_labels'], b['sample_labels'])
+                    for i, a in enumerate(self.runs) for b in self.runs[i + 1:]]
+        runs = [{key: run[key] for key in ('algorithm', 'seed', 'inertia', 'score', 'iterations', 'timing')}
+                for run in self.runs]
+        for run, ari in zip(runs, ari_to_best):
+            run['ari_to_best'] = ari
+        return {
+            'selection': self.selection,
+            'best': {key: self.best[key] for key in ('algorithm', 'seed', 'inertia', 'score')},
+            'inertia': spread([run['inertia'] for run in self.runs]),
+            'score': spread([run['score'] for run in self.runs]),
+            'ari_to_best': spread(ari_to_best),
+            'mean_pairwise_ari': float(np.mean(pairwise)) if pairwise else 1.0,
+            'fit_seconds': float(sum(run['timing']['fit'] for run in self.runs)),
+            'runs': runs,
+        }
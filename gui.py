@@ -1,12 +1,63 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import ttkbootstrap as ttk
-from data_processing import DataProcessor
-from clustering import Clustering
-from visualization import Visualization
+import numpy as np
+from job_scheduler import JobScheduler
+from virtual_table import TableModel, VirtualTable
+from memory import MemoryTracker, compact_labels
+from instrumentation import TRACER
+from lazy_import import IMPORT_TIMES, LazyComponent, LazyModule, warm_up
+
+# Научные библиотеки загружаются при первом использовании, чтобы окно появлялось сразу
+pd = LazyModule('pandas')
+
+# Метод кластеризации, читающий исходный CSV порциями без загрузки в память
+STREAMING_KMEANS = "MiniBatch K-Means (потоковый)"
+
+# K-Means, обучаемый по взвешенному coreset, с присвоением всех строк найденным центрам
+CORESET_KMEANS = "K-Means (coreset)"
+DEFAULT_CORESET_SIZE = 20000
+
+# Несколько запусков K-Means с разными seed параллельно, с выбором лучшего
+ENSEMBLE_KMEANS = "K-Means (несколько запусков)"
+DEFAULT_ENSEMBLE_RUNS = 8
+
+# Пункт выбора кластера, означающий все строки
+ALL_CLUSTERS = "Все"
+
 
 class ClusteringApp(ttk.Window):
-    def __init__(self):
+    # Подписи критериев выбора k в интерфейсе
+    ELBOW_CRITERIA_LABELS = {
+        "Силуэт (по выборке)": 'silhouette',
+        "Calinski-Harabasz": 'calinski_harabasz',
+        "Davies-Bouldin": 'davies_bouldin',
+    }
+
+    # Критерии выбора лучшего запуска ансамбля K-Means
+    ENSEMBLE_SELECTION_LABELS = {"Инерция": 'inertia', **ELBOW_CRITERIA_LABELS}
+
+    # Правила поиска выбросов при предобработке
+    OUTLIER_RULE_LABELS = {
+        "Z-оценка (|z| > 3)": 'zscore',
+        "Межквартильный размах (1.5 IQR)": 'iqr',
+        "Медианное отклонение (3.5 MAD)": 'mad',
+    }
+
+    # Снижение размерности масштабированных данных перед кластеризацией
+    REDUCTION_LABELS = {
+        "Без снижения размерности": None,
+        "PCA (95% дисперсии)": 'pca',
+        "Рандомизированный PCA (95% дисперсии)": 'randomized_pca',
+        "Случайная проекция": 'random_projection',
+    }
+
+    # Компоненты создаются при первом обращении (загрузка, кластеризация, графики)
+    data_processor = LazyComponent('data_processing', 'DataProcessor')
+    clustering = LazyComponent('clustering', 'Clustering')
+    visualization = LazyComponent('visualization', 'Visualization')
+
+    def __init__(self, warm_up_imports=True):
         super().__init__(themename='superhero')
         self.title("Система кластеризации клиентов")
         self.geometry("1200x800")
@@ -14,15 +65,26 @@ class ClusteringApp(ttk.Window):
         self.protocol("WM_DELETE_WINDOW", self.on_closing)  # Обеспечивает корректное закрытие приложения
 
         # Инициализация компонентов
-        self.data_processor = DataProcessor()
-        self.clustering = Clustering()
-        self.visualization = Visualization()
+        self.scheduler = JobScheduler(self)
+        self.memory = MemoryTracker()
+        self.low_memory = tk.BooleanVar(value=False)
+        self.tracing = tk.BooleanVar(value=TRACER.enabled)
+        self.reduction_method = tk.StringVar(value=next(iter(self.REDUCTION_LABELS)))
+        self.outlier_rule = tk.StringVar(value=next(iter(self.OUTLIER_RULE_LABELS)))
 
         # Данные
         self.loaded_data = None
+        self.loaded_file_path = None
         self.scaled_data = None
         self.data_columns = None
+        self.row_mask = None  # Строки исходных данных, оставшиеся после предобработки
+        self.reduction = None  # Проекция, которой получены scaled_data (если размерность снижалась)
+        self.model_reduction = None  # Проекция данных последней кластеризации (сохраняется с моделью)
+        self.model_state = None  # Параметры предобработки данных последней кластеризации
+        self.policy_answers = {}  # Ответы на вопросы предобработки для загруженных данных (по правилу выбросов)
         self.clusters = None  # Массив с метками кластеров
+        self.silhouette_result = None  # Оценка силуэта и распределения по кластерам
+        self.cluster_profiles = None  # Статистики и обратный индекс строк по кластерам
 
         # Создание меню
         self.create_menu()
@@ -33,7 +95,14 @@ class ClusteringApp(ttk.Window):
         # Привязка событий
         self.cluster_method.bind("<<ComboboxSelected>>", self.on_method_change)
 
+        # Фоновая загрузка библиотек после отрисовки окна
+        if warm_up_imports:
+            self.after(200, warm_up)
+
     def on_closing(self):
+        self.scheduler.shutdown()
+        if ClusteringApp.visualization.is_loaded(self):
+            self.visualization.figures.release_all()
         self.destroy()
         self.quit()
 
@@ -44,11 +113,28 @@ class ClusteringApp(ttk.Window):
         file_menu = ttk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Файл", menu=file_menu)
         file_menu.add_command(label="Загрузить данные", command=self.load_data)
+        file_menu.add_command(label="Очистить кэш данных", command=self.clear_cache)
+        file_menu.add_checkbutton(label="Режим экономии памяти", variable=self.low_memory,
+                                  command=self.toggle_low_memory)
+        outlier_menu = ttk.Menu(file_menu, tearoff=0)
+        file_menu.add_cascade(label="Правило выбросов", menu=outlier_menu)
+        for label in self.OUTLIER_RULE_LABELS:
+            outlier_menu.add_radiobutton(label=label, value=label, variable=self.outlier_rule)
+        reduction_menu = ttk.Menu(file_menu, tearoff=0)
+        file_menu.add_cascade(label="Снижение размерности", menu=reduction_menu)
+        for label in self.REDUCTION_LABELS:
+            reduction_menu.add_radiobutton(label=label, value=label, variable=self.reduction_method)
         file_menu.add_separator()
         file_menu.add_command(label="Выход", command=self.on_closing)
 
+        model_menu = ttk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Модель", menu=model_menu)
+        model_menu.add_command(label="Сохранить модель", command=self.save_model)
+        model_menu.add_command(label="Оценить новые данные", command=self.score_with_model)
+
         help_menu = ttk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Справка", menu=help_menu)
+        help_menu.add_command(label="Потребление памяти", command=self.show_memory_report)
         help_menu.add_command(label="О программе", command=self.show_about)
 
     def create_tabs(self):
@@ -76,6 +162,12 @@ class ClusteringApp(ttk.Window):
         self.notebook.add(self.tab4, text='Результаты и статистика')
         self.create_tab4_widgets()
 
+        # Вкладка 5: Диагностика (время и память этапов)
+        self.tab5 = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab5, text='Диагностика')
+        self.create_tab5_widgets()
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
     def create_tab1_widgets(self):
         # Элементы управления на вкладке 1
         frame = ttk.Frame(self.tab1)
@@ -84,27 +176,37 @@ class ClusteringApp(ttk.Window):
         self.load_button = ttk.Button(frame, text="Загрузить данные", command=self.load_data, bootstyle="success")
         self.load_button.pack(pady=20)
 
-        # Создаем фрейм для таблицы и скроллбаров
-        tree_frame = ttk.Frame(frame)
-        tree_frame.pack(fill='both', expand=True)
-
-        # Таблица для отображения данных
-        self.data_treeview = ttk.Treeview(tree_frame)
-        self.data_treeview.pack(side='left', fill='both', expand=True)
-
-        # Скроллбары
-        scrollbar_y = ttk.Scrollbar(tree_frame, orient="vertical", command=self.data_treeview.yview)
-        scrollbar_y.pack(side='right', fill='y')
-
-        scrollbar_x = ttk.Scrollbar(frame, orient="horizontal", command=self.data_treeview.xview)
-        scrollbar_x.pack(side='bottom', fill='x')
-
-        self.data_treeview.configure(yscroll=scrollbar_y.set, xscroll=scrollbar_x.set)
+        # Таблица для отображения данных (строки подгружаются при прокрутке)
+        self.data_table = VirtualTable(frame)
+        self.data_table.pack(fill='both', expand=True)
 
     def create_tab2_widgets(self):
         frame = ttk.Frame(self.tab2)
         frame.pack(fill='both', expand=True, padx=10, pady=10)
 
+        # Параметры перебора количества кластеров
+        options_frame = ttk.Frame(frame)
+        options_frame.pack(pady=(20, 0))
+
+        ttk.Label(options_frame, text="Критерий:").grid(row=0, column=0, padx=5, sticky='e')
+        self.elbow_criterion = ttk.Combobox(
+            options_frame, values=list(self.ELBOW_CRITERIA_LABELS), state='readonly', width=25
+        )
+        self.elbow_criterion.grid(row=0, column=1, padx=5, sticky='w')
+        self.elbow_criterion.current(0)
+
+        self.elbow_warm_start = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Тёплый старт от центров меньшего k", variable=self.elbow_warm_start).grid(
+            row=1, column=0, columnspan=2, pady=5, sticky='w'
+        )
+        self.elbow_early_stop = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Остановить, когда кривая выйдет на плато", variable=self.elbow_early_stop).grid(
+            row=2, column=0, columnspan=2, pady=5, sticky='w'
+        )
+        self.elbow_coreset = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text=f"Перебор по coreset ({DEFAULT_CORESET_SIZE} строк) для больших данных",
+                        variable=self.elbow_coreset).grid(row=3, column=0, columnspan=2, pady=5, sticky='w')
+
         self.elbow_button = ttk.Button(frame, text="Определить оптимальное число кластеров", command=self.elbow_method, bootstyle="primary")
         self.elbow_button.pack(pady=20)
 
@@ -112,6 +214,15 @@ class ClusteringApp(ttk.Window):
         self.optimal_clusters_label = ttk.Label(frame, text="Оптимальное количество кластеров: ")
         self.optimal_clusters_label.pack(pady=5)
 
+        self.elbow_progress_bar = ttk.Progressbar(frame, orient="horizontal", length=200, mode="determinate")
+        self.elbow_progress_bar.pack(pady=5)
+
+        self.elbow_status_label = ttk.Label(frame, text="")
+        self.elbow_status_label.pack(pady=5)
+
+        self.elbow_cancel_button = ttk.Button(frame, text="Отменить", command=self.cancel_job, bootstyle="danger", state='disabled')
+        self.elbow_cancel_button.pack(pady=5)
+
     def create_tab3_widgets(self):
         frame = ttk.Frame(self.tab3)
         frame.pack(fill='both', expand=True, padx=10, pady=10)
@@ -119,7 +230,7 @@ class ClusteringApp(ttk.Window):
         self.cluster_method_label = ttk.Label(frame, text="Метод кластеризации:")
         self.cluster_method_label.grid(row=0, column=0, pady=5, sticky='e')
 
-        self.cluster_method = ttk.Combobox(frame, values=["K-Means", "DBSCAN", "SOM"], state='readonly')
+        self.cluster_method = ttk.Combobox(frame, values=["K-Means", ENSEMBLE_KMEANS, CORESET_KMEANS, STREAMING_KMEANS, "DBSCAN", "SOM"], state='readonly', width=30)
         self.cluster_method.grid(row=0, column=1, pady=5, sticky='w')
         self.cluster_method.current(0)
 
@@ -134,11 +245,33 @@ class ClusteringApp(ttk.Window):
         self.eps_entry = ttk.Entry(frame)
         self.min_samples_label = ttk.Label(frame, text="min_samples (для DBSCAN):")
         self.min_samples_entry = ttk.Entry(frame)
+        self.suggest_eps_button = ttk.Button(frame, text="Подобрать eps (k-distance)", command=self.suggest_eps, bootstyle="info")
+
+        # Параметры потокового K-Means
+        self.passes_label = ttk.Label(frame, text="Проходов по файлу:")
+        self.passes_entry = ttk.Entry(frame)
+
+        # Параметры K-Means по coreset
+        self.coreset_label = ttk.Label(frame, text="Строк в coreset:")
+        self.coreset_entry = ttk.Entry(frame)
+
+        # Параметры ансамбля K-Means
+        self.runs_label = ttk.Label(frame, text="Запусков с разными seed:")
+        self.runs_entry = ttk.Entry(frame)
+        self.selection_label = ttk.Label(frame, text="Выбор лучшего запуска:")
+        self.ensemble_selection = ttk.Combobox(
+            frame, values=list(self.ENSEMBLE_SELECTION_LABELS), state='readonly', width=30
+        )
+        self.ensemble_selection.current(0)
+        self.ensemble_minibatch = tk.BooleanVar(value=False)
+        self.ensemble_minibatch_check = ttk.Checkbutton(
+            frame, text="Также запуски MiniBatch K-Means", variable=self.ensemble_minibatch
+        )
 
         # Параметры SOM
         self.som_size_label = ttk.Label(frame, text="Размер карты SOM:")
         self.som_size_entry = ttk.Entry(frame)
-        self.som_iterations_label = ttk.Label(frame, text="Итерации SOM:")
+        self.som_iterations_label = ttk.Label(frame, text="Эпохи SOM (пакетное обучение):")
         self.som_iterations_entry = ttk.Entry(frame)
 
         # По умолчанию скрываем дополнительные параметры
@@ -146,10 +279,20 @@ class ClusteringApp(ttk.Window):
         self.eps_entry.grid_forget()
         self.min_samples_label.grid_forget()
         self.min_samples_entry.grid_forget()
+        self.suggest_eps_button.grid_forget()
         self.som_size_label.grid_forget()
         self.som_size_entry.grid_forget()
         self.som_iterations_label.grid_forget()
         self.som_iterations_entry.grid_forget()
+        self.passes_label.grid_forget()
+        self.passes_entry.grid_forget()
+        self.coreset_label.grid_forget()
+        self.coreset_entry.grid_forget()
+        self.runs_label.grid_forget()
+        self.runs_entry.grid_forget()
+        self.selection_label.grid_forget()
+        self.ensemble_selection.grid_forget()
+        self.ensemble_minibatch_check.grid_forget()
 
         self.cluster_button = ttk.Button(frame, text="Выполнить кластеризацию", command=self.perform_clustering, bootstyle="success")
         self.cluster_button.grid(row=6, column=0, columnspan=2, pady=20)
@@ -158,6 +301,12 @@ class ClusteringApp(ttk.Window):
         self.progress_bar = ttk.Progressbar(frame, orient="horizontal", length=200, mode="indeterminate")
         self.progress_bar.grid(row=7, column=0, columnspan=2, pady=10)
 
+        self.status_label = ttk.Label(frame, text="")
+        self.status_label.grid(row=8, column=0, columnspan=2, pady=5)
+
+        self.cancel_button = ttk.Button(frame, text="Отменить", command=self.cancel_job, bootstyle="danger", state='disabled')
+        self.cancel_button.grid(row=9, column=0, columnspan=2, pady=5)
+
     def create_tab4_widgets(self):
         frame = ttk.Frame(self.tab4)
         frame.pack(fill='both', expand=True, padx=10, pady=10)
@@ -166,22 +315,22 @@ class ClusteringApp(ttk.Window):
         self.save_button = ttk.Button(frame, text="Сохранить результаты", command=self.save_results, bootstyle="secondary")
         self.save_button.pack(pady=10)
 
-        # Создаем фрейм для таблицы и скроллбаров
-        tree_frame = ttk.Frame(frame)
-        tree_frame.pack(fill='both', expand=True)
-
-        # Таблица для отображения результатов
-        self.result_treeview = ttk.Treeview(tree_frame)
-        self.result_treeview.pack(side='left', fill='both', expand=True)
-
-        # Скроллбары
-        scrollbar_y = ttk.Scrollbar(tree_frame, orient="vertical", command=self.result_treeview.yview)
-        scrollbar_y.pack(side='right', fill='y')
-
-        scrollbar_x = ttk.Scrollbar(frame, orient="horizontal", command=self.result_treeview.xview)
-        scrollbar_x.pack(side='bottom', fill='x')
-
-        self.result_treeview.configure(yscroll=scrollbar_y.set, xscroll=scrollbar_x.set)
+        # Выбор кластера: таблица показывает только его участников
+        cluster_bar = ttk.Frame(frame)
+        cluster_bar.pack(pady=5)
+        ttk.Label(cluster_bar, text="Кластер:").pack(side='left', padx=5)
+        self.cluster_select = ttk.Combobox(cluster_bar, values=[ALL_CLUSTERS], state='readonly', width=10)
+        self.cluster_select.current(0)
+        self.cluster_select.pack(side='left', padx=5)
+        self.cluster_select.bind("<<ComboboxSelected>>", self.on_cluster_select)
+        ttk.Button(cluster_bar, text="Профиль кластера", command=self.show_cluster_profile,
+                   bootstyle="info").pack(side='left', padx=5)
+        ttk.Button(cluster_bar, text="Экспорт кластера", command=self.export_cluster,
+                   bootstyle="secondary").pack(side='left', padx=5)
+
+        # Таблица для отображения результатов (строки подгружаются при прокрутке)
+        self.result_table = VirtualTable(frame)
+        self.result_table.pack(fill='both', expand=True)
 
         # Метка для отображения коэффициента силуэта
         self.silhouette_label = ttk.Label(frame, text="Средний коэффициент силуэта: ")
@@ -195,35 +344,180 @@ class ClusteringApp(ttk.Window):
         self.cluster_stats_button = ttk.Button(frame, text="Показать статистику по кластерам", command=self.show_cluster_stats, bootstyle="info")
         self.cluster_stats_button.pack(pady=10)
 
+    def create_tab5_widgets(self):
+        frame = ttk.Frame(self.tab5)
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        control_bar = ttk.Frame(frame)
+        control_bar.pack(fill='x', pady=5)
+        ttk.Checkbutton(control_bar, text="Трассировка этапов", variable=self.tracing,
+                        command=self.toggle_tracing, bootstyle="round-toggle").pack(side='left', padx=5)
+        ttk.Button(control_bar, text="Обновить", command=self.refresh_diagnostics,
+                   bootstyle="info").pack(side='left', padx=5)
+        ttk.Button(control_bar, text="Очистить", command=self.clear_diagnostics,
+                   bootstyle="secondary").pack(side='left', padx=5)
+        ttk.Button(control_bar, text="Экспорт трассировки", command=self.export_trace,
+                   bootstyle="secondary").pack(side='left', padx=5)
+
+        # Сводка по этапам: вложенные этапы отмечены отступом
+        columns = ("calls", "wall", "cpu", "rows", "rss", "peak")
+        self.diagnostics_tree = ttk.Treeview(frame, columns=columns, show="tree headings")
+        self.diagnostics_tree.heading("#0", text="Этап")
+        self.diagnostics_tree.column("#0", width=360)
+        headings = {"calls": "Вызовов", "wall": "Время, с", "cpu": "CPU, с", "rows": "Строк", "rss": "Прирост RSS, МБ",
+                    "peak": "Пик в этапе, МБ"}
+        for col in columns:
+            self.diagnostics_tree.heading(col, text=headings[col])
+            self.diagnostics_tree.column(col, width=110, anchor='e')
+        self.diagnostics_tree.pack(fill='both', expand=True)
+
+    def on_tab_changed(self, event):
+        # Сводка обновляется при каждом открытии вкладки диагностики
+        if self.notebook.select() == str(self.tab5):
+            self.refresh_diagnostics()
+
+    def toggle_tracing(self):
+        TRACER.enabled = self.tracing.get()
+
+    def refresh_diagnostics(self):
+        tree = self.diagnostics_tree
+        tree.delete(*tree.get_children())
+        mb = 1024 ** 2
+        for stage in TRACER.summary():
+            rows = "" if stage['rows'] is None else stage['rows']
+            tree.insert("", "end", text="    " * stage['depth'] + stage['name'], values=(
+                stage['calls'], f"{stage['wall']:.3f}", f"{stage['cpu']:.3f}", rows, f"{stage['rss_delta'] / mb:.1f}",
+                f"{stage['peak_delta'] / mb:.1f}",
+            ))
+        # Время первого импорта библиотек (фоновая загрузка или первое использование)
+        if IMPORT_TIMES:
+            imports = tree.insert("", "end", text="Импорт модулей", values=(
+                len(IMPORT_TIMES), f"{sum(IMPORT_TIMES.values()):.3f}", "", "", "", "",
+            ))
+            for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+                tree.insert(imports, "end", text=name, values=(1, f"{seconds:.3f}", "", "", "", ""))
+
+    def clear_diagnostics(self):
+        TRACER.clear()
+        self.refresh_diagnostics()
+
+    def export_trace(self):
+        if not TRACER.events:
+            messagebox.showwarning("Предупреждение", "Нет данных трассировки: включите трассировку и выполните обработку")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if file_path:
+            TRACER.export_chrome_trace(file_path)
+            messagebox.showinfo("Экспорт", f"Трассировка сохранена в {file_path}\n"
+                                           "Откройте её в chrome://tracing или ui.perfetto.dev")
+
+    def clear_cache(self):
+        if self.data_processor.dataset_cache:
+            self.data_processor.dataset_cache.clear()
+        self.data_processor.preprocess_cache.clear()
+        messagebox.showinfo("Информация", "Кэш данных очищен")
+
+    def save_model(self):
+        if self.clusters is None:
+            messagebox.showwarning("Предупреждение", "Сначала выполните кластеризацию")
+            return
+        try:
+            model = self.clustering.export_model(
+                self.model_state, reduction=self.model_reduction,
+                method=self.cluster_method.get(), source=self.loaded_file_path
+            )
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".npz", filetypes=[("Model files", "*.npz")])
+        if file_path:
+            model.save(file_path)
+            messagebox.showinfo("Сохранение", f"Модель сохранена в {file_path}")
+
+    def score_with_model(self):
+        if self.scheduler.is_busy:
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей задачи или отмените её")
+            return
+        model_path = filedialog.askopenfilename(filetypes=[("Model files", "*.npz")])
+        if not model_path:
+            return
+        try:
+            from model_bundle import ClusterModel
+            model = ClusterModel.load(model_path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Ошибка при загрузке модели: {e}")
+            return
+        data_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx")])
+        if not data_path:
+            return
+        output_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if not output_path:
+            return
+        self.status_label.config(text="Оценка новых данных...")
+        self.submit_job(
+            self.score_job, model, data_path, output_path,
+            on_progress=self.on_score_progress,
+            on_done=self.on_score_done,
+            on_error=self.on_job_error,
+            on_cancel=self.on_job_cancelled,
+        )
+
+    def score_job(self, job, model, data_path, output_path):
+        # Выполняется в рабочем потоке; CSV оценивается порциями без загрузки целиком
+        if data_path.endswith('.csv'):
+            counts = model.predict_file(
+                data_path, output_path, loader=self.data_processor.streaming_loader,
+                progress=job.report
+            )
+        else:
+            data = pd.read_excel(data_path)
+            labels = model.predict(data)
+            data.assign(Cluster=labels).to_csv(output_path, index=False)
+            values, frequencies = np.unique(labels, return_counts=True)
+            counts = dict(zip(values.tolist(), frequencies.tolist()))
+        return output_path, counts
+
+    def on_score_progress(self, done, total, stage):
+        self.status_label.config(text=f"{stage}: {done}")
+
+    def on_score_done(self, result):
+        self.set_job_running(False)
+        output_path, counts = result
+        self.status_label.config(text="")
+        summary = "\n".join(f"Кластер {label}: {count}" for label, count in sorted(counts.items()))
+        messagebox.showinfo("Оценка завершена", f"Результаты сохранены в {output_path}\n{summary}")
+
+    def toggle_low_memory(self):
+        self.data_processor.set_low_memory(self.low_memory.get())
+
+    def show_memory_report(self):
+        report = self.memory.report() or "Нет данных: выполните загрузку или кластеризацию"
+        messagebox.showinfo("Потребление памяти", report)
+
     def show_about(self):
         messagebox.showinfo("О программе", "Система кластеризации клиентов\nВерсия 1.2")
 
     def load_data(self):
+        if self.scheduler.is_busy:
+            # Задача работает с текущей таблицей: её результат нельзя сопоставить с новым файлом
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей задачи или отмените её")
+            return
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx")])
         if not file_path:
             messagebox.showwarning("Предупреждение", "Файл не выбран")
             return
-        data = self.data_processor.load_data(file_path)
+        with self.memory.stage('Загрузка данных'):
+            data = self.data_processor.load_data(file_path)
         if data is not None:
             self.loaded_data = data
+            self.loaded_file_path = file_path
+            self.policy_answers = {}
             columns_list = list(self.loaded_data.columns)
             messagebox.showinfo("Заголовки столбцов", f"Загруженные столбцы: {columns_list}")
             self.display_data_in_treeview(self.loaded_data)
 
     def display_data_in_treeview(self, data):
-        treeview = self.data_treeview
-        treeview.delete(*treeview.get_children())
-
-        treeview["columns"] = list(data.columns)
-        treeview["show"] = "headings"
-
-        for col in data.columns:
-            treeview.heading(col, text=col)
-            max_width = max(data[col].astype(str).map(len).max(), len(col))
-            treeview.column(col, width=min(max_width * 10, 200), minwidth=100, stretch=True)
-
-        for _, row in data.iterrows():
-            treeview.insert("", "end", values=list(row))
+        self.data_table.set_model(TableModel(data))
 
     def on_method_change(self, event):
         method = self.cluster_method.get()
@@ -234,63 +528,270 @@ class ClusteringApp(ttk.Window):
         self.eps_entry.grid_forget()
         self.min_samples_label.grid_forget()
         self.min_samples_entry.grid_forget()
+        self.suggest_eps_button.grid_forget()
         self.som_size_label.grid_forget()
         self.som_size_entry.grid_forget()
         self.som_iterations_label.grid_forget()
         self.som_iterations_entry.grid_forget()
+        self.passes_label.grid_forget()
+        self.passes_entry.grid_forget()
+        self.coreset_label.grid_forget()
+        self.coreset_entry.grid_forget()
+        self.runs_label.grid_forget()
+        self.runs_entry.grid_forget()
+        self.selection_label.grid_forget()
+        self.ensemble_selection.grid_forget()
+        self.ensemble_minibatch_check.grid_forget()
 
         if method == 'K-Means':
-            self.cluster_label.config(text="Количество кластеров:")
-            self.cluster_label.grid(row=1, column=0, pady=5, sticky='e')
-            self.cluster_entry.grid(row=1, column=1, pady=5, sticky='w')
-            self.cluster_entry.config(state='normal')
+            self.show_cluster_count()
+        elif method == STREAMING_KMEANS:
+            self.show_cluster_count()
+            self.passes_label.grid(row=2, column=0, pady=5, sticky='e')
+            self.passes_entry.grid(row=2, column=1, pady=5, sticky='w')
+        elif method == CORESET_KMEANS:
+            self.show_cluster_count()
+            self.coreset_label.grid(row=2, column=0, pady=5, sticky='e')
+            self.coreset_entry.grid(row=2, column=1, pady=5, sticky='w')
+        elif method == ENSEMBLE_KMEANS:
+            self.show_cluster_count()
+            self.runs_label.grid(row=2, column=0, pady=5, sticky='e')
+            self.runs_entry.grid(row=2, column=1, pady=5, sticky='w')
+            self.selection_label.grid(row=3, column=0, pady=5, sticky='e')
+            self.ensemble_selection.grid(row=3, column=1, pady=5, sticky='w')
+            self.ensemble_minibatch_check.grid(row=4, column=0, columnspan=2, pady=5, sticky='w')
         elif method == 'DBSCAN':
             self.eps_label.grid(row=1, column=0, pady=5, sticky='e')
             self.eps_entry.grid(row=1, column=1, pady=5, sticky='w')
             self.min_samples_label.grid(row=2, column=0, pady=5, sticky='e')
             self.min_samples_entry.grid(row=2, column=1, pady=5, sticky='w')
+            self.suggest_eps_button.grid(row=3, column=0, columnspan=2, pady=5)
         elif method == 'SOM':
             self.som_size_label.grid(row=1, column=0, pady=5, sticky='e')
             self.som_size_entry.grid(row=1, column=1, pady=5, sticky='w')
             self.som_iterations_label.grid(row=2, column=0, pady=5, sticky='e')
             self.som_iterations_entry.grid(row=2, column=1, pady=5, sticky='w')
 
+    def show_cluster_count(self):
+        self.cluster_label.config(text="Количество кластеров:")
+        self.cluster_label.grid(row=1, column=0, pady=5, sticky='e')
+        self.cluster_entry.grid(row=1, column=1, pady=5, sticky='w')
+        self.cluster_entry.config(state='normal')
+
+    def preprocess_options(self):
+        """
+        Настройки предобработки для фоновой задачи. Вопросы о пропусках и выбросах
+        задаются заранее в главном потоке (диалоги Tk из рабочего потока недоступны),
+        ответы запоминаются для загруженных данных и выбранного правила выбросов.
+        """
+        outlier_rule = self.OUTLIER_RULE_LABELS[self.outlier_rule.get()]
+        answers = self.policy_answers.get(outlier_rule)
+        if answers is None:
+            fill = messagebox.askyesno(
+                "Обработка пропущенных значений",
+                "Если в данных есть пропущенные значения, заполнить их медианными значениями?\n"
+                "«Нет» — удалить строки с пропусками."
+            )
+            remove = messagebox.askyesno(
+                "Обработка выбросов",
+                "Если в данных будут обнаружены выбросы, удалить их?\n"
+                "«Нет» — заменить выбросы пороговыми значениями."
+            )
+            answers = {'nan_policy': 'median' if fill else 'drop', 'outlier_policy': 'remove' if remove else 'cap'}
+            self.policy_answers[outlier_rule] = answers
+        return dict(answers, outlier_rule=outlier_rule, reduction=self.REDUCTION_LABELS[self.reduction_method.get()])
+
+    def preprocess_step(self, job, data, options):
+        # Выполняется в рабочем потоке: предобработка и снижение размерности без диалогов
+        from data_processing import ConsoleMessages
+        messages = ConsoleMessages()
+        with self.memory.stage('Предобработка'):
+            scaled_data, columns, row_mask = self.data_processor.preprocess_data(
+                data, nan_policy=options['nan_policy'], outlier_policy=options['outlier_policy'],
+                outlier_rule=options['outlier_rule'], messages=messages
+            )
+        if scaled_data is None:
+            raise ValueError("; ".join(messages.errors) or "ошибка предобработки")
+        # Параметры именно этой предобработки: last_state меняется при следующей предобработке
+        state = self.data_processor.last_state
+        reduction = None
+        if options['reduction'] is not None:
+            job.check_cancelled()
+            # Проекция кэшируется в Clustering: перебор k, подбор eps и кластеризация её не переобучают
+            with self.memory.stage('Снижение размерности'):
+                scaled_data = self.clustering.reduce_dimensions(scaled_data, options['reduction'])
+            reduction = self.clustering.reduction
+        job.check_cancelled()
+        return {
+            'scaled_data': scaled_data, 'columns': columns, 'row_mask': row_mask,
+            'reduction': reduction, 'state': state, 'warnings': messages.warnings,
+        }
+
+    def apply_preprocessing(self, preprocessed):
+        # Результат предобработки из фоновой задачи становится текущим (главный поток)
+        self.scaled_data = preprocessed['scaled_data']
+        self.data_columns = preprocessed['columns']
+        self.row_mask = preprocessed['row_mask']
+        self.reduction = preprocessed['reduction']
+        if preprocessed['warnings']:
+            messagebox.showwarning("Предупреждение", "\n".join(preprocessed['warnings']))
+
+    def set_job_running(self, running):
+        state = 'disabled' if running else 'normal'
+        self.elbow_button.config(state=state)
+        self.cluster_button.config(state=state)
+        cancel_state = 'normal' if running else 'disabled'
+        self.cancel_button.config(state=cancel_state)
+        self.elbow_cancel_button.config(state=cancel_state)
+        if running:
+            self.progress_bar.start()
+        else:
+            self.progress_bar.stop()
+
+    def submit_job(self, func, *args, **callbacks):
+        job_id = self.scheduler.submit(func, *args, **callbacks)
+        if job_id is None:
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей задачи или отмените её")
+            return False
+        self.set_job_running(True)
+        return True
+
+    def cancel_job(self):
+        if self.scheduler.is_busy:
+            self.scheduler.cancel()
+            self.status_label.config(text="Отмена...")
+            self.elbow_status_label.config(text="Отмена...")
+
+    def on_job_cancelled(self):
+        self.set_job_running(False)
+        self.status_label.config(text="Задача отменена")
+        self.elbow_status_label.config(text="Задача отменена")
+
+    def on_job_error(self, error):
+        self.set_job_running(False)
+        self.status_label.config(text="")
+        self.elbow_status_label.config(text="")
+        messagebox.showerror("Ошибка", f"Ошибка при выполнении задачи: {error}")
+
     def elbow_method(self):
         if self.loaded_data is None:
             messagebox.showwarning("Предупреждение", "Сначала загрузите данные")
             return
-        result = self.data_processor.preprocess_data(self.loaded_data)
-        if result is None:
+        if self.scheduler.is_busy:
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей задачи или отмените её")
             return
-        self.scaled_data, self.data_columns = result
-        self.progress_bar.start()
-        self.after(100, self.calculate_elbow_method)
-
-    def calculate_elbow_method(self):
-        scaled_data = self.scaled_data
-        K, inertia, silhouette_scores = self.clustering.calculate_elbow_method(scaled_data)
-        self.visualization.plot_elbow_method(K, inertia, self.tab2, 'canvas_elbow')
-        optimal_clusters = silhouette_scores.index(max(silhouette_scores)) + 2
+        preprocess_options = self.preprocess_options()
+        options = {
+            'criterion': self.ELBOW_CRITERIA_LABELS[self.elbow_criterion.get()],
+            'warm_start': self.elbow_warm_start.get(),
+            'early_stop_tol': 0.02 if self.elbow_early_stop.get() else None,
+            'coreset_size': DEFAULT_CORESET_SIZE if self.elbow_coreset.get() else None,
+        }
+        self.elbow_progress_bar.config(value=0)
+        self.elbow_status_label.config(text="Предобработка и расчёт метода локтя...")
+        self.submit_job(
+            self.elbow_job, self.loaded_data, preprocess_options, options,
+            on_progress=self.on_elbow_progress,
+            on_done=self.on_elbow_done,
+            on_error=self.on_job_error,
+            on_cancel=self.on_job_cancelled,
+        )
+
+    def elbow_job(self, job, data, preprocess_options, options):
+        # Выполняется в рабочем потоке
+        preprocessed = self.preprocess_step(job, data, preprocess_options)
+        K, inertia, scores, timings = self.clustering.calculate_elbow_method(
+            preprocessed['scaled_data'], progress=job.report, **options
+        )
+        return {'K': K, 'inertia': inertia, 'scores': scores, 'timings': timings, 'criterion': options['criterion'],
+                'preprocessed': preprocessed}
+
+    def on_elbow_progress(self, done, total, partial):
+        self.elbow_progress_bar.config(maximum=total, value=done)
+        k, inertia, score = partial
+        self.elbow_status_label.config(
+            text=f"k={k}: inertia={inertia:.2f}, оценка={score:.4f} ({done}/{total})"
+        )
+
+    def on_elbow_done(self, result):
+        self.set_job_running(False)
+        self.apply_preprocessing(result['preprocessed'])
+        self.visualization.plot_elbow_method(result['K'], result['inertia'], self.tab2, 'canvas_elbow')
+        optimal_clusters = self.clustering.select_optimal_k(result['K'], result['scores'], result['criterion'])
         self.optimal_clusters_label.config(text=f"Оптимальное количество кластеров: {optimal_clusters}")
-        self.progress_bar.stop()
+        total_time = sum(timing['fit'] + timing['score'] for timing in result['timings'])
+        self.elbow_status_label.config(text=f"Проверено значений k: {len(result['K'])}, время: {total_time:.1f} с")
 
     def perform_clustering(self):
         if self.loaded_data is None:
             messagebox.showwarning("Предупреждение", "Сначала загрузите данные")
             return
-        result = self.data_processor.preprocess_data(self.loaded_data)
-        if result is None:
+        if self.scheduler.is_busy:
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей задачи или отмените её")
             return
-        self.scaled_data, self.data_columns = result
-
         clustering_method = self.cluster_method.get()
-        scaled_data = self.scaled_data
-        columns = self.data_columns
-
-        self.progress_bar.start()
-        self.after(100, lambda: self.run_clustering(clustering_method, scaled_data, columns))
+        params = self.read_clustering_params(clustering_method)
+        if params is None:
+            return
 
-    def run_clustering(self, method, scaled_data, columns):
+        if clustering_method == STREAMING_KMEANS:
+            # Данные читаются из файла в фоновой задаче, предобработка в памяти не нужна
+            if not self.loaded_file_path.endswith('.csv'):
+                messagebox.showerror("Ошибка", "Потоковый режим поддерживает только CSV-файлы")
+                return
+            preprocess_options = None
+        else:
+            preprocess_options = self.preprocess_options()
+
+        self.status_label.config(text="Выполняется кластеризация...")
+        self.submit_job(
+            self.clustering_job, clustering_method, self.loaded_data, preprocess_options, params,
+            on_progress=self.on_clustering_progress,
+            on_done=self.on_clustering_done,
+            on_error=self.on_job_error,
+            on_cancel=self.on_job_cancelled,
+        )
+
+    def suggest_eps(self):
+        if self.loaded_data is None:
+            messagebox.showwarning("Предупреждение", "Сначала загрузите данные")
+            return
+        if self.scheduler.is_busy:
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения текущей задачи или отмените её")
+            return
+        try:
+            min_samples = int(self.min_samples_entry.get()) if self.min_samples_entry.get() else 5
+            if min_samples <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректные параметры для DBSCAN")
+            return
+        preprocess_options = self.preprocess_options()
+        self.status_label.config(text="Расчёт k-distance графика...")
+        self.submit_job(
+            self.suggest_eps_job, self.loaded_data, preprocess_options, min_samples,
+            on_done=self.on_suggest_eps_done,
+            on_error=self.on_job_error,
+            on_cancel=self.on_job_cancelled,
+        )
+
+    def suggest_eps_job(self, job, data, preprocess_options, min_samples):
+        # Выполняется в рабочем потоке
+        preprocessed = self.preprocess_step(job, data, preprocess_options)
+        k_distances, suggested_eps = self.clustering.suggest_dbscan_eps(preprocessed['scaled_data'], min_samples)
+        return k_distances, min_samples, suggested_eps, preprocessed
+
+    def on_suggest_eps_done(self, result):
+        self.set_job_running(False)
+        k_distances, min_samples, suggested_eps, preprocessed = result
+        self.apply_preprocessing(preprocessed)
+        self.visualization.plot_k_distance(k_distances, min_samples, suggested_eps, self.tab3, 'canvas')
+        self.eps_entry.delete(0, 'end')
+        self.eps_entry.insert(0, f"{suggested_eps:.4f}")
+        self.status_label.config(text=f"Рекомендуемое eps: {suggested_eps:.4f}")
+
+    def read_clustering_params(self, method):
+        # Чтение параметров из формы (только в главном потоке)
         if method == 'K-Means':
             try:
                 n_clusters = int(self.cluster_entry.get())
@@ -298,11 +799,43 @@ class ClusteringApp(ttk.Window):
                     raise ValueError
             except ValueError:
                 messagebox.showerror("Ошибка", "Введите корректное количество кластеров")
-                self.progress_bar.stop()
-                return
-            clusters = self.clustering.kmeans_clustering(scaled_data, n_clusters)
-            self.clusters = clusters
-            self.visualization.visualize_clusters(scaled_data, clusters, columns, self.tab3, 'canvas')
+                return None
+            return {'n_clusters': n_clusters}
+        elif method == CORESET_KMEANS:
+            try:
+                n_clusters = int(self.cluster_entry.get())
+                coreset_size = int(self.coreset_entry.get()) if self.coreset_entry.get() else DEFAULT_CORESET_SIZE
+                if n_clusters <= 0 or coreset_size < n_clusters:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите корректное количество кластеров и размер coreset")
+                return None
+            return {'n_clusters': n_clusters, 'coreset_size': coreset_size}
+        elif method == ENSEMBLE_KMEANS:
+            try:
+                n_clusters = int(self.cluster_entry.get())
+                n_runs = int(self.runs_entry.get()) if self.runs_entry.get() else DEFAULT_ENSEMBLE_RUNS
+                if n_clusters <= 0 or n_runs <= 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите корректное количество кластеров и запусков")
+                return None
+            return {
+                'n_clusters': n_clusters,
+                'n_runs': n_runs,
+                'selection': self.ENSEMBLE_SELECTION_LABELS[self.ensemble_selection.get()],
+                'algorithms': ('kmeans', 'minibatch') if self.ensemble_minibatch.get() else ('kmeans',),
+            }
+        elif method == STREAMING_KMEANS:
+            try:
+                n_clusters = int(self.cluster_entry.get())
+                n_passes = int(self.passes_entry.get()) if self.passes_entry.get() else 3
+                if n_clusters <= 0 or n_passes <= 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите корректное количество кластеров и проходов")
+                return None
+            return {'n_clusters': n_clusters, 'n_passes': n_passes, 'file_path': self.loaded_file_path}
         elif method == 'DBSCAN':
             try:
                 eps = float(self.eps_entry.get()) if self.eps_entry.get() else 0.5
@@ -311,80 +844,197 @@ class ClusteringApp(ttk.Window):
                     raise ValueError
             except ValueError:
                 messagebox.showerror("Ошибка", "Введите корректные параметры для DBSCAN")
-                self.progress_bar.stop()
-                return
-            clusters = self.clustering.dbscan_clustering(scaled_data, eps, min_samples)
-            self.clusters = clusters
-            self.visualization.visualize_clusters(scaled_data, clusters, columns, self.tab3, 'canvas')
+                return None
+            return {'eps': eps, 'min_samples': min_samples}
         elif method == 'SOM':
             try:
                 som_size = int(self.som_size_entry.get()) if self.som_size_entry.get() else 10
-                som_iterations = int(self.som_iterations_entry.get()) if self.som_iterations_entry.get() else 100
+                som_iterations = int(self.som_iterations_entry.get()) if self.som_iterations_entry.get() else 10
                 if som_size <= 0 or som_iterations <= 0:
                     raise ValueError
             except ValueError:
                 messagebox.showerror("Ошибка", "Введите корректные параметры для SOM")
-                self.progress_bar.stop()
-                return
-            positions = self.clustering.som_clustering(scaled_data, som_size, som_iterations)
-            # Преобразуем позиции в метки кластеров
-            unique_positions, labels = np.unique(positions, axis=0, return_inverse=True)
-            self.clusters = labels
-            self.visualization.visualize_som(positions, labels, som_size, self.tab3, 'canvas')
+                return None
+            return {'som_size': som_size, 'iterations': som_iterations}
+        messagebox.showerror("Ошибка", "Неизвестный метод кластеризации")
+        return None
+
+    def clustering_job(self, job, method, data, preprocess_options, params):
+        # Выполняется в рабочем потоке: только вычисления, без обращений к Tk
+        if method == STREAMING_KMEANS:
+            scaled_data, row_mask, columns, preprocessed = None, None, None, None
+            params['reduction'] = None
+            params['state'] = None  # Параметры предобработки берутся из самого потокового запуска
         else:
-            messagebox.showerror("Ошибка", "Неизвестный метод кластеризации")
-            self.progress_bar.stop()
-            return
+            preprocessed = self.preprocess_step(job, data, preprocess_options)
+            scaled_data = preprocessed['scaled_data']
+            row_mask, columns = preprocessed['row_mask'], preprocessed['columns']
+            params['reduction'], params['state'] = preprocessed['reduction'], preprocessed['state']
+        result = {'method': method, 'scaled_data': scaled_data, 'params': params, 'preprocessed': preprocessed}
+        with self.memory.stage(f'Кластеризация ({method})'):
+            if method == 'K-Means':
+                job.report(0, 2, 'K-Means')
+                result['clusters'] = self.clustering.kmeans_clustering(scaled_data, params['n_clusters'])
+            elif method == ENSEMBLE_KMEANS:
+                result['clusters'] = self.clustering.ensemble_clustering(
+                    scaled_data, params['n_clusters'], n_runs=params['n_runs'], algorithms=params['algorithms'],
+                    selection=params['selection'],
+                    progress=lambda done, total, run: job.report(done, total, 'K-Means, запуск')
+                )
+                result['ensemble'] = self.clustering.last_ensemble
+            elif method == CORESET_KMEANS:
+                job.report(0, 2, 'K-Means по coreset')
+                result['clusters'] = self.clustering.coreset_kmeans_clustering(
+                    scaled_data, params['n_clusters'], coreset_size=params['coreset_size']
+                )
+            elif method == STREAMING_KMEANS:
+                loader = self.data_processor.streaming_loader
+                streamed = self.clustering.streaming_kmeans_clustering(
+                    params['file_path'], params['n_clusters'], loader, n_passes=params['n_passes'],
+                    labels_path=loader.temp_path('.npy'), progress=job.report
+                )
+                result.update(streamed)
+                result['clusters'] = streamed['labels']
+            elif method == 'DBSCAN':
+                job.report(0, 2, 'DBSCAN')
+                result['clusters'] = self.clustering.dbscan_clustering(scaled_data, params['eps'], params['min_samples'])
+            elif method == 'SOM':
+                positions = self.clustering.som_clustering(
+                    scaled_data, params['som_size'], params['iterations'],
+                    progress=lambda done, total: job.report(done, total, 'SOM, эпоха')
+                )
+                # Преобразуем позиции в метки кластеров
+                unique_positions, labels = np.unique(positions, axis=0, return_inverse=True)
+                result['positions'] = positions
+                result['clusters'] = labels.ravel()
+                result['som_errors'] = (self.clustering.som_model.quantization_error_,
+                                        self.clustering.som_model.topographic_error_)
+        if self.data_processor.low_memory and method != STREAMING_KMEANS:
+            # Метки хранятся отдельно от данных в компактном целочисленном типе
+            result['clusters'] = compact_labels(result['clusters'])
+
+        if method == STREAMING_KMEANS:
+            columns = result['columns']
+        if row_mask is None and len(data) != len(result['clusters']):
+            # Загруженная таблица не соответствует строкам файла, профили не строятся
+            result['profiles'] = None
+        else:
+            from cluster_profiles import ClusterProfiles
+            with self.memory.stage('Профили кластеров'):
+                result['profiles'] = ClusterProfiles.build(data, result['clusters'], row_mask, list(columns))
 
-        # Отображаем результаты
-        self.display_results()
+        if method == STREAMING_KMEANS:
+            # Силуэт оценивается по выборке масштабированных строк
+            scaled_data, clusters = result['sample_data'], result['sample_labels']
+        else:
+            clusters = result['clusters']
+        job.report(1, 2, 'Коэффициент силуэта')
+        unique_clusters = set(np.unique(clusters))
+        if len(unique_clusters) > 1 and -1 not in unique_clusters:
+            with self.memory.stage('Коэффициент силуэта'):
+                result['silhouette'] = self.clustering.estimate_silhouette(scaled_data, clusters)
+        else:
+            result['silhouette'] = None
+
+        if method != 'SOM':
+            # PCA для диаграммы обучается здесь, а не в главном потоке при отрисовке
+            with self.memory.stage('Проекция для диаграммы'):
+                result['projection'] = self.visualization.project(scaled_data, reduction=params['reduction'])
+        return result
+
+    def on_clustering_progress(self, done, total, stage):
+        self.status_label.config(text=f"{stage}: {100 * done / max(total, 1):.0f}%")
+
+    def on_clustering_done(self, result):
+        self.set_job_running(False)
+        if result['preprocessed'] is not None:
+            self.apply_preprocessing(result['preprocessed'])
+        if result['method'] == 'SOM':
+            quantization_error, topographic_error = result['som_errors']
+            self.status_label.config(
+                text=f"Ошибка квантования: {quantization_error:.4f}, топографическая ошибка: {topographic_error:.4f}"
+            )
+        elif result['method'] == ENSEMBLE_KMEANS:
+            ensemble = result['ensemble']
+            best, inertia = ensemble['best'], ensemble['inertia']
+            self.status_label.config(
+                text=f"Лучший из {len(ensemble['runs'])} запусков: {best['algorithm']}, seed {best['seed']}; "
+                     f"инерция {inertia['min']:.2f}–{inertia['max']:.2f}, "
+                     f"согласие с лучшим (ARI) от {ensemble['ari_to_best']['min']:.3f}"
+            )
+        else:
+            self.status_label.config(text="")
+        self.clusters = result['clusters']
+        self.model_reduction = result['params']['reduction']
+        self.model_state = result['params']['state']
+        if result['method'] == STREAMING_KMEANS:
+            # Метки относятся ко всем строкам файла, в памяти есть только выборка
+            self.scaled_data = None
+            self.data_columns = result['columns']
+            self.row_mask = np.ones(len(self.clusters), dtype=bool)
+            self.visualization.visualize_clusters(
+                result['sample_data'], result['sample_labels'], self.data_columns, self.tab3, 'canvas',
+                projection=result['projection']
+            )
+        elif result['method'] == 'SOM':
+            self.visualization.visualize_som(
+                result['positions'], self.clusters, result['params']['som_size'], self.tab3, 'canvas'
+            )
+        else:
+            self.visualization.visualize_clusters(
+                result['scaled_data'], self.clusters, self.data_columns, self.tab3, 'canvas',
+                projection=result['projection']
+            )
+        self.silhouette_result = result['silhouette']
+        self.cluster_profiles = result['profiles']
+        cluster_ids = [] if self.cluster_profiles is None else self.cluster_profiles.cluster_ids.tolist()
+        self.cluster_select.config(values=[ALL_CLUSTERS] + cluster_ids)
+        self.cluster_select.current(0)
 
-        self.progress_bar.stop()
+        # Отображаем результаты
+        with self.memory.stage('Отображение результатов'):
+            self.display_results()
 
     def display_results(self):
         # Обновляем таблицу с результатами
         if self.loaded_data is not None and self.clusters is not None:
-            data_with_clusters = self.loaded_data.copy()
-            data_with_clusters['Cluster'] = self.clusters
-            self.display_result_treeview(data_with_clusters)
-
-            # Рассчитываем коэффициент силуэта
-            if len(set(self.clusters)) > 1 and -1 not in set(self.clusters):
-                silhouette_avg = self.clustering.calculate_silhouette(self.scaled_data, self.clusters)
-                self.silhouette_label.config(text=f"Средний коэффициент силуэта: {silhouette_avg:.4f}")
+            # Метки присоединяются к строкам только при отображении, без копии данных
+            self.display_result_treeview(TableModel(
+                self.loaded_data, row_index=np.flatnonzero(self.row_mask), extra_columns={'Cluster': self.clusters}
+            ))
+
+            # Коэффициент силуэта рассчитан в фоновой задаче
+            silhouette = self.silhouette_result
+            if silhouette is not None and silhouette['exact']:
+                self.silhouette_label.config(text=f"Средний коэффициент силуэта: {silhouette['score']:.4f}")
+            elif silhouette is not None:
+                low, high = silhouette['ci']
+                self.silhouette_label.config(
+                    text=f"Средний коэффициент силуэта: {silhouette['score']:.4f} "
+                         f"(95% интервал {low:.4f}–{high:.4f}, выборка {silhouette['sample_size']})"
+                )
             else:
                 self.silhouette_label.config(text="Коэффициент силуэта не может быть рассчитан для данных кластеров")
 
-    def display_result_treeview(self, data):
-        treeview = self.result_treeview
-        treeview.delete(*treeview.get_children())
-
-        treeview["columns"] = list(data.columns)
-        treeview["show"] = "headings"
-
-        for col in data.columns:
-            treeview.heading(col, text=col)
-            max_width = max(data[col].astype(str).map(len).max(), len(col))
-            treeview.column(col, width=min(max_width * 10, 200), minwidth=100, stretch=True)
-
-        for _, row in data.iterrows():
-            treeview.insert("", "end", values=list(row))
+    def display_result_treeview(self, model):
+        self.result_table.set_model(model)
 
     def save_results(self):
         if self.loaded_data is not None and self.clusters is not None:
-            data_with_clusters = self.loaded_data.copy()
-            data_with_clusters['Cluster'] = self.clusters
             file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
             if file_path:
-                data_with_clusters.to_csv(file_path, index=False)
+                with self.memory.stage('Сохранение результатов'):
+                    self.data_processor.save_with_clusters(self.loaded_data, self.row_mask, self.clusters, file_path)
                 messagebox.showinfo("Сохранение", f"Результаты сохранены в {file_path}")
         else:
             messagebox.showwarning("Предупреждение", "Нет данных для сохранения")
 
     def show_silhouette_plot(self):
-        if self.scaled_data is not None and self.clusters is not None:
+        if self.silhouette_result is not None and self.clusters is not None:
             if len(set(self.clusters)) > 1 and -1 not in set(self.clusters):
-                self.visualization.plot_silhouette(self.scaled_data, self.clusters, self.tab4, 'canvas_silhouette')
+                self.visualization.plot_silhouette(
+                    self.scaled_data, self.clusters, self.tab4, 'canvas_silhouette', silhouette=self.silhouette_result
+                )
             else:
                 messagebox.showwarning("Предупреждение", "Коэффициент силуэта не может быть рассчитан для данных кластеров")
         else:
@@ -392,9 +1042,50 @@ class ClusteringApp(ttk.Window):
 
     def show_cluster_stats(self):
         if self.loaded_data is not None and self.clusters is not None:
-            data_with_clusters = self.loaded_data.copy()
-            data_with_clusters['Cluster'] = self.clusters
-            stats = data_with_clusters.groupby('Cluster').mean()
-            self.visualization.show_cluster_statistics(stats)
+            if self.cluster_profiles is None:
+                messagebox.showwarning("Предупреждение", "Статистика по кластерам недоступна")
+                return
+            self.visualization.show_cluster_statistics(self.cluster_profiles.overview())
         else:
             messagebox.showwarning("Предупреждение", "Сначала выполните кластеризацию")
+
+    def selected_cluster(self):
+        # Номер выбранного кластера или None, если выбраны все строки
+        value = self.cluster_select.get()
+        if self.cluster_profiles is None or value in ('', ALL_CLUSTERS):
+            return None
+        return int(value)
+
+    def on_cluster_select(self, event):
+        if self.loaded_data is None or self.clusters is None:
+            return
+        cluster = self.selected_cluster()
+        if cluster is None:
+            self.display_results()
+            return
+        # Участники кластера берутся из обратного индекса, метки не нужно фильтровать
+        members = np.sort(self.cluster_profiles.members(cluster))
+        self.display_result_treeview(TableModel(
+            self.loaded_data, row_index=members, extra_columns={'Cluster': np.full(len(members), cluster)}
+        ))
+
+    def show_cluster_profile(self):
+        cluster = self.selected_cluster()
+        if cluster is None:
+            messagebox.showwarning("Предупреждение", "Выберите кластер")
+            return
+        self.visualization.show_cluster_statistics(
+            self.cluster_profiles.describe(cluster),
+            title=f"Профиль кластера {cluster} ({self.cluster_profiles.size(cluster)} строк)",
+            index_label="Столбец",
+        )
+
+    def export_cluster(self):
+        cluster = self.selected_cluster()
+        if cluster is None:
+            messagebox.showwarning("Предупреждение", "Выберите кластер")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if file_path:
+            self.cluster_profiles.export(self.loaded_data, cluster, file_path)
+            messagebox.showinfo("Сохранение", f"Кластер {cluster} сохранён в {file_path}")
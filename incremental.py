@@ -0,0 +1,213 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from column_stats import ColumnStats
+from model_bundle import ClusterModel, nearest_centers
+from preprocess_state import PreprocessState
+
+INCREMENTAL_FORMAT_VERSION = 1
+STATS_FIELDS = ('count', 'mean', 'm2', 'min', 'max')
+
+
+def row_keys(data, id_column=None):
+    """
+    64-битные ключи строк: хэш идентификатора или, без него, хэш всех значений строки.
+    """
+    values = data[id_column] if id_column is not None else data
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+def match_clusters(previous, current):
+    """
+    Порядок новых центров, при котором каждый ближе всего к прежнему центру
+    с тем же номером (венгерский алгоритм по попарным расстояниям).
+    """
+    cost = np.linalg.norm(previous[:, None, :] - current[None, :, :], axis=2)
+    _, order = linear_sum_assignment(cost)
+    return order
+
+
+class IncrementalClustering:
+    """
+    Инкрементальный K-Means для набора данных, к которому дописываются строки.
+
+    Между запусками сохраняются ключи уже обработанных строк, статистики столбцов
+    (ColumnStats) после заполнения пропусков и ограничения выбросов, центры
+    кластеров в исходных единицах и размеры кластеров. При обновлении:
+    1) по ключам находятся новые строки;
+    2) их статистики объединяются с прежними, масштаб пересчитывается;
+    3) центры сдвигаются взвешенным средним с новыми строками (как шаг MiniBatchKMeans);
+    4) если средний квадрат расстояния новых строк до центров вырос больше чем
+       на drift_tolerance, K-Means уточняется по всем строкам, начиная с этих центров;
+    5) номера кластеров сохраняются сопоставлением с прежними центрами.
+
+    Значения для заполнения пропусков и границы ограничения выбросов остаются
+    такими, как при первом полном обучении; при сильном изменении данных
+    нужна полная повторная кластеризация.
+    """
+
+    def __init__(self, state, stats, centers, counts, keys, inertia, id_column=None, method='kmeans', meta=None):
+        self.state = state
+        self.stats = stats
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.keys = np.asarray(keys, dtype=np.uint64)
+        self.inertia = float(inertia)
+        self.id_column = id_column
+        self.method = method
+        self.meta = dict(meta or {})
+
+    @classmethod
+    def start(cls, data, scaled_data, row_mask, state, labels, centers, id_column=None, method='kmeans'):
+        """
+        Начальное состояние по результатам полной кластеризации:
+        data — исходный DataFrame, scaled_data и row_mask — результат preprocess_data,
+        state — его параметры, labels и centers — метки и центры в масштабированных единицах.
+        """
+        labels = np.asarray(labels)
+        centers = np.asarray(centers, dtype=np.float64)
+        # Статистики масштабированных строк переводятся в исходные единицы без повторного прохода
+        stats = ColumnStats.from_matrix(scaled_data)
+        stats.mean = state.mean + state.scale * stats.mean
+        stats.m2 = stats.m2 * state.scale ** 2
+        stats.min = state.mean + state.scale * stats.min
+        stats.max = state.mean + state.scale * stats.max
+        _, distances = nearest_centers(scaled_data, centers)
+        return cls(
+            state, stats, centers * state.scale + state.mean, np.bincount(labels, minlength=len(centers)),
+            np.unique(row_keys(data, id_column)), np.mean(distances ** 2) if len(distances) else 0.0,
+            id_column=id_column, method=method,
+        )
+
+    @property
+    def n_clusters(self):
+        return len(self.centers)
+
+    def scaled_centers(self):
+        return (self.centers - self.state.mean) / self.state.scale
+
+    def is_new(self, keys):
+        # Ключи хранятся отсортированными, поэтому поиск — двоичный, без сортировки всех ключей
+        if len(self.keys) == 0:
+            return np.ones(len(keys), dtype=bool)
+        position = np.searchsorted(self.keys, keys)
+        return self.keys[np.minimum(position, len(self.keys) - 1)] != keys
+
+    def new_rows(self, data):
+        # Маска строк, которых не было в предыдущих запусках
+        return self.is_new(row_keys(data, self.id_column))
+
+    def remember(self, keys):
+        keys = np.unique(keys)
+        self.keys = np.insert(self.keys, np.searchsorted(self.keys, keys), keys)
+
+    def update(self, data, refine=None, drift_tolerance=0.1, max_iter=100, batch_size=4096):
+        """
+        Метки всех строк data после добавления новых строк.
+        refine: True/False — уточнять K-Means принудительно или никогда, None — по drift_tolerance.
+        Возвращает (метки, маска оценённых строк, отчёт); строки, которые нельзя
+        оценить (пропуски при политике 'drop'), получают метку -1.
+        """
+        started = time.perf_counter()
+        keys = row_keys(data, self.id_column)
+        new = self.is_new(keys)
+        report = {'rows': len(data), 'new_rows': int(new.sum()), 'refined': False, 'iterations': 0}
+
+        if new.any():
+            cleaned, valid_new = self.state.clean(data.iloc[np.flatnonzero(new)])
+            self.stats.merge(ColumnStats.from_matrix(cleaned[valid_new]))
+            state = self.state
+            self.state = PreprocessState(
+                state.columns, self.stats.mean, self.stats.scale, nan_policy=state.nan_policy,
+                fill_values=state.fill_values, outlier_policy=state.outlier_policy, lower=state.lower, upper=state.upper,
+                outlier_rule=state.outlier_rule,
+            )
+        scaled_data, valid = self.state.transform(data)
+        # Прежние центры в новом масштабе: с ними сопоставляются номера кластеров
+        previous = self.scaled_centers()
+        centers = previous.copy()
+
+        drift = 0.0
+        new_valid = new & valid
+        if new_valid.any():
+            new_scaled = scaled_data[new_valid]
+            index, distances = nearest_centers(new_scaled, centers)
+            drift = np.mean(distances ** 2) / max(self.inertia, 1e-12) - 1.0
+            # Взвешенный сдвиг центров: прежние строки представлены размерами кластеров
+            added = np.bincount(index, minlength=self.n_clusters)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, index, new_scaled)
+            total = np.maximum(self.counts + added, 1)[:, None]
+            centers = (centers * self.counts[:, None] + sums) / total
+        report['drift'] = float(drift)
+
+        if refine is None:
+            refine = bool(new_valid.any()) and drift > drift_tolerance
+        if refine:
+            if self.method == 'minibatch':
+                model = MiniBatchKMeans(n_clusters=self.n_clusters, init=centers, n_init=1, max_iter=max_iter,
+                                        batch_size=batch_size, random_state=42)
+            else:
+                model = KMeans(n_clusters=self.n_clusters, init=centers, n_init=1, max_iter=max_iter)
+            model.fit(scaled_data[valid])
+            # Номера кластеров сохраняются: каждому прежнему центру — ближайший новый
+            centers = model.cluster_centers_[match_clusters(previous, model.cluster_centers_)]
+            report.update(refined=True, iterations=int(model.n_iter_))
+
+        labels = np.full(len(data), -1, dtype=np.int32)
+        index, distances = nearest_centers(scaled_data[valid], centers)
+        labels[valid] = index
+        self.counts = np.bincount(index, minlength=self.n_clusters)
+        self.inertia = float(np.mean(distances ** 2)) if len(distances) else 0.0
+        self.centers = centers * self.state.scale + self.state.mean
+        self.remember(keys[new])
+        report['center_shift'] = float(np.max(np.linalg.norm(centers - previous, axis=1)))
+        report['seconds'] = time.perf_counter() - started
+        print(f"Инкрементальное обновление: {report['new_rows']} новых строк из {report['rows']}, "
+              f"рост инерции {drift:+.1%}, {'уточнение K-Means' if report['refined'] else 'без уточнения'}, "
+              f"{report['seconds']:.2f} с")
+        return labels, valid, report
+
+    def to_model(self, **meta):
+        # Модель для оценки новых данных с текущими центрами и масштабом
+        return ClusterModel('kmeans', self.state, self.scaled_centers(), np.arange(self.n_clusters), meta=meta)
+
+    def save(self, path):
+        arrays, state_meta = self.state.to_arrays()
+        for name in STATS_FIELDS:
+            arrays['stats_' + name] = getattr(self.stats, name)
+        meta = dict(self.meta)
+        meta.update({
+            'format_version': INCREMENTAL_FORMAT_VERSION,
+            'id_column': self.id_column,
+            'method': self.method,
+            'inertia': self.inertia,
+            'stats_rows': self.stats.rows,
+            'state': state_meta,
+            'saved': time.time(),
+        })
+        arrays.update(centers=self.centers, counts=self.counts, keys=self.keys)
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as bundle:
+            arrays = {name: bundle[name] for name in bundle.files}
+        meta = json.loads(str(arrays.pop('meta')))
+        if meta.get('format_version') != INCREMENTAL_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия файла состояния: {meta.get('format_version')}")
+        state = PreprocessState.from_arrays(arrays, meta.pop('state'))
+        stats = ColumnStats(len(state.columns))
+        for name in STATS_FIELDS:
+            setattr(stats, name, arrays['stats_' + name])
+        stats.rows = meta.pop('stats_rows')
+        return cls(
+            state, stats, arrays['centers'], arrays['counts'], arrays['keys'], meta.pop('inertia'),
+            id_column=meta.pop('id_column'), method=meta.pop('method'), meta=meta,
+        )
@@ -0,0 +1,160 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from memory import PeakSampler
+
+
+def infer_rows(values):
+    # Количество строк первого аргумента или результата, похожего на таблицу
+    for value in values:
+        shape = getattr(value, 'shape', None)
+        if shape:
+            return int(shape[0])
+    return None
+
+
+class Tracer:
+    """
+    Трассировка этапов обработки: время, процессорное время, память и число строк.
+    Пик памяти этапа измеряется так же, как в MemoryTracker (PeakSampler).
+
+    Пока трассировка выключена, span и декоратор traced сводятся к проверке
+    одного флага. Записи хранятся в памяти (не более max_events) и выгружаются
+    в формате Chrome Trace Event (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, enabled=False, max_events=100000, interval=0.01):
+        self.enabled = enabled
+        self.interval = interval
+        self.max_events = max_events
+        self.events = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name, rows=None, **args):
+        if not self.enabled:
+            yield args
+            return
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        sampler = PeakSampler(self.interval)
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        try:
+            with sampler:
+                yield args
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - cpu_start
+            self._local.depth = depth
+            event = {
+                'name': name,
+                'start': start - self.origin,
+                'wall': wall,
+                'cpu': cpu,
+                'rss_start': sampler.start,
+                'rss_end': sampler.end,
+                'rss_peak': sampler.peak,
+                'rows': args.pop('rows', rows),
+                'depth': depth,
+                'thread': threading.current_thread().name,
+                'tid': threading.get_ident(),
+                'args': args,
+            }
+            with self._lock:
+                self.events.append(event)
+                if len(self.events) > self.max_events:
+                    del self.events[:len(self.events) - self.max_events]
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+        self.origin = time.perf_counter()
+
+    def summary(self):
+        """
+        Сводка по этапам: вызовы, суммарное время, процессорное время,
+        наибольший прирост RSS к концу этапа и внутри этапа (пик), число строк последнего вызова.
+        """
+        with self._lock:
+            events = list(self.events)
+        stages = {}
+        for event in events:
+            stage = stages.setdefault(event['name'], {
+                'name': event['name'], 'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'rss_delta': 0, 'peak_delta': 0,
+                'rows': None, 'depth': event['depth'],
+            })
+            stage['calls'] += 1
+            stage['wall'] += event['wall']
+            stage['cpu'] += event['cpu']
+            stage['rss_delta'] = max(stage['rss_delta'], event['rss_end'] - event['rss_start'])
+            stage['peak_delta'] = max(stage['peak_delta'], event['rss_peak'] - event['rss_start'])
+            if event['rows'] is not None:
+                stage['rows'] = event['rows']
+            stage['depth'] = min(stage['depth'], event['depth'])
+        return sorted(stages.values(), key=lambda stage: stage['wall'], reverse=True)
+
+    def export_chrome_trace(self, path):
+        with self._lock:
+            events = list(self.events)
+        mb = 1024 ** 2
+        trace = []
+        for event in events:
+            args = {
+                'cpu_ms': event['cpu'] * 1000.0,
+                'rss_mb': event['rss_end'] / mb,
+                'rss_delta_mb': (event['rss_end'] - event['rss_start']) / mb,
+                'peak_rss_mb': event['rss_peak'] / mb,
+                'peak_delta_mb': (event['rss_peak'] - event['rss_start']) / mb,
+            }
+            if event['rows'] is not None:
+                args['rows'] = event['rows']
+            args.update({key: str(value) for key, value in event['args'].items()})
+            trace.append({
+                'name': event['name'], 'cat': 'stage', 'ph': 'X',
+                'ts': event['start'] * 1e6, 'dur': event['wall'] * 1e6,
+                'pid': os.getpid(), 'tid': event['tid'], 'args': args,
+            })
+            trace.append({
+                'name': 'RSS, МБ', 'ph': 'C', 'ts': (event['start'] + event['wall']) * 1e6,
+                'pid': os.getpid(), 'args': {'rss': event['rss_end'] / mb},
+            })
+        threads = {event['tid']: event['thread'] for event in events}
+        for tid, thread_name in threads.items():
+            trace.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                          'args': {'name': thread_name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+# Общий трассировщик приложения; включается переменной окружения или на вкладке диагностики
+TRACER = Tracer(enabled=os.environ.get('CLUSTERING_TRACE') == '1')
+
+
+def traced(name=None):
+    """
+    Декоратор этапа: при включённой трассировке вызов записывается в TRACER,
+    число строк берётся из первого табличного аргумента или результата.
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with TRACER.span(label) as span_args:
+                result = func(*args, **kwargs)
+                rows = infer_rows(args)
+                if rows is None:
+                    rows = infer_rows(result if isinstance(result, tuple) else (result,))
+                span_args['rows'] = rows
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,157 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """
+    Исключение, которым прерывается задача после запроса отмены.
+    """
+
+
+class JobContext:
+    """
+    Передаётся в функцию задачи: отчёт о прогрессе и проверка отмены.
+    """
+
+    def __init__(self, job_id, messages, cancel_event):
+        self.job_id = job_id
+        self._messages = messages
+        self._cancel_event = cancel_event
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, done, total, partial=None):
+        # Каждая точка отчёта одновременно является точкой отмены
+        self.check_cancelled()
+        self._messages.put(('progress', self.job_id, (done, total, partial)))
+
+
+class JobScheduler:
+    """
+    Планировщик фоновых задач для Tk-приложения.
+
+    Задачи выполняются в пуле потоков (NumPy и scikit-learn отпускают GIL
+    в тяжёлых участках, а данные не нужно копировать в другой процесс).
+    Прогресс, результаты и ошибки передаются через очередь, которую
+    опрашивает цикл событий Tk, поэтому все колбэки вызываются в главном потоке.
+    Одновременно выполняется только одна задача: вторая либо отклоняется,
+    либо ставится в очередь (queue_jobs=True).
+    """
+
+    def __init__(self, root, poll_interval=100, queue_jobs=False):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.queue_jobs = queue_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clustering-job')
+        self._messages = queue.Queue()
+        self._pending = []
+        self._current = None
+        self._next_id = 0
+        self._poll_id = None
+
+    @property
+    def is_busy(self):
+        return self._current is not None
+
+    def submit(self, func, *args, on_progress=None, on_done=None, on_error=None, on_cancel=None, **kwargs):
+        """
+        Запускает func(job, *args, **kwargs) в фоне.
+        Возвращает идентификатор задачи или None, если задача отклонена.
+        """
+        self._next_id += 1
+        job = {
+            'id': self._next_id,
+            'func': func,
+            'args': args,
+            'kwargs': kwargs,
+            'cancel_event': threading.Event(),
+            'on_progress': on_progress,
+            'on_done': on_done,
+            'on_error': on_error,
+            'on_cancel': on_cancel,
+        }
+        if self._current is not None:
+            if not self.queue_jobs:
+                return None
+            self._pending.append(job)
+            return job['id']
+        self._start(job)
+        return job['id']
+
+    def cancel(self):
+        """
+        Запрашивает отмену текущей задачи и удаляет задачи из очереди.
+        Отмена кооперативная: задача завершится в ближайшей точке отчёта.
+        """
+        for job in self._pending:
+            if job['on_cancel'] is not None:
+                job['on_cancel']()
+        self._pending = []
+        if self._current is not None:
+            self._current['cancel_event'].set()
+
+    def shutdown(self):
+        self.cancel()
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._executor.shutdown(wait=False)
+
+    def _start(self, job):
+        self._current = job
+        context = JobContext(job['id'], self._messages, job['cancel_event'])
+        self._executor.submit(self._run, job, context)
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _run(self, job, context):
+        # Выполняется в рабочем потоке: никаких обращений к Tk
+        try:
+            result = job['func'](context, *job['args'], **job['kwargs'])
+            context.check_cancelled()
+            self._messages.put(('done', job['id'], result))
+        except JobCancelled:
+            self._messages.put(('cancelled', job['id'], None))
+        except Exception as e:
+            self._messages.put(('error', job['id'], e))
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                kind, job_id, payload = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            job = self._current
+            if job is None or job['id'] != job_id:
+                continue
+            if kind == 'progress':
+                # Сообщения отменённой задачи больше не показываем
+                if job['on_progress'] is not None and not job['cancel_event'].is_set():
+                    job['on_progress'](*payload)
+                continue
+
+            self._current = None
+            if kind == 'done' and not job['cancel_event'].is_set():
+                callback, callback_args = job['on_done'], (payload,)
+            elif kind == 'error':
+                callback, callback_args = job['on_error'], (payload,)
+            else:
+                callback, callback_args = job['on_cancel'], ()
+            if callback is not None:
+                callback(*callback_args)
+            if self._current is None and self._pending:
+                self._start(self._pending.pop(0))
+
+        if self._current is not None and self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
@@ -0,0 +1,112 @@
+import importlib
+import sys
+import threading
+import time
+
+# Модули, загрузка которых занимает большую часть времени запуска
+HEAVY_MODULES = (
+    'pandas',
+    'sklearn.cluster',
+    'sklearn.neighbors',
+    'sklearn.decomposition',
+    'scipy.stats',
+    'minisom',
+    'chardet',
+    'matplotlib.figure',
+    'matplotlib.backends.backend_tkagg',
+    'data_processing',
+    'clustering',
+    'visualization',
+)
+
+# Время первого импорта модулей (секунды), загруженных через load_module
+IMPORT_TIMES = {}
+_lock = threading.RLock()
+
+
+def load_module(name):
+    """
+    Импорт модуля с замером времени первой загрузки.
+    Модуль не берётся из sys.modules напрямую: пока фоновый поток его импортирует,
+    там лежит частично инициализированный модуль, а import_module дожидается
+    окончания импорта на блокировке этого модуля.
+    """
+    loaded = name in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    if not loaded:
+        with _lock:
+            IMPORT_TIMES.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+class LazyModule:
+    """
+    Модуль, который импортируется при первом обращении к его атрибутам.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = load_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = 'загружен' if self._module is not None else 'не загружен'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+class LazyComponent:
+    """
+    Атрибут класса: экземпляр module.class_name создаётся при первом обращении
+    и сохраняется в атрибуте объекта с тем же именем.
+    """
+
+    def __init__(self, module, class_name, *args, **kwargs):
+        self.module = module
+        self.class_name = class_name
+        self.args = args
+        self.kwargs = kwargs
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__.get(self.name)
+        if value is not None:
+            return value
+        with _lock:
+            # Объект мог быть создан другим потоком, пока этот ждал блокировку
+            value = obj.__dict__.get(self.name)
+            if value is None:
+                cls = getattr(load_module(self.module), self.class_name)
+                value = cls(*self.args, **self.kwargs)
+                obj.__dict__[self.name] = value
+        return value
+
+    def is_loaded(self, obj):
+        return obj.__dict__.get(self.name) is not None
+
+
+def warm_up(modules=HEAVY_MODULES):
+    """
+    Фоновая загрузка модулей, пока пользователь работает с окном;
+    время импорта каждого модуля записывается в IMPORT_TIMES.
+    """
+    def run():
+        for name in modules:
+            try:
+                load_module(name)
+            except Exception as e:
+                # Ошибка повторится и будет показана при первом использовании модуля
+                print(f"Не удалось заранее загрузить модуль {name}: {e}")
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -1,5 +1,8 @@
+import sys
+
 from gui import ClusteringApp
 
 if __name__ == "__main__":
-    app = ClusteringApp()
+    # --no-warm-up: не загружать библиотеки заранее в фоне (только при первом использовании)
+    app = ClusteringApp(warm_up_imports='--no-warm-up' not in sys.argv[1:])
     app.mainloop()
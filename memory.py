@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # psutil не обязателен: без него RSS читается из /proc
+    psutil = None
+
+
+def current_rss():
+    """
+    Текущий объём резидентной памяти процесса в байтах (0, если узнать нельзя).
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def compact_labels(labels):
+    """
+    Метки кластеров в наименьшем целочисленном типе, вмещающем их диапазон.
+    """
+    labels = np.asarray(labels)
+    if len(labels) == 0:
+        return labels.astype(np.int8)
+    low, high = int(labels.min()), int(labels.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return labels.astype(dtype, copy=False)
+    return labels
+
+
+class PeakSampler:
+    """
+    RSS в начале и в конце блока with и наибольший RSS внутри него,
+    который фоновый поток измеряет с интервалом interval секунд
+    (память, выделенная и освобождённая внутри блока, тоже учитывается).
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = self.end = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.end = current_rss()
+        self.peak = max(self.peak, self.end)
+        return False
+
+
+class MemoryTracker:
+    """
+    Потребление памяти по этапам обработки.
+
+    Для каждого этапа запоминается RSS в начале и в конце, а также пик
+    внутри этапа (PeakSampler).
+    """
+
+    def __init__(self, interval=0.01, max_stages=50):
+        self.interval = interval
+        self.max_stages = max_stages
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        sampler = PeakSampler(self.interval)
+        started = time.perf_counter()
+        try:
+            with sampler:
+                yield
+        finally:
+            record = {
+                'stage': name,
+                'start': sampler.start,
+                'end': sampler.end,
+                'peak': sampler.peak,
+                'seconds': time.perf_counter() - started,
+            }
+            with self._lock:
+                self.stages.append(record)
+                del self.stages[:-self.max_stages]
+            print(self.format_record(record))
+
+    def format_record(self, record):
+        mb = 1024 ** 2
+        return (f"{record['stage']}: RSS {record['start'] / mb:.0f} → {record['end'] / mb:.0f} МБ, "
+                f"пик {record['peak'] / mb:.0f} МБ (+{(record['peak'] - record['start']) / mb:.0f}), "
+                f"{record['seconds']:.2f} с")
+
+    def report(self):
+        with self._lock:
+            stages = list(self.stages)
+        return "\n".join(self.format_record(record) for record in stages)
+
+    def clear(self):
+        with self._lock:
+            self.stages.clear()
@@ -0,0 +1,180 @@
+import json
+import time
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from preprocess_state import PreprocessState
+from reduction import Reduction
+from streaming_loader import StreamingCSVLoader
+
+MODEL_FORMAT_VERSION = 1
+MODEL_KINDS = ('kmeans', 'som', 'dbscan')
+
+
+def nearest_centers(data, centers, chunk_size=4096):
+    """
+    Индекс ближайшего центра и расстояние до него для каждой строки (порциями).
+    """
+    index = np.empty(len(data), dtype=np.int64)
+    distances = np.empty(len(data))
+    scaled_centers = -2.0 * centers.T
+    center_norms = np.einsum('ij,ij->i', centers, centers)
+    for start in range(0, len(data), chunk_size):
+        stop = min(start + chunk_size, len(data))
+        chunk = np.asarray(data[start:stop], dtype=np.float64)
+        partial = chunk @ scaled_centers
+        partial += center_norms
+        best = partial.argmin(axis=1)
+        sq = partial[np.arange(stop - start), best] + np.einsum('ij,ij->i', chunk, chunk)
+        index[start:stop] = best
+        distances[start:stop] = np.sqrt(np.maximum(sq, 0.0))
+    return index, distances
+
+
+class ClusterModel:
+    """
+    Сохраняемая модель кластеризации: параметры предобработки и обученная модель.
+
+    Модель задаётся набором опорных точек с метками: для K-Means это центры
+    кластеров, для SOM — веса занятых узлов карты, для DBSCAN — ядровые точки
+    и eps. Новая строка получает метку ближайшей опорной точки; в DBSCAN —
+    только если ядровая точка ближе eps, иначе -1 (шум), как при обучении.
+    Оценка новых данных идёт порциями без переобучения. Если перед кластеризацией
+    размерность снижалась, вместе с моделью хранится проекция (reduction),
+    и опорные точки заданы в её координатах.
+    """
+
+    def __init__(self, kind, state, centers, center_labels, eps=None, meta=None, chunk_size=65536, reduction=None):
+        if kind not in MODEL_KINDS:
+            raise ValueError(f"Неизвестный тип модели: {kind}")
+        self.kind = kind
+        self.state = state
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.center_labels = np.asarray(center_labels, dtype=np.int32)
+        self.eps = eps
+        self.meta = dict(meta or {})
+        self.chunk_size = chunk_size
+        self.reduction = reduction
+        self._index = None
+
+    @property
+    def columns(self):
+        return self.state.columns
+
+    @property
+    def n_clusters(self):
+        labels = self.center_labels[self.center_labels >= 0]
+        return len(np.unique(labels))
+
+    def transform_matrix(self, data):
+        """
+        Строки DataFrame или числовой матрицы в координатах опорных точек:
+        предобработка как при обучении и, если она была, проекция (reduction).
+        Возвращает (матрица, маска строк, которые удалось оценить).
+        """
+        scaled, valid = self.state.transform(data)
+        if self.reduction is not None:
+            scaled = self.reduction.transform(scaled)
+        return scaled, valid
+
+    def assign(self, scaled_data):
+        """
+        Метки и расстояния до ближайшей опорной точки для уже масштабированных строк.
+        """
+        if self.kind == 'dbscan':
+            # Ядровых точек может быть много, поэтому используется дерево, а не полный перебор
+            if self._index is None:
+                self._index = NearestNeighbors(n_neighbors=1).fit(self.centers)
+            distances, index = self._index.kneighbors(scaled_data)
+            distances, index = distances[:, 0], index[:, 0]
+            labels = self.center_labels[index]
+            labels[distances > self.eps] = -1
+            return labels, distances
+        index, distances = nearest_centers(scaled_data, self.centers)
+        return self.center_labels[index], distances
+
+    def score_matrix(self, data):
+        """
+        Метки и расстояния для одной порции строк (DataFrame или числовая матрица
+        в порядке столбцов модели). Строки, которые нельзя оценить (пропуски
+        при обучении без заполнения), получают метку -1 и расстояние NaN.
+        """
+        labels = np.full(len(data), -1, dtype=np.int32)
+        distances = np.full(len(data), np.nan)
+        scaled, valid = self.transform_matrix(data)
+        if valid.any():
+            labels[valid], distances[valid] = self.assign(scaled[valid])
+        return labels, distances
+
+    def predict(self, data, return_distance=False):
+        """
+        Метки кластеров для строк DataFrame (порциями по chunk_size, см. score_matrix).
+        """
+        labels = np.full(len(data), -1, dtype=np.int32)
+        distances = np.full(len(data), np.nan)
+        for start in range(0, len(data), self.chunk_size):
+            stop = min(start + self.chunk_size, len(data))
+            labels[start:stop], distances[start:stop] = self.score_matrix(data.iloc[start:stop])
+        if return_distance:
+            return labels, distances
+        return labels
+
+    def predict_file(self, file_path, output_path, loader=None, progress=None):
+        """
+        Оценка CSV-файла порциями: к каждой порции добавляется столбец Cluster,
+        результат дописывается в output_path. Память не зависит от размера файла.
+        Возвращает количество строк по кластерам.
+        """
+        loader = loader or StreamingCSVLoader([])
+        encoding, delimiter = loader.detect_format(file_path)
+        counts = {}
+        n_rows = 0
+        start = time.perf_counter()
+        for i, chunk in enumerate(loader.iter_chunks(file_path, encoding, delimiter)):
+            labels = self.predict(chunk)
+            chunk['Cluster'] = labels
+            chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            for label, count in zip(*np.unique(labels, return_counts=True)):
+                counts[int(label)] = counts.get(int(label), 0) + int(count)
+            n_rows += len(chunk)
+            if progress is not None:
+                progress(n_rows, None, 'Оценка строк')
+        elapsed = time.perf_counter() - start
+        print(f"Оценено {n_rows} строк за {elapsed:.2f} с ({n_rows / max(elapsed, 1e-9):.0f} строк/с)")
+        return counts
+
+    def save(self, path):
+        arrays, state_meta = self.state.to_arrays()
+        meta = dict(self.meta)
+        meta.update({
+            'format_version': MODEL_FORMAT_VERSION,
+            'kind': self.kind,
+            'eps': self.eps,
+            'n_clusters': self.n_clusters,
+            'state': state_meta,
+            'reduction': None,
+            'saved': time.time(),
+        })
+        if self.reduction is not None:
+            reduction_arrays, meta['reduction'] = self.reduction.to_arrays()
+            arrays.update(reduction_arrays)
+        arrays['centers'] = self.centers
+        arrays['center_labels'] = self.center_labels
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as bundle:
+            arrays = {name: bundle[name] for name in bundle.files}
+        meta = json.loads(str(arrays.pop('meta')))
+        if meta.get('format_version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия файла модели: {meta.get('format_version')}")
+        state = PreprocessState.from_arrays(arrays, meta.pop('state'))
+        reduction_meta = meta.pop('reduction', None)
+        reduction = Reduction.from_arrays(arrays, reduction_meta) if reduction_meta else None
+        return cls(
+            meta.pop('kind'), state, arrays['centers'], arrays['center_labels'], eps=meta.pop('eps'), meta=meta,
+            reduction=reduction,
+        )
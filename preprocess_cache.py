@@ -0,0 +1,84 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def dataset_fingerprint(data):
+    """
+    Хэш содержимого DataFrame: значения всех строк, названия и типы столбцов.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr([(str(col), str(dtype)) for col, dtype in data.dtypes.items()]).encode('utf-8'))
+    row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    hasher.update(np.ascontiguousarray(row_hashes).tobytes())
+    return hasher.hexdigest()
+
+
+class PreprocessCache:
+    """
+    LRU-кэш результатов предобработки.
+
+    Ключ — отпечаток данных, выбранные способы обработки пропусков и выбросов и правило поиска выбросов,
+    значение — кортеж (масштабированная матрица, столбцы, маска строк, параметры предобработки).
+    Размер ограничен количеством записей и суммарным объёмом массивов.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=1024 ** 3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(fingerprint, nan_policy, outlier_policy, outlier_rule='zscore'):
+        return fingerprint, nan_policy, outlier_policy, outlier_rule
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def record_miss(self):
+        # Промах без обращения по ключу: ответы пользователя для этих данных ещё неизвестны
+        self.misses += 1
+
+    def put(self, key, entry):
+        # Кэшированные массивы отдаются нескольким потребителям, поэтому только для чтения
+        for value in entry:
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries or (
+                len(self._entries) > 1 and self.nbytes() > self.max_bytes):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def nbytes(self):
+        total = 0
+        for entry in self._entries.values():
+            total += sum(value.nbytes for value in entry if isinstance(value, np.ndarray))
+        return total
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.nbytes(),
+        }
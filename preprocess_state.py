@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+
+class PreprocessState:
+    """
+    Параметры, найденные предобработкой на обучающих данных: столбцы,
+    значения для заполнения пропусков, границы ограничения выбросов
+    и параметры масштабирования. transform применяет их к новым строкам
+    в том же порядке, что и DataProcessor.preprocess_data. outlier_rule —
+    правило, по которому найдены границы lower/upper ('zscore', 'iqr', 'mad').
+    """
+
+    def __init__(self, columns, mean, scale, nan_policy=None, fill_values=None,
+                 outlier_policy=None, lower=None, upper=None, outlier_rule='zscore'):
+        self.columns = list(columns)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.nan_policy = nan_policy
+        self.fill_values = None if fill_values is None else np.asarray(fill_values, dtype=np.float64)
+        self.outlier_policy = outlier_policy
+        self.lower = None if lower is None else np.asarray(lower, dtype=np.float64)
+        self.upper = None if upper is None else np.asarray(upper, dtype=np.float64)
+        self.outlier_rule = outlier_rule
+
+    def numeric_matrix(self, data):
+        missing = [col for col in self.columns if col not in data.columns]
+        if missing:
+            raise ValueError(f"В данных нет столбцов модели: {missing}")
+        frame = data[self.columns]
+        matrix = np.empty((len(frame), len(self.columns)), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            values = frame[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors='coerce')
+            matrix[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return matrix
+
+    def clean(self, data):
+        """
+        Возвращает (матрица в исходных единицах, маска строк, которые можно оценить).
+        Строки с пропусками помечаются как неоцениваемые, если при обучении
+        пропуски не заполнялись медианами (политика 'drop' или пропусков не было);
+        выбросы в новых данных не удаляются, а при политике 'cap' ограничиваются.
+        """
+        matrix = data if isinstance(data, np.ndarray) else self.numeric_matrix(data)
+        matrix = np.array(matrix, dtype=np.float64)
+        missing = np.isnan(matrix)
+        valid = np.ones(len(matrix), dtype=bool)
+        if missing.any():
+            if self.nan_policy == 'drop' or self.fill_values is None:
+                valid = ~missing.any(axis=1)
+                matrix[missing] = 0.0
+            else:
+                matrix = np.where(missing, self.fill_values, matrix)
+        if self.outlier_policy == 'cap':
+            np.clip(matrix, self.lower, self.upper, out=matrix)
+        return matrix, valid
+
+    def transform(self, data):
+        """
+        Возвращает (масштабированная матрица, маска строк, которые можно оценить);
+        обработка пропусков и выбросов — как в clean.
+        """
+        matrix, valid = self.clean(data)
+        matrix -= self.mean
+        matrix /= self.scale
+        return matrix, valid
+
+    def to_arrays(self, prefix='state_'):
+        arrays = {prefix + 'mean': self.mean, prefix + 'scale': self.scale}
+        for name in ('fill_values', 'lower', 'upper'):
+            value = getattr(self, name)
+            if value is not None:
+                arrays[prefix + name] = value
+        meta = {
+            'columns': [str(col) for col in self.columns],
+            'nan_policy': self.nan_policy,
+            'outlier_policy': self.outlier_policy,
+            'outlier_rule': self.outlier_rule,
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta, prefix='state_'):
+        def optional(name):
+            key = prefix + name
+            return arrays[key] if key in arrays else None
+        return cls(
+            meta['columns'], arrays[prefix + 'mean'], arrays[prefix + 'scale'],
+            nan_policy=meta['nan_policy'], fill_values=optional('fill_values'),
+            outlier_policy=meta['outlier_policy'], lower=optional('lower'), upper=optional('upper'),
+            outlier_rule=meta.get('outlier_rule', 'zscore'),
+        )
@@ -0,0 +1,104 @@
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.random_projection import SparseRandomProjection
+
+REDUCTION_METHODS = ('pca', 'randomized_pca', 'random_projection')
+
+
+class Reduction:
+    """
+    Линейное снижение размерности масштабированных признаков: x → (x - mean) @ components.T.
+
+    Способы:
+    'pca' — точный PCA, число компонент — наименьшее, объясняющее долю variance дисперсии;
+    'randomized_pca' — рандомизированный PCA не более чем с max_components компонентами,
+        затем отсечение по той же доле дисперсии (быстрее точного при сотнях столбцов);
+    'random_projection' — разреженная случайная проекция, приблизительно сохраняющая
+        расстояния; число компонент по умолчанию — четверть столбцов.
+
+    Проекция обучается на случайной выборке строк (не больше sample_size),
+    применяется ко всем строкам порциями и сохраняется вместе с моделью.
+    """
+
+    def __init__(self, method, mean, components, explained_variance_ratio=None):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Неизвестный способ снижения размерности: {method}")
+        self.method = method
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.components = np.asarray(components, dtype=np.float64)
+        self.explained_variance_ratio = None if explained_variance_ratio is None \
+            else np.asarray(explained_variance_ratio, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, scaled_data, method='pca', variance=0.95, n_components=None, max_components=100,
+            sample_size=200000, random_state=42):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Неизвестный способ снижения размерности: {method}")
+        n_features = scaled_data.shape[1]
+        rng = np.random.default_rng(random_state)
+        if len(scaled_data) > sample_size:
+            sample = scaled_data[np.sort(rng.choice(len(scaled_data), sample_size, replace=False))]
+        else:
+            sample = scaled_data
+        sample = np.asarray(sample, dtype=np.float64)
+
+        if method == 'random_projection':
+            n_components = n_components or max(2, n_features // 4)
+            projection = SparseRandomProjection(n_components=min(n_components, n_features), random_state=random_state)
+            projection.fit(sample)
+            return cls(method, np.zeros(n_features), projection.components_.toarray())
+
+        if method == 'pca':
+            pca = PCA(n_components=n_components, svd_solver='full', random_state=random_state)
+        else:
+            limit = min(n_components or max_components, n_features, len(sample))
+            pca = PCA(n_components=limit, svd_solver='randomized', random_state=random_state)
+        pca.fit(sample)
+        ratio = pca.explained_variance_ratio_
+        keep = len(ratio)
+        if n_components is None:
+            # Наименьшее число компонент, объясняющее заданную долю дисперсии (не меньше двух для графика)
+            keep = min(len(ratio), max(2, int(np.searchsorted(np.cumsum(ratio), variance) + 1)))
+        return cls(method, pca.mean_, pca.components_[:keep], ratio[:keep])
+
+    @property
+    def n_components(self):
+        return len(self.components)
+
+    @property
+    def n_features(self):
+        return self.components.shape[1]
+
+    @property
+    def is_pca(self):
+        # Компоненты PCA упорядочены по дисперсии: первые две — координаты диаграммы рассеяния
+        return self.method != 'random_projection'
+
+    def transform(self, data, chunk_size=100000):
+        # float32 сохраняется (режим экономии памяти), остальное считается в float64
+        dtype = np.float32 if getattr(data, 'dtype', None) == np.float32 else np.float64
+        reduced = np.empty((len(data), self.n_components), dtype=dtype)
+        components = self.components.T
+        for start in range(0, len(data), chunk_size):
+            chunk = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+            reduced[start:start + chunk_size] = (chunk - self.mean) @ components
+        return reduced
+
+    def describe(self):
+        text = f"{self.method}: компонент {self.n_components} из {self.n_features}"
+        if self.explained_variance_ratio is not None:
+            text += f", объяснено {self.explained_variance_ratio.sum():.1%} дисперсии"
+        return text
+
+    def to_arrays(self, prefix='reduction_'):
+        arrays = {prefix + 'mean': self.mean, prefix + 'components': self.components}
+        if self.explained_variance_ratio is not None:
+            arrays[prefix + 'explained_variance_ratio'] = self.explained_variance_ratio
+        return arrays, {'method': self.method}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta, prefix='reduction_'):
+        return cls(
+            meta['method'], arrays[prefix + 'mean'], arrays[prefix + 'components'],
+            arrays.get(prefix + 'explained_variance_ratio'),
+        )
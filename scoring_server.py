@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import collections
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_bundle import ClusterModel
+
+
+class ScoringStats:
+    """
+    Счётчики сервера: запросы, строки, пакеты, задержки последних запросов.
+    """
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=window)
+        self.batch_sizes = collections.deque(maxlen=window)
+
+    def record_batch(self, n_rows):
+        self.batches += 1
+        self.batch_sizes.append(n_rows)
+
+    def record_request(self, n_rows, latency):
+        self.requests += 1
+        self.rows += n_rows
+        self.latencies.append(latency)
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        result = {
+            'uptime_s': uptime,
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'errors': self.errors,
+            'requests_per_s': self.requests / uptime if uptime > 0 else 0.0,
+            'rows_per_s': self.rows / uptime if uptime > 0 else 0.0,
+            'mean_batch_rows': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+        }
+        if self.latencies:
+            p50, p95, p99 = np.percentile(np.asarray(self.latencies) * 1000.0, [50, 95, 99])
+            result.update({'latency_ms_p50': p50, 'latency_ms_p95': p95, 'latency_ms_p99': p99})
+        return result
+
+
+class ScoringServer:
+    """
+    Сервер оценки новых клиентов по сохранённой модели (HTTP поверх asyncio,
+    по TCP или Unix-сокету).
+
+    Модель загружается один раз. Строки из одновременных запросов собираются
+    в пакеты (микропакетирование): пакет закрывается, когда набрано max_batch
+    строк или прошло max_wait секунд с первого запроса, и оценивается одним
+    векторным расчётом той же предобработкой (PreprocessState), что и при обучении.
+
+    POST /predict — {"records": [{столбец: значение, ...}, ...]} или
+    {"columns": [...], "rows": [[...], ...]}; ответ {"labels": [...], "distances": [...]}.
+    GET /stats — счётчики пропускной способности и задержек, GET /health — проверка.
+    """
+
+    def __init__(self, model, max_batch=4096, max_wait=0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = ScoringStats()
+        self._queue = None
+        self._batcher = None
+
+    def parse_rows(self, payload):
+        # Строки запроса -> числовая матрица в порядке столбцов модели (как в preprocess_data)
+        if 'records' in payload:
+            frame = pd.DataFrame.from_records(payload['records'])
+        else:
+            frame = pd.DataFrame(payload['rows'], columns=payload['columns'])
+        return self.model.state.numeric_matrix(frame)
+
+    def score(self, matrix):
+        # Тот же расчёт, что в ClusterModel.predict, для всего пакета сразу
+        return self.model.score_matrix(matrix)
+
+    async def submit(self, matrix):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((matrix, future))
+        return await future
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while n_rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+
+            matrix = np.concatenate([item[0] for item in pending]) if len(pending) > 1 else pending[0][0]
+            try:
+                # Расчёт в отдельном потоке, чтобы цикл событий продолжал принимать запросы
+                labels, distances = await loop.run_in_executor(None, self.score, matrix)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.record_batch(n_rows)
+            position = 0
+            for rows, future in pending:
+                stop = position + len(rows)
+                if not future.done():
+                    future.set_result((labels[position:stop], distances[position:stop]))
+                position = stop
+
+    async def handle_predict(self, body):
+        start = time.perf_counter()
+        matrix = self.parse_rows(json.loads(body))
+        labels, distances = await self.submit(matrix)
+        self.stats.record_request(len(matrix), time.perf_counter() - start)
+        return {
+            'labels': labels.tolist(),
+            'distances': [None if np.isnan(d) else float(d) for d in distances],
+        }
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'model': self.model.kind, 'columns': self.model.columns}
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats.snapshot()
+        if method == 'POST' and path == '/predict':
+            return 200, await self.handle_predict(body)
+        return 404, {'error': f'Неизвестный запрос: {method} {path}'}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    status, response = await self.route(method, path, body)
+                except Exception as e:
+                    self.stats.errors += 1
+                    status, response = 400, {'error': str(e)}
+                payload = json.dumps(response, ensure_ascii=False).encode('utf-8')
+                reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}[status]
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode('latin-1') + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_socket=None):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self.batch_loop())
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"Сервер оценки слушает {unix_socket}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Сервер оценки слушает http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер оценки клиентов по сохранённой модели кластеризации")
+    parser.add_argument('model', help="Файл модели (.npz), сохранённый из приложения")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help="Путь к Unix-сокету вместо TCP")
+    parser.add_argument('--max-batch', type=int, default=4096, help="Наибольшее число строк в пакете")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="Время сбора пакета, мс")
+    args = parser.parse_args(argv)
+
+    model = ClusterModel.load(args.model)
+    print(f"Модель загружена: {model.kind}, кластеров {model.n_clusters}, столбцы {model.columns}")
+    server = ScoringServer(model, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000.0)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        print("Сервер остановлен")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import stats
+
+
+def cluster_distance_sums(rows, reference, reference_codes, n_clusters, block_size=1024):
+    """
+    Суммы расстояний от каждой строки rows до точек reference каждого кластера.
+    Матрица расстояний строится блоками по block_size столбцов, поэтому память
+    ограничена len(rows) * block_size, а не len(rows) * len(reference).
+    """
+    sums = np.zeros((len(rows), n_clusters))
+    row_norms = np.einsum('ij,ij->i', rows, rows)
+    for start in range(0, len(reference), block_size):
+        stop = min(start + block_size, len(reference))
+        block = reference[start:stop]
+        # |x - y|^2 = |x|^2 - 2 x.y + |y|^2, все операции над блоком выполняются на месте
+        distances = rows @ block.T
+        distances *= -2.0
+        distances += row_norms[:, None]
+        distances += np.einsum('ij,ij->i', block, block)[None, :]
+        np.maximum(distances, 0.0, out=distances)
+        np.sqrt(distances, out=distances)
+        # Суммирование столбцов блока по кластерам одним умножением на индикаторную матрицу
+        indicator = np.zeros((stop - start, n_clusters))
+        indicator[np.arange(stop - start), reference_codes[start:stop]] = 1.0
+        sums += distances @ indicator
+    return sums
+
+
+def silhouette_from_sums(sums, own_codes, counts, includes_self=True):
+    """
+    Значения силуэта по суммам расстояний до кластеров и их размерам.
+    includes_self — строки сами входят в опорное множество (их расстояние до себя равно 0).
+    """
+    rows = np.arange(len(own_codes))
+    own_counts = counts[own_codes] - (1 if includes_self else 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = sums[rows, own_codes] / own_counts
+        mean_other = sums / counts
+    mean_other[rows, own_codes] = np.inf
+    b = mean_other.min(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = (b - a) / np.maximum(a, b)
+    # Для кластеров из одной точки силуэт принимается равным 0, как в scikit-learn
+    values[own_counts <= 0] = 0.0
+    return np.nan_to_num(values, nan=0.0)
+
+
+class SilhouetteEngine:
+    """
+    Расчёт коэффициента силуэта для больших наборов данных.
+
+    exact_* — точные значения, вычисляемые порциями строк в рабочих процессах
+    с ограниченным объёмом памяти на порцию.
+    sampled — оценка по стратифицированной (по кластерам) выборке
+    с доверительным интервалом и распределениями значений по кластерам.
+    """
+
+    def __init__(self, chunk_size=512, block_size=1024, n_jobs=-1, random_state=42):
+        # Порция строк и блок столбцов подобраны так, чтобы матрица расстояний помещалась в кэш процессора
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def distance_sums(self, rows, reference, reference_codes, n_clusters, n_jobs=1):
+        chunks = [(start, min(start + self.chunk_size, len(rows)))
+                  for start in range(0, len(rows), self.chunk_size)]
+        n_jobs = min(effective_n_jobs(n_jobs), len(chunks))
+        if n_jobs > 1:
+            parts = Parallel(n_jobs=n_jobs)(
+                delayed(cluster_distance_sums)(rows[start:stop], reference, reference_codes, n_clusters, self.block_size)
+                for start, stop in chunks
+            )
+        else:
+            parts = [cluster_distance_sums(rows[start:stop], reference, reference_codes, n_clusters, self.block_size)
+                     for start, stop in chunks]
+        return np.vstack(parts)
+
+    def exact_samples(self, scaled_data, clusters):
+        labels, codes = np.unique(clusters, return_inverse=True)
+        codes = codes.ravel()
+        counts = np.bincount(codes, minlength=len(labels))
+        sums = self.distance_sums(scaled_data, scaled_data, codes, len(labels), n_jobs=self.n_jobs)
+        return silhouette_from_sums(sums, codes, counts)
+
+    def exact_score(self, scaled_data, clusters):
+        return float(self.exact_samples(scaled_data, clusters).mean())
+
+    def stratified_sample(self, clusters, sample_size, min_per_cluster=50):
+        """
+        Индексы выборки: из каждого кластера пропорционально его размеру,
+        но не меньше min_per_cluster точек (или всего кластера, если он меньше).
+        """
+        rng = np.random.default_rng(self.random_state)
+        labels, codes = np.unique(clusters, return_inverse=True)
+        codes = codes.ravel()
+        counts = np.bincount(codes, minlength=len(labels))
+        n = len(codes)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        indices = []
+        for c in range(len(labels)):
+            members = order[bounds[c]:bounds[c + 1]]
+            m = int(round(sample_size * counts[c] / n))
+            m = min(counts[c], max(m, min_per_cluster))
+            indices.append(np.sort(rng.choice(members, m, replace=False)))
+        return labels, counts, indices
+
+    def sampled(self, scaled_data, clusters, sample_size=10000, confidence=0.95, min_per_cluster=50):
+        """
+        Стратифицированная оценка среднего силуэта.
+        Возвращает словарь: score, ci (нижняя и верхняя граница), per_cluster
+        (отсортированные значения выборки по каждому кластеру), cluster_sizes, sample_size.
+        """
+        labels, counts, indices = self.stratified_sample(clusters, sample_size, min_per_cluster)
+        sample_index = np.concatenate(indices)
+        sample_codes = np.repeat(np.arange(len(labels)), [len(idx) for idx in indices])
+        sample_counts = np.bincount(sample_codes, minlength=len(labels))
+        sample = scaled_data[sample_index]
+
+        # Расстояния внутри выборки: средние по кластерам оцениваются по опорным точкам выборки
+        sums = self.distance_sums(sample, sample, sample_codes, len(labels))
+        values = silhouette_from_sums(sums, sample_codes, sample_counts)
+
+        n = counts.sum()
+        weights = counts / n
+        estimate = 0.0
+        variance = 0.0
+        per_cluster = {}
+        for c, label in enumerate(labels):
+            cluster_values = values[sample_codes == c]
+            per_cluster[label] = np.sort(cluster_values)
+            m = len(cluster_values)
+            estimate += weights[c] * cluster_values.mean()
+            if m > 1:
+                # Дисперсия стратифицированной оценки с поправкой на конечность совокупности
+                variance += weights[c] ** 2 * cluster_values.var(ddof=1) / m * (1 - m / counts[c])
+        z = stats.norm.ppf(0.5 + confidence / 2)
+        margin = z * np.sqrt(variance)
+        return {
+            'score': float(estimate),
+            'ci': (float(estimate - margin), float(estimate + margin)),
+            'per_cluster': per_cluster,
+            'cluster_sizes': dict(zip(labels, counts)),
+            'sample_size': len(sample_index),
+            'exact': len(sample_index) == n,
+        }
+
+    def estimate(self, scaled_data, clusters, exact_threshold=20000, sample_size=10000):
+        """
+        Точный расчёт для небольших данных и стратифицированная оценка для больших.
+        """
+        if len(scaled_data) <= exact_threshold:
+            values = self.exact_samples(scaled_data, clusters)
+            labels = np.unique(clusters)
+            score = float(values.mean())
+            return {
+                'score': score,
+                'ci': (score, score),
+                'per_cluster': {label: np.sort(values[clusters == label]) for label in labels},
+                'cluster_sizes': {label: int(np.sum(clusters == label)) for label in labels},
+                'sample_size': len(values),
+                'exact': True,
+            }
+        return self.sampled(scaled_data, clusters, sample_size=sample_size)
@@ -0,0 +1,113 @@
+import numpy as np
+from scipy import sparse
+
+
+class BatchSOM:
+    """
+    Самоорганизующаяся карта с пакетным обучением.
+
+    За эпоху для всех строк одним матричным расчётом (порциями по chunk_size)
+    находятся узлы-победители (BMU), после чего веса всей карты обновляются
+    разом: каждый узел становится взвешенным средним точек, попавших в соседние
+    узлы, с гауссовой функцией соседства. Радиус соседства уменьшается
+    от sigma до sigma_end по экспоненте.
+    """
+
+    def __init__(self, rows, cols, sigma=None, sigma_end=0.5, chunk_size=1024, random_state=42):
+        self.rows = rows
+        self.cols = cols
+        self.sigma = sigma if sigma is not None else max(rows, cols) / 2.0
+        self.sigma_end = sigma_end
+        self.chunk_size = chunk_size
+        self.random_state = random_state
+        grid_rows, grid_cols = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+        self.grid = np.column_stack([grid_rows.ravel(), grid_cols.ravel()])
+        self.weights = None
+        self.quantization_error_ = None
+        self.topographic_error_ = None
+
+    @property
+    def n_nodes(self):
+        return self.rows * self.cols
+
+    def initialize(self, data):
+        # Начальные веса — случайные строки данных, как в MiniSom.random_weights_init
+        rng = np.random.default_rng(self.random_state)
+        replace = len(data) < self.n_nodes
+        self.weights = np.array(data[rng.choice(len(data), self.n_nodes, replace=replace)], dtype=np.float64)
+
+    def bmu(self, data, return_second=False):
+        """
+        Индексы узлов-победителей (и вторых по близости узлов) для всех строк.
+        С return_second дополнительно возвращаются расстояния до победителей.
+        """
+        first = np.empty(len(data), dtype=np.int64)
+        second = np.empty(len(data), dtype=np.int64) if return_second else None
+        first_distances = np.empty(len(data)) if return_second else None
+        # |x - w|^2 = |x|^2 - 2 x.w + |w|^2; слагаемое |x|^2 не влияет на выбор узла
+        scaled_weights = -2.0 * self.weights.T
+        weight_norms = np.einsum('ij,ij->i', self.weights, self.weights)
+        for start in range(0, len(data), self.chunk_size):
+            stop = min(start + self.chunk_size, len(data))
+            chunk = np.asarray(data[start:stop], dtype=np.float64)
+            partial = chunk @ scaled_weights
+            partial += weight_norms
+            rows = np.arange(stop - start)
+            if return_second and self.n_nodes > 1:
+                best_two = np.argpartition(partial, 1, axis=1)[:, :2]
+                swap = partial[rows, best_two[:, 0]] > partial[rows, best_two[:, 1]]
+                best_two[swap] = best_two[swap][:, ::-1]
+                first[start:stop] = best_two[:, 0]
+                second[start:stop] = best_two[:, 1]
+            else:
+                first[start:stop] = partial.argmin(axis=1)
+                if return_second:
+                    second[start:stop] = first[start:stop]
+            if return_second:
+                sq = partial[rows, first[start:stop]] + np.einsum('ij,ij->i', chunk, chunk)
+                first_distances[start:stop] = np.sqrt(np.maximum(sq, 0.0))
+        if return_second:
+            return first, second, first_distances
+        return first
+
+    def neighborhood(self, sigma):
+        grid_sq_dist = ((self.grid[:, None, :] - self.grid[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-grid_sq_dist / (2.0 * sigma ** 2))
+
+    def fit(self, data, epochs=10, progress=None):
+        if self.weights is None:
+            self.initialize(data)
+        for epoch in range(epochs):
+            fraction = epoch / max(epochs - 1, 1)
+            sigma = self.sigma * (self.sigma_end / self.sigma) ** fraction
+            bmus = self.bmu(data)
+            # Суммы и количества точек по узлам через разреженную индикаторную матрицу
+            indicator = sparse.csr_matrix(
+                (np.ones(len(data)), (bmus, np.arange(len(data)))), shape=(self.n_nodes, len(data))
+            )
+            sums = np.asarray(indicator @ data)
+            counts = np.bincount(bmus, minlength=self.n_nodes).astype(np.float64)
+            h = self.neighborhood(sigma)
+            numerator = h @ sums
+            denominator = h @ counts
+            updated = denominator > 1e-12
+            self.weights[updated] = numerator[updated] / denominator[updated, None]
+            if progress is not None:
+                progress(epoch + 1, epochs)
+        self.evaluate(data)
+        return self
+
+    def evaluate(self, data):
+        """
+        Ошибка квантования (среднее расстояние до BMU) и топографическая ошибка
+        (доля строк, у которых первый и второй BMU не соседи на решётке).
+        """
+        first, second, distances = self.bmu(data, return_second=True)
+        self.quantization_error_ = float(distances.mean())
+        grid_gap = np.abs(self.grid[first] - self.grid[second]).max(axis=1)
+        self.topographic_error_ = float((grid_gap > 1).mean())
+        return self.quantization_error_, self.topographic_error_
+
+    def positions(self, data):
+        # Координаты (строка, столбец) узла-победителя для каждой строки
+        return self.grid[self.bmu(data)]
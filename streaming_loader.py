@@ -0,0 +1,191 @@
+import atexit
+import csv
+import itertools
+import os
+import tempfile
+
+import chardet
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+
+def detect_csv_format(file_path, sample_bytes=100000):
+    """
+    Кодировка и разделитель по одному чтению начала файла.
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read(sample_bytes)
+    encoding = chardet.detect(raw)['encoding'] or 'utf-8'
+    # Образец мог оборваться посреди многобайтового символа
+    sample = raw.decode(encoding, errors='ignore')[:1024]
+    try:
+        delimiter = csv.Sniffer().sniff(sample).delimiter
+    except csv.Error:
+        delimiter = ','  # По умолчанию запятая
+    return encoding, delimiter
+
+
+class ColumnTypeConflict(ValueError):
+    """
+    Столбец, прочитанный в первой порции как числовой, в следующих порциях
+    содержит нечисловые значения.
+    """
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class StreamingCSVLoader:
+    """
+    Потоковая загрузка CSV порциями.
+
+    Числовые столбцы приводятся к float32 по мере чтения и записываются
+    в файл, который затем отображается в память (np.memmap); рядом хранятся
+    только идентификаторные столбцы. Остальные текстовые столбцы отбрасываются.
+    Пиковое потребление памяти определяется размером порции, а не размером файла.
+
+    Типы столбцов определяются по первой порции и проверяются в каждой следующей:
+    если столбец, который pandas прочитал в первой порции как числовой, дальше
+    содержит нечисловые значения, загрузка прерывается (ColumnTypeConflict).
+    В смешанных столбцах (числовых по правилу DataProcessor.find_numeric_columns)
+    нечисловые значения заменяются пропусками, их число по столбцам выводится
+    после загрузки и сохраняется в last_coerced.
+    """
+
+    def __init__(self, exclude_columns, chunk_size=100000, work_dir=None):
+        self.exclude_columns = list(exclude_columns)
+        self.chunk_size = chunk_size
+        self.work_dir = work_dir
+        self.last_coerced = {}
+        self._temp_files = []
+        atexit.register(_remove_files, self._temp_files)
+
+    def temp_path(self, suffix):
+        # Временный файл в рабочем каталоге, удаляется при завершении программы
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.work_dir)
+        os.close(fd)
+        self._temp_files.append(path)
+        return path
+
+    def detect_format(self, file_path):
+        return detect_csv_format(file_path)
+
+    def iter_chunks(self, file_path, encoding=None, delimiter=None, usecols=None):
+        if encoding is None or delimiter is None:
+            encoding, delimiter = detect_csv_format(file_path)
+        return pd.read_csv(
+            file_path, encoding=encoding, delimiter=delimiter,
+            usecols=usecols, chunksize=self.chunk_size,
+        )
+
+    def read_head(self, file_path, encoding=None, delimiter=None):
+        # Первая порция для определения столбцов; файл закрывается сразу после чтения
+        if encoding is None or delimiter is None:
+            encoding, delimiter = detect_csv_format(file_path)
+        return pd.read_csv(file_path, encoding=encoding, delimiter=delimiter, nrows=self.chunk_size)
+
+    def estimate_rows(self, file_path, sample_lines=10000):
+        """
+        Оценка числа строк данных по размеру файла и средней длине первых строк
+        (для индикатора хода первого прохода, пока точное число строк неизвестно).
+        """
+        with open(file_path, 'rb') as f:
+            lengths = [len(line) for line in itertools.islice(f, sample_lines + 1)]
+        if len(lengths) <= 1:
+            return 0
+        if len(lengths) <= sample_lines:
+            return len(lengths) - 1
+        data_bytes = os.path.getsize(file_path) - lengths[0]
+        return max(1, int(data_bytes / (sum(lengths[1:]) / (len(lengths) - 1))))
+
+    def detect_columns(self, first_chunk):
+        """
+        Разделение столбцов на идентификаторные и числовые по первой порции
+        (правило то же, что в DataProcessor.find_numeric_columns).
+        """
+        id_columns = [col for col in first_chunk.columns if col in self.exclude_columns]
+        numeric_columns = []
+        for col in first_chunk.columns:
+            if col in id_columns:
+                continue
+            if pd.api.types.is_numeric_dtype(first_chunk[col]):
+                numeric_columns.append(col)
+            elif pd.to_numeric(first_chunk[col], errors='coerce').notnull().sum() >= 2:
+                numeric_columns.append(col)
+        return id_columns, numeric_columns
+
+    def strict_columns(self, first_chunk, numeric_columns):
+        # Столбцы, прочитанные в первой порции как числовые: нечисловое значение в них дальше — конфликт типов
+        return {col for col in numeric_columns if pd.api.types.is_numeric_dtype(first_chunk[col])}
+
+    def to_float32(self, chunk, numeric_columns, strict=(), coerced=None):
+        """
+        Числовые столбцы порции в float32. strict — столбцы, в которых нечисловые
+        значения недопустимы; coerced — словарь, в котором по столбцам
+        накапливается число нечисловых значений, заменённых пропусками.
+        """
+        matrix = np.empty((len(chunk), len(numeric_columns)), dtype=np.float32)
+        for j, col in enumerate(numeric_columns):
+            values = chunk[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                converted = pd.to_numeric(values, errors='coerce')
+                lost = int((converted.isna() & values.notna()).sum())
+                if lost and col in strict:
+                    example = values[converted.isna() & values.notna()].iloc[0]
+                    raise ColumnTypeConflict(
+                        f"Столбец {col!r} в первых строках числовой, но дальше содержит нечисловые значения "
+                        f"(например, {example!r}); исправьте данные или загрузите файл без потокового режима"
+                    )
+                if lost and coerced is not None:
+                    coerced[col] = coerced.get(col, 0) + lost
+                values = converted
+            matrix[:, j] = values.to_numpy(dtype=np.float32, na_value=np.nan)
+        return matrix
+
+    def report_coerced(self, coerced):
+        self.last_coerced = dict(coerced)
+        if coerced:
+            details = ", ".join(f"{col}: {count}" for col, count in coerced.items())
+            print(f"Предупреждение: нечисловые значения заменены пропусками ({details})")
+
+    @traced('StreamingCSVLoader.load')
+    def load(self, file_path):
+        encoding, delimiter = detect_csv_format(file_path)
+        header = self.read_head(file_path, encoding, delimiter)
+        id_columns, numeric_columns = self.detect_columns(header)
+        strict = self.strict_columns(header, numeric_columns)
+        usecols = set(id_columns + numeric_columns)
+        column_order = [col for col in header.columns if col in usecols]
+        del header
+
+        matrix_path = self.temp_path('.f32')
+        id_parts = {col: [] for col in id_columns}
+        coerced = {}
+        n_rows = 0
+        with open(matrix_path, 'wb') as out:
+            reader = self.iter_chunks(file_path, encoding, delimiter, usecols=lambda col: col in usecols)
+            for chunk in reader:
+                out.write(self.to_float32(chunk, numeric_columns, strict, coerced).tobytes())
+                for col in id_columns:
+                    id_parts[col].append(chunk[col].to_numpy())
+                n_rows += len(chunk)
+        self.report_coerced(coerced)
+
+        if n_rows == 0:
+            matrix = np.empty((0, len(numeric_columns)), dtype=np.float32)
+        else:
+            matrix = np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(n_rows, len(numeric_columns)))
+        data = pd.DataFrame(matrix, columns=numeric_columns, copy=False)
+        # Идентификаторные столбцы вставляются на исходные позиции
+        for col in id_columns:
+            values = np.concatenate(id_parts.pop(col)) if n_rows else np.array([], dtype=object)
+            data.insert(column_order.index(col), col, values)
+        print(f"Потоковая загрузка: {n_rows} строк, {len(numeric_columns)} числовых столбцов (float32, memmap)")
+        return data
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clustering import Clustering  # noqa: E402
+from data_processing import DataProcessor  # noqa: E402
+
+CENTERS = np.array([[0.0, 0.0, 0.0], [10.0, 10.0, 0.0], [0.0, 10.0, 10.0]])
+
+
+def make_customers(n_rows, seed=0, first_id=0):
+    """
+    Клиенты из трёх хорошо разделённых групп с идентификатором ID.
+    """
+    rng = np.random.default_rng(seed)
+    group = rng.integers(0, len(CENTERS), n_rows)
+    values = CENTERS[group] + rng.normal(scale=0.5, size=(n_rows, CENTERS.shape[1]))
+    data = pd.DataFrame(values, columns=['Доход', 'Покупки', 'Визиты'])
+    data.insert(0, 'ID', np.arange(first_id, first_id + n_rows))
+    return data
+
+
+@pytest.fixture
+def customers():
+    return make_customers(600)
+
+
+@pytest.fixture
+def fitted(customers):
+    """
+    Результат полной кластеризации: (обработчик, кластеризация, масштабированные данные, маска строк, метки).
+    """
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    scaled_data, _, row_mask = processor.preprocess_data(customers, nan_policy='median', outlier_policy='cap')
+    clustering = Clustering()
+    labels = clustering.kmeans_clustering(scaled_data, len(CENTERS))
+    return processor, clustering, scaled_data, row_mask, labels
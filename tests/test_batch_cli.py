@@ -0,0 +1,89 @@
+import csv
+import os
+
+import pandas as pd
+import pytest
+
+import batch_cli
+from conftest import make_customers
+from model_bundle import ClusterModel
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    folder = tmp_path / 'exports'
+    folder.mkdir()
+    for i, n_rows in enumerate([300, 500]):
+        make_customers(n_rows, seed=i).to_csv(folder / f'week{i}.csv', index=False)
+    (folder / 'notes.txt').write_text('не данные')
+    return folder
+
+
+def read_report(path):
+    with open(path, encoding='utf-8') as f:
+        return {os.path.basename(row['file']): row for row in csv.DictReader(f)}
+
+
+def run(args, output_dir):
+    return batch_cli.main([*map(str, args), '--output-dir', str(output_dir), '--no-cache', '--workers', '1'])
+
+
+def test_find_input_files_expands_folders(inputs):
+    files = batch_cli.find_input_files([str(inputs), str(inputs / 'week0.csv')])
+    assert [os.path.basename(path) for path in files] == ['week0.csv', 'week1.csv']
+
+
+def test_batch_writes_labels_models_and_report(inputs, tmp_path):
+    output_dir = tmp_path / 'results'
+    assert run([inputs, '--clusters', '3', '--silhouette', '--save-model'], output_dir) == 0
+    report = read_report(output_dir / 'batch_report.csv')
+    assert set(report) == {'week0.csv', 'week1.csv'}
+    for name, n_rows in [('week0', 300), ('week1', 500)]:
+        row = report[f'{name}.csv']
+        assert row['status'] == 'ok' and row['clusters'] == '3' and int(row['rows']) == n_rows
+        assert float(row['silhouette']) > 0.8 and float(row['cluster_seconds']) >= 0
+        labels = pd.read_csv(output_dir / f'{name}_clusters.csv')
+        assert len(labels) == n_rows and labels['Cluster'].nunique() == 3
+        model = ClusterModel.load(output_dir / f'{name}_model.npz')
+        assert (model.predict(labels.drop(columns='Cluster')) >= 0).all()
+        assert (output_dir / f'{name}.log').exists()
+
+
+def test_failed_file_is_reported_and_others_finish(inputs, tmp_path):
+    (inputs / 'broken.csv').write_text('ID;Имя\n1;a\n')
+    output_dir = tmp_path / 'results'
+    assert run([inputs, '--clusters', '3'], output_dir) == 1
+    report = read_report(output_dir / 'batch_report.csv')
+    assert report['broken.csv']['status'] == 'error' and report['broken.csv']['error']
+    assert report['week0.csv']['status'] == report['week1.csv']['status'] == 'ok'
+
+
+def test_process_pool_matches_single_process(inputs, tmp_path):
+    single, pooled = tmp_path / 'single', tmp_path / 'pooled'
+    run([inputs, '--clusters', '3'], single)
+    batch_cli.main([str(inputs), '--clusters', '3', '--output-dir', str(pooled), '--no-cache', '--workers', '2'])
+    for name in ['week0', 'week1']:
+        pd.testing.assert_frame_equal(pd.read_csv(single / f'{name}_clusters.csv'),
+                                      pd.read_csv(pooled / f'{name}_clusters.csv'))
+
+
+@pytest.mark.parametrize('method', ['coreset', 'minibatch', 'dbscan', 'som', 'ensemble', 'streaming'])
+def test_every_method_labels_all_rows(inputs, tmp_path, method):
+    output_dir = tmp_path / method
+    assert run([inputs / 'week1.csv', '--method', method, '--clusters', '3', '--eps', '0.5', '--som-size', '3'],
+               output_dir) == 0
+    assert len(pd.read_csv(output_dir / 'week1_clusters.csv')) == 500
+
+
+def test_skip_existing_and_duplicate_names(inputs, tmp_path, capsys):
+    output_dir = tmp_path / 'results'
+    run([inputs / 'week0.csv'], output_dir)
+    run([inputs, '--skip-existing'], output_dir)
+    assert 'Пропущено файлов с актуальными метками: 1' in capsys.readouterr().out
+    assert set(read_report(output_dir / 'batch_report.csv')) == {'week1.csv'}
+
+    other = tmp_path / 'other'
+    other.mkdir()
+    make_customers(50).to_csv(other / 'week0.csv', index=False)
+    with pytest.raises(SystemExit):
+        run([inputs / 'week0.csv', other / 'week0.csv'], output_dir)
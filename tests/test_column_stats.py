@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from column_stats import ColumnStats
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(0)
+    values = rng.normal(loc=[1.0, -5.0, 100.0], scale=[1.0, 3.0, 20.0], size=(5000, 3))
+    values[::50, 1] = np.nan
+    return values
+
+
+def test_merge_matches_single_pass(matrix):
+    merged = ColumnStats.from_matrix(matrix[:1234])
+    merged.merge(ColumnStats.from_matrix(matrix[1234:]))
+    whole = ColumnStats.from_matrix(matrix)
+
+    assert merged.rows == whole.rows == len(matrix)
+    assert np.array_equal(merged.count, whole.count)
+    assert np.allclose(merged.mean, np.nanmean(matrix, axis=0))
+    assert np.allclose(merged.var(), np.nanvar(matrix, axis=0))
+    assert np.allclose(merged.min, np.nanmin(matrix, axis=0))
+    assert np.allclose(merged.max, np.nanmax(matrix, axis=0))
+
+
+def test_merge_with_empty_part(matrix):
+    stats = ColumnStats.from_matrix(matrix)
+    stats.merge(ColumnStats.from_matrix(matrix[:0]))
+    assert np.allclose(stats.mean, np.nanmean(matrix, axis=0))
+    assert stats.rows == len(matrix)
+
+
+def test_merged_reservoir_gives_quantiles(matrix):
+    stats = ColumnStats.from_matrix(matrix[:2500], reservoir_size=1000)
+    stats.merge(ColumnStats.from_matrix(matrix[2500:], reservoir_size=1000))
+    median = stats.quantiles(0.5)
+    assert np.allclose(median, np.nanmedian(matrix, axis=0), atol=0.15 * np.nanstd(matrix, axis=0))
+
+
+def test_zscore_mask_matches_scipy(matrix):
+    from scipy import stats as scipy_stats
+
+    values = np.nan_to_num(matrix)
+    values[:5, 2] = 1000.0
+    expected = (np.abs(scipy_stats.zscore(values)) > 3).any(axis=1)
+    assert np.array_equal(ColumnStats.from_matrix(values).outlier_mask(values), expected)
+
+
+@pytest.mark.parametrize('method, threshold', [('iqr', 1.5), ('mad', 3.5)])
+def test_quantile_rules_match_full_data(matrix, method, threshold):
+    values = np.nan_to_num(matrix)
+    # Выборка больше числа строк — квантили точные
+    lower, upper = ColumnStats.from_matrix(values, reservoir_size=len(values)).limits(method, threshold)
+    if method == 'iqr':
+        q1, q3 = np.quantile(values, [0.25, 0.75], axis=0)
+        expected = q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+    else:
+        median = np.median(values, axis=0)
+        spread = threshold * 1.4826 * np.median(np.abs(values - median), axis=0)
+        expected = median - spread, median + spread
+    assert np.allclose(lower, expected[0]) and np.allclose(upper, expected[1])
+
+
+def test_zero_spread_column_is_not_limited():
+    values = np.zeros((100, 2))
+    values[:, 1] = np.arange(100)
+    values[:3, 0] = 1.0  # Двоичный признак: IQR и MAD равны нулю
+    stats = ColumnStats.from_matrix(values, reservoir_size=100)
+    for method in ('iqr', 'mad'):
+        lower, upper = stats.limits(method)
+        assert lower[0] == -np.inf and upper[0] == np.inf
+        assert not stats.outlier_mask(values, method).any()
+
+
+def test_quantiles_need_reservoir(matrix):
+    with pytest.raises(ValueError):
+        ColumnStats.from_matrix(matrix).limits('iqr')
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+from clustering import Clustering
+from coreset import Coreset, approximation_report, assign_to_centers
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    return rng.normal(loc=[1.0, -5.0, 100.0], scale=[1.0, 3.0, 20.0], size=(5000, 3))
+
+
+@pytest.mark.parametrize('method', ['lightweight', 'uniform', 'stratified'])
+def test_coreset_weights_represent_all_rows(data, method):
+    strata = (data[:, 0] > 1.0).astype(int)
+    coreset = Coreset.build(data, 500, method, strata=strata)
+
+    assert len(coreset.points) == len(coreset.weights) == len(coreset.indices)
+    assert np.array_equal(coreset.points, data[coreset.indices])
+    assert np.all(coreset.weights > 0)
+    # Взвешенная сумма оценивает число строк и среднее по всем данным
+    assert coreset.weights.sum() == pytest.approx(len(data), rel=0.1)
+    mean = np.average(coreset.points, axis=0, weights=coreset.weights)
+    assert np.allclose(mean, data.mean(axis=0), atol=0.2 * data.std(axis=0))
+
+
+def test_coreset_larger_than_data_is_full(data):
+    coreset = Coreset.build(data[:100], 500)
+    assert coreset.method == 'full'
+    assert np.all(coreset.weights == 1)
+
+
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(7)
+    centers = rng.uniform(-10, 10, size=(6, 4))
+    return centers[rng.integers(0, 6, 20000)] + rng.normal(size=(20000, 4))
+
+
+def test_assign_to_centers_in_chunks(blobs):
+    centers = blobs[:5]
+    labels, inertia = assign_to_centers(blobs, centers, chunk_size=777)
+    distances = ((blobs[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    np.testing.assert_array_equal(labels, distances.argmin(axis=1))
+    assert inertia == pytest.approx(distances.min(axis=1).sum())
+
+
+@pytest.mark.parametrize('method', ['lightweight', 'uniform'])
+def test_coreset_kmeans_is_close_to_full_kmeans(blobs, method):
+    full = KMeans(n_clusters=6, random_state=42).fit(blobs)
+    clustering = Clustering()
+    labels = clustering.coreset_kmeans_clustering(blobs, 6, coreset_size=1000, method=method)
+    report = approximation_report(blobs, clustering.last_fit['centers'], full.cluster_centers_)
+    assert report['ari'] >= 0.95
+    assert report['relative_error'] <= 0.05
+    assert adjusted_rand_score(full.labels_, labels) == pytest.approx(report['ari'])
+
+
+def test_approximation_report_of_same_centers(blobs):
+    centers = KMeans(n_clusters=6, random_state=42).fit(blobs).cluster_centers_
+    report = approximation_report(blobs, centers, centers)
+    assert report['ari'] == 1.0 and report['relative_error'] == 0.0
+
+
+def test_coreset_sweep_estimates_full_inertia(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    full = clustering.calculate_elbow_method(scaled_data, k_range=[3], n_jobs=1)
+    K, inertia, scores, _ = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 6), n_jobs=1,
+                                                              coreset_size=200)
+    # Inertia по взвешенному coreset оценивает inertia на всех строках
+    assert inertia[K.index(3)] == pytest.approx(full[1][0], rel=0.3)
+    assert clustering.select_optimal_k(K, scores) == 3
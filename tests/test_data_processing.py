@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from conftest import CENTERS
+from data_processing import DataProcessor
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor(interactive=False, dataset_cache=False)
+
+
+def test_unknown_outlier_rule_is_rejected(processor, customers):
+    with pytest.raises(ValueError):
+        processor.preprocess_data(customers, outlier_rule='percentile')
+
+
+@pytest.mark.parametrize('rule', ['zscore', 'iqr', 'mad'])
+def test_single_outlier_is_removed_by_every_rule(processor, rule):
+    rng = np.random.default_rng(0)
+    import pandas as pd
+    data = pd.DataFrame(rng.normal(size=(500, 3)), columns=['a', 'b', 'c'])
+    data.loc[10, 'b'] = 50.0
+    _, _, row_mask = processor.preprocess_data(data, nan_policy='median', outlier_policy='remove', outlier_rule=rule)
+    assert not row_mask[10]
+    assert processor.last_state.outlier_rule == rule
+
+
+def test_removing_every_row_fails_cleanly(processor, customers):
+    # В каждой из трёх групп один признак далёк от медианы: по MAD выбросами отмечены все строки
+    assert len(CENTERS) == 3
+    result = processor.preprocess_data(customers, nan_policy='median', outlier_policy='remove', outlier_rule='mad')
+    assert result == (None, None, None)
+    assert 'выбросы' in processor.messagebox.errors[0]
+    # Замена пороговыми значениями для тех же данных работает
+    scaled_data, _, row_mask = processor.preprocess_data(
+        customers, nan_policy='median', outlier_policy='cap', outlier_rule='mad')
+    assert row_mask.all() and not np.isnan(scaled_data).any()
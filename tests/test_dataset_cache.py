@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_cache import DatasetCache
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'ID': np.arange(20000),
+        'Доход': rng.normal(size=20000).round(6),
+        'Покупки': rng.integers(0, 100, 20000),
+        'Город': rng.choice(['Москва', 'Казань'], 20000),
+    })
+    path = tmp_path / 'customers.csv'
+    data.to_csv(path, index=False)
+    return str(path), data
+
+
+def edit_in_place(path, offset, replacement):
+    # Правка того же размера с сохранением времени изменения (как после cp -p или rsync)
+    stat = os.stat(path)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        original = f.read(len(replacement))
+        assert original != replacement and len(original) == len(replacement)
+        f.seek(offset)
+        f.write(replacement)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_round_trip_keeps_columns_and_values(tmp_path, csv_file):
+    path, data = csv_file
+    cache = DatasetCache(str(tmp_path / 'cache'))
+    assert cache.load(path) is None
+    cache.store(path, data)
+    loaded = cache.load(path)
+    assert list(loaded.columns) == list(data.columns)
+    pd.testing.assert_frame_equal(loaded, data, check_dtype=False)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_variants_are_cached_separately(tmp_path, csv_file):
+    path, data = csv_file
+    cache = DatasetCache(str(tmp_path / 'cache'))
+    cache.store(path, data, variant='full')
+    assert cache.load(path, variant='streaming') is None
+
+
+def test_same_size_edit_with_preserved_mtime_is_detected(tmp_path, csv_file):
+    path, data = csv_file
+    cache = DatasetCache(str(tmp_path / 'cache'), hash_blocks=4, block_size=1024)
+    key = cache.file_key(path)
+    cache.store(path, data)
+    # Позиция между выборочными блоками: при хэшировании по блокам правка не была бы видна
+    offset = os.path.getsize(path) // 8 + 2048
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        byte = f.read(1)
+    edit_in_place(path, offset, b'7' if byte != b'7' else b'8')
+    assert cache.file_key(path) != key
+    assert cache.load(path) is None
+
+
+def test_sampled_hash_is_opt_in(tmp_path, csv_file):
+    path, _ = csv_file
+    sampled = DatasetCache(str(tmp_path / 'cache'), sampled_hash=True, hash_blocks=4, block_size=1024)
+    key = sampled.file_key(path)
+    edit_in_place(path, os.path.getsize(path) // 8 + 2048, b'#')
+    # Выборочный хэш правку между блоками не замечает — поэтому он не используется по умолчанию
+    assert sampled.file_key(path) == key
+    assert DatasetCache(str(tmp_path / 'cache')).file_key(path) != key
+
+
+def test_eviction_keeps_newest_entry(tmp_path, csv_file):
+    path, data = csv_file
+    cache = DatasetCache(str(tmp_path / 'cache'), max_bytes=1)
+    cache.store(path, data, variant='full')
+    cache.store(path, data, variant='streaming')
+    assert cache.stats()['entries'] == 1 and cache.evictions == 1
+    assert cache.load(path, variant='streaming') is not None
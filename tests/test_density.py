@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+
+from density import NeighborGraphDBSCAN
+
+
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(3)
+    centers = np.array([[0.0, 0.0], [4.0, 0.0], [0.0, 4.0]])
+    data = np.vstack([rng.normal(center, 0.6, size=(300, 2)) for center in centers])
+    # Разреженный фон: шумовые и пограничные точки
+    return np.vstack([data, rng.uniform(-3, 7, size=(100, 2))])
+
+
+def assert_same_clustering(data, labels, core, expected, eps):
+    np.testing.assert_array_equal(core[expected.core_sample_indices_], True)
+    assert core.sum() == len(expected.core_sample_indices_)
+    np.testing.assert_array_equal(labels == -1, expected.labels_ == -1)
+    # Ядровые точки разбиты на те же кластеры с точностью до нумерации
+    assert adjusted_rand_score(labels[core], expected.labels_[core]) == 1.0
+    # Пограничная точка может принадлежать любому из достижимых кластеров
+    mapping = dict(zip(expected.labels_[core], labels[core]))
+    for i in np.flatnonzero(~core & (labels != -1)):
+        near_core = core & (np.linalg.norm(data - data[i], axis=1) <= eps)
+        assert labels[i] in {mapping[label] for label in expected.labels_[near_core]}
+
+
+@pytest.mark.parametrize('eps, min_samples', [(0.3, 5), (0.5, 10), (0.8, 4)])
+def test_matches_sklearn_dbscan(blobs, eps, min_samples):
+    model = NeighborGraphDBSCAN(n_jobs=1)
+    labels = model.fit_predict(blobs, eps, min_samples)
+    expected = DBSCAN(eps=eps, min_samples=min_samples).fit(blobs)
+    assert_same_clustering(blobs, labels, model.core_sample_mask_, expected, eps)
+
+
+def test_graph_is_reused_for_smaller_eps(blobs):
+    model = NeighborGraphDBSCAN(n_jobs=1)
+    model.fit_predict(blobs, 0.8, 5)
+    graph = model.graph
+    labels = model.fit_predict(blobs, 0.4, 5)
+    assert model.graph is graph and model.graph_eps == pytest.approx(1.0)
+    expected = DBSCAN(eps=0.4, min_samples=5).fit(blobs)
+    assert_same_clustering(blobs, labels, model.core_sample_mask_, expected, 0.4)
+    # Больший eps или другие данные требуют нового графа
+    model.fit_predict(blobs, 1.2, 5)
+    assert model.graph is not graph and model.graph_eps == pytest.approx(1.5)
+    graph = model.graph
+    model.fit_predict(blobs.copy(), 0.4, 5)
+    assert model.graph is not graph
+
+
+def test_duplicate_points_count_as_neighbors():
+    data = np.zeros((5, 2))
+    labels = NeighborGraphDBSCAN(n_jobs=1).fit_predict(data, eps=0.1, min_samples=5)
+    np.testing.assert_array_equal(labels, DBSCAN(eps=0.1, min_samples=5).fit_predict(data))
+
+
+def test_suggested_eps_lies_on_the_curve(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    k_distances, eps = clustering.suggest_dbscan_eps(scaled_data, min_samples=5)
+    assert len(k_distances) == len(scaled_data)
+    assert (np.diff(k_distances) >= 0).all() and eps in k_distances
+    labels = clustering.dbscan_clustering(scaled_data, eps=eps, min_samples=5)
+    assert len(np.unique(labels[labels >= 0])) == 3
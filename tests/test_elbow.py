@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from clustering import extend_centers
+
+
+def test_sweep_finds_three_groups(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    K, inertia, scores, timings = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 7), n_jobs=1)
+    assert K == [2, 3, 4, 5, 6]
+    assert all(a >= b for a, b in zip(inertia, inertia[1:]))
+    assert clustering.select_optimal_k(K, scores) == 3
+    assert set(timings[0]) == {'fit', 'score'}
+
+
+def test_parallel_batches_match_sequential(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    sequential = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 6), n_jobs=1)
+    parallel = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 6), n_jobs=2)
+    assert parallel[0] == sequential[0]
+    np.testing.assert_allclose(parallel[1], sequential[1])
+    np.testing.assert_allclose(parallel[2], sequential[2])
+
+
+def test_warm_start_reaches_the_same_optimum(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    cold = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 6), n_jobs=1)
+    warm = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 6), warm_start=True)
+    assert clustering.select_optimal_k(warm[0], warm[2]) == 3
+    # Инициализация из предыдущих центров не должна заметно ухудшать inertia
+    assert warm[1][1] == pytest.approx(cold[1][1], rel=1e-3)
+
+
+def test_extend_centers_keeps_previous_centers(fitted):
+    _, _, scaled_data, _, _ = fitted
+    centers = scaled_data[:2].copy()
+    extended = extend_centers(scaled_data, centers)
+    assert extended.shape == (3, scaled_data.shape[1])
+    np.testing.assert_array_equal(extended[:2], centers)
+    assert any((extended[2] == row).all() for row in scaled_data)
+
+
+@pytest.mark.parametrize('criterion', ['calinski_harabasz', 'davies_bouldin'])
+def test_cheaper_criteria_select_three(fitted, criterion):
+    _, clustering, scaled_data, _, _ = fitted
+    K, _, scores, _ = clustering.calculate_elbow_method(scaled_data, k_range=range(2, 7), criterion=criterion,
+                                                        n_jobs=1)
+    assert clustering.select_optimal_k(K, scores, criterion) == 3
+
+
+def test_unknown_criterion_is_rejected(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    with pytest.raises(ValueError):
+        clustering.calculate_elbow_method(scaled_data, k_range=[2], criterion='gap', n_jobs=1)
+
+
+def test_early_stop_ends_sweep_on_plateau(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    reported = []
+    K, inertia, _, _ = clustering.calculate_elbow_method(
+        scaled_data, k_range=range(2, 11), n_jobs=1, early_stop_tol=0.5, patience=2,
+        progress=lambda done, total, partial: reported.append(partial[0]))
+    # После k=3 inertia почти не уменьшается: k=4 и k=5 дают плато
+    assert K == [2, 3, 4, 5]
+    assert reported == K
+
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+
+from ensemble import EnsembleClustering
+
+
+@pytest.fixture
+def blobs():
+    # Много близких групп: запуски с одним начальным набором центров заметно различаются
+    rng = np.random.default_rng(5)
+    centers = rng.uniform(-6, 6, size=(8, 2))
+    return centers[rng.integers(0, 8, 3000)] + rng.normal(scale=0.8, size=(3000, 2))
+
+
+def test_best_run_has_lowest_inertia(blobs):
+    ensemble = EnsembleClustering(8, n_runs=6, n_jobs=1).fit(blobs)
+    inertia = [run['inertia'] for run in ensemble.runs]
+    assert ensemble.best['inertia'] == min(inertia)
+    assert [run['seed'] for run in ensemble.runs] == list(range(42, 48))
+    # Каждый запуск совпадает с одиночным KMeans с тем же seed
+    single = KMeans(n_clusters=8, n_init=1, random_state=ensemble.best['seed']).fit(blobs)
+    assert ensemble.best['inertia'] == pytest.approx(single.inertia_)
+
+
+@pytest.mark.parametrize('selection, pick', [('silhouette', np.nanargmax), ('calinski_harabasz', np.nanargmax),
+                                             ('davies_bouldin', np.nanargmin)])
+def test_best_run_follows_selection(blobs, selection, pick):
+    ensemble = EnsembleClustering(8, n_runs=4, selection=selection, sample_size=1000, n_jobs=1).fit(blobs)
+    scores = [run['score'] for run in ensemble.runs]
+    assert ensemble.best_index == pick(scores)
+    assert all(len(run['sample_labels']) == 1000 for run in ensemble.runs)
+
+
+def test_parallel_runs_are_deterministic(blobs):
+    serial = EnsembleClustering(8, n_runs=4, algorithms=('kmeans', 'minibatch'), n_jobs=1).fit(blobs)
+    parallel = EnsembleClustering(8, n_runs=4, algorithms=('kmeans', 'minibatch'), n_jobs=2).fit(blobs)
+    assert [(run['algorithm'], run['seed']) for run in parallel.runs] == \
+           [(run['algorithm'], run['seed']) for run in serial.runs]
+    np.testing.assert_allclose([run['inertia'] for run in parallel.runs], [run['inertia'] for run in serial.runs])
+    assert parallel.best_index == serial.best_index
+    np.testing.assert_allclose(parallel.best['centers'], serial.best['centers'])
+
+
+def test_report_and_progress(blobs):
+    reported = []
+    ensemble = EnsembleClustering(8, n_runs=3, n_jobs=1).fit(
+        blobs, progress=lambda done, total, partial: reported.append((done, total, partial[1])))
+    assert reported == [(1, 3, 42), (2, 3, 43), (3, 3, 44)]
+    report = ensemble.report()
+    assert report['best']['seed'] == ensemble.best['seed']
+    assert report['inertia']['min'] == ensemble.best['inertia']
+    assert report['ari_to_best']['max'] == 1.0
+    assert 0.0 <= report['mean_pairwise_ari'] <= 1.0
+    assert len(report['runs']) == 3 and 'centers' not in report['runs'][0]
+
+
+def test_invalid_options_are_rejected():
+    with pytest.raises(ValueError):
+        EnsembleClustering(3, algorithms=('kmeans', 'spectral'))
+    with pytest.raises(ValueError):
+        EnsembleClustering(3, selection='gap')
+
+
+def test_ensemble_clustering_labels_by_best_centers(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    clusters = clustering.ensemble_clustering(scaled_data, 3, n_runs=3, n_jobs=1)
+    centers = clustering.last_fit['centers']
+    distances = ((scaled_data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    np.testing.assert_array_equal(clusters, distances.argmin(axis=1))
+    assert clustering.last_ensemble['mean_pairwise_ari'] == pytest.approx(1.0)
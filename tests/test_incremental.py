@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_customers
+from incremental import IncrementalClustering, row_keys
+
+
+@pytest.fixture
+def incremental(customers, fitted):
+    processor, clustering, scaled_data, row_mask, labels = fitted
+    return IncrementalClustering.start(
+        customers, scaled_data, row_mask, processor.last_state, labels, clustering.last_fit['centers'], id_column='ID',
+    )
+
+
+def appended(customers, n_rows, seed=1):
+    return pd.concat([customers, make_customers(n_rows, seed=seed, first_id=len(customers))], ignore_index=True)
+
+
+def test_is_new_without_stored_keys(customers, incremental):
+    incremental.keys = np.empty(0, dtype=np.uint64)
+    new = incremental.new_rows(customers)
+    assert new.dtype == bool
+    assert new.all() and len(new) == len(customers)
+
+
+def test_is_new_finds_only_appended_rows(customers, incremental):
+    data = appended(customers, 40)
+    new = incremental.new_rows(data)
+    assert new.dtype == bool
+    assert np.array_equal(np.flatnonzero(new), np.arange(len(customers), len(data)))
+
+
+def test_update_without_new_rows_keeps_labels(customers, fitted, incremental):
+    labels, valid, report = incremental.update(customers)
+    assert report['new_rows'] == 0 and not report['refined']
+    assert valid.all()
+    assert np.array_equal(labels, fitted[4])
+
+
+def test_update_keeps_cluster_numbers(customers, fitted, incremental):
+    data = appended(customers, 200)
+    for refine in (False, True):
+        labels, valid, report = incremental.update(data, refine=refine)
+        assert report['refined'] == refine
+        assert np.array_equal(labels[:len(customers)], fitted[4])
+    # Второй вызов с теми же строками уже не находит новых
+    assert report['new_rows'] == 0
+    assert incremental.counts.sum() == len(data)
+    assert len(incremental.keys) == len(data)
+
+
+def test_update_merges_statistics(customers, incremental):
+    data = appended(customers, 300)
+    incremental.update(data)
+    assert incremental.stats.count[0] == len(data)
+    values = data[incremental.state.columns].to_numpy(dtype=np.float64)
+    assert np.allclose(incremental.state.mean, values.mean(axis=0))
+    assert np.allclose(incremental.state.scale, values.std(axis=0))
+
+
+def test_drift_triggers_refinement(customers, incremental):
+    shifted = make_customers(300, seed=2, first_id=len(customers))
+    shifted[['Доход', 'Покупки', 'Визиты']] += 4.0
+    data = pd.concat([customers, shifted], ignore_index=True)
+    _, _, report = incremental.update(data, drift_tolerance=0.1)
+    assert report['drift'] > 0.1
+    assert report['refined']
+
+
+def test_save_load_round_trip(tmp_path, customers, incremental):
+    path = tmp_path / 'incremental.npz'
+    incremental.save(path)
+    loaded = IncrementalClustering.load(path)
+
+    assert loaded.id_column == 'ID' and loaded.method == 'kmeans'
+    assert loaded.inertia == pytest.approx(incremental.inertia)
+    assert np.array_equal(loaded.keys, incremental.keys)
+    assert np.array_equal(loaded.counts, incremental.counts)
+    assert np.allclose(loaded.centers, incremental.centers)
+    assert np.allclose(loaded.stats.m2, incremental.stats.m2)
+    assert loaded.stats.rows == incremental.stats.rows
+    assert loaded.state.columns == incremental.state.columns
+    assert loaded.state.outlier_rule == incremental.state.outlier_rule
+
+    # Обновление загруженного состояния даёт тот же результат, что и исходного
+    data = appended(customers, 100)
+    expected, _, _ = incremental.update(data, refine=False)
+    labels, _, _ = loaded.update(data, refine=False)
+    assert np.array_equal(labels, expected)
+    assert np.allclose(loaded.centers, incremental.centers)
+
+
+def test_load_rejects_unknown_version(tmp_path, incremental):
+    path = tmp_path / 'incremental.npz'
+    incremental.save(path)
+    with np.load(path) as bundle:
+        arrays = {name: bundle[name] for name in bundle.files}
+    arrays['meta'] = np.array(str(arrays['meta']).replace('"format_version": 1', '"format_version": 99'))
+    np.savez(path, **arrays)
+    with pytest.raises(ValueError):
+        IncrementalClustering.load(path)
+
+
+def test_to_model_predicts_current_labels(customers, incremental):
+    data = appended(customers, 100)
+    labels, _, _ = incremental.update(data, refine=True)
+    assert np.array_equal(incremental.to_model().predict(data), labels)
+
+
+def test_row_keys_without_id_column(customers):
+    keys = row_keys(customers[['Доход', 'Покупки']])
+    assert keys.dtype == np.uint64 and len(np.unique(keys)) == len(customers)
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pytest
+
+import instrumentation
+from instrumentation import TRACER, Tracer, traced
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span('stage', rows=10) as args:
+        args['extra'] = 1
+    assert tracer.events == []
+
+
+def test_nested_spans_record_depth_rows_and_args():
+    tracer = Tracer(enabled=True)
+    with tracer.span('outer', rows=5, method='kmeans'):
+        with tracer.span('inner') as args:
+            args['rows'] = 7
+    inner, outer = tracer.events
+    assert (inner['name'], inner['depth'], inner['rows']) == ('inner', 1, 7)
+    assert (outer['name'], outer['depth'], outer['rows']) == ('outer', 0, 5)
+    assert outer['args'] == {'method': 'kmeans'}
+    assert outer['wall'] >= inner['wall'] >= 0
+    assert outer['rss_peak'] >= max(outer['rss_start'], outer['rss_end'])
+
+
+def test_span_is_recorded_when_stage_fails():
+    tracer = Tracer(enabled=True)
+    with pytest.raises(ValueError):
+        with tracer.span('failing'):
+            raise ValueError()
+    assert [event['name'] for event in tracer.events] == ['failing']
+    with tracer.span('next'):
+        pass
+    assert tracer.events[-1]['depth'] == 0
+
+
+def test_events_are_bounded_and_summarized():
+    tracer = Tracer(enabled=True, max_events=3)
+    for rows in range(5):
+        with tracer.span('repeat', rows=rows):
+            pass
+    assert len(tracer.events) == 3
+    (stage,) = tracer.summary()
+    assert stage['calls'] == 3 and stage['rows'] == 4
+    assert stage['wall'] == pytest.approx(sum(event['wall'] for event in tracer.events))
+    tracer.clear()
+    assert tracer.events == [] and tracer.summary() == []
+
+
+def test_chrome_trace_export(tmp_path):
+    tracer = Tracer(enabled=True)
+    with tracer.span('load', rows=3, path='data.csv'):
+        pass
+    path = tmp_path / 'trace.json'
+    tracer.export_chrome_trace(str(path))
+    trace = json.loads(path.read_text(encoding='utf-8'))
+    kinds = [event['ph'] for event in trace['traceEvents']]
+    assert kinds == ['X', 'C', 'M']
+    stage = trace['traceEvents'][0]
+    assert stage['name'] == 'load' and stage['dur'] >= 0
+    assert stage['args']['rows'] == 3 and stage['args']['path'] == 'data.csv'
+    assert {'cpu_ms', 'rss_mb', 'peak_delta_mb'} <= set(stage['args'])
+
+
+def test_traced_decorator_infers_rows(monkeypatch):
+    tracer = Tracer(enabled=True)
+    monkeypatch.setattr(instrumentation, 'TRACER', tracer)
+
+    @traced('make')
+    def make(n):
+        return np.zeros((n, 2)), 'columns'
+
+    @traced()
+    def total(matrix):
+        return matrix.sum()
+
+    matrix, _ = make(4)
+    total(np.ones((6, 2)))
+    assert [(event['name'], event['rows']) for event in tracer.events] == [
+        ('make', 4), ('test_traced_decorator_infers_rows.<locals>.total', 6)]
+    tracer.enabled = False
+    make(2)
+    assert len(tracer.events) == 2
+
+
+def test_application_stages_are_traced(monkeypatch, fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    monkeypatch.setattr(TRACER, 'enabled', True)
+    monkeypatch.setattr(TRACER, 'events', [])
+    clustering.dbscan_clustering(scaled_data, eps=0.5)
+    (event,) = [event for event in TRACER.events if event['name'] == 'Clustering.dbscan_clustering']
+    assert event['rows'] == len(scaled_data)
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from job_scheduler import JobScheduler
+
+
+class FakeRoot:
+    """
+    Замена окна Tk: отложенные вызовы выполняются в потоке теста методом run_until.
+    """
+
+    def __init__(self):
+        self.callbacks = {}
+        self._next_id = 0
+
+    def after(self, delay, callback):
+        self._next_id += 1
+        self.callbacks[self._next_id] = callback
+        return self._next_id
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def run_until(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "задача не завершилась вовремя"
+            for callback_id in list(self.callbacks):
+                self.callbacks.pop(callback_id)()
+            time.sleep(0.005)
+
+
+@pytest.fixture
+def root():
+    return FakeRoot()
+
+
+def record(events, name):
+    return lambda *args: events.append((name, args, threading.current_thread().name))
+
+
+def test_result_and_progress_arrive_on_polling_thread(root):
+    scheduler = JobScheduler(root, poll_interval=1)
+    events = []
+
+    def job(context, n):
+        for i in range(n):
+            context.report(i + 1, n, 'шаг')
+        return n * 10
+
+    scheduler.submit(job, 3, on_progress=record(events, 'progress'), on_done=record(events, 'done'))
+    assert scheduler.is_busy
+    root.run_until(lambda: not scheduler.is_busy)
+    assert [event[:2] for event in events] == [
+        ('progress', (1, 3, 'шаг')), ('progress', (2, 3, 'шаг')), ('progress', (3, 3, 'шаг')), ('done', (30,)),
+    ]
+    assert {event[2] for event in events} == {threading.current_thread().name}
+    # Опрос останавливается, когда задач нет
+    root.run_until(lambda: not root.callbacks)
+
+
+def test_second_job_is_rejected_while_busy(root):
+    scheduler = JobScheduler(root, poll_interval=1)
+    release = threading.Event()
+    scheduler.submit(lambda context: release.wait(5))
+    assert scheduler.submit(lambda context: None) is None
+    release.set()
+    root.run_until(lambda: not scheduler.is_busy)
+    assert scheduler.submit(lambda context: None) is not None
+
+
+def test_queued_jobs_run_in_order(root):
+    scheduler = JobScheduler(root, poll_interval=1, queue_jobs=True)
+    release = threading.Event()
+    events = []
+    scheduler.submit(lambda context: release.wait(5) and 'первая', on_done=record(events, 'done'))
+    second = scheduler.submit(lambda context: 'вторая', on_done=record(events, 'done'))
+    assert second is not None
+    release.set()
+    root.run_until(lambda: len(events) == 2 and not scheduler.is_busy)
+    assert [event[1] for event in events] == [('первая',), ('вторая',)]
+
+
+def test_cancel_stops_running_job_and_drops_queue(root):
+    scheduler = JobScheduler(root, poll_interval=1, queue_jobs=True)
+    started = threading.Event()
+    events = []
+
+    def endless(context):
+        started.set()
+        while True:
+            context.report(0, 1)
+            time.sleep(0.001)
+
+    scheduler.submit(endless, on_done=record(events, 'done'), on_cancel=record(events, 'cancel running'))
+    scheduler.submit(lambda context: 'не должна выполниться', on_done=record(events, 'done'),
+                     on_cancel=record(events, 'cancel queued'))
+    started.wait(5)
+    scheduler.cancel()
+    root.run_until(lambda: not scheduler.is_busy)
+    assert [event[0] for event in events] == ['cancel queued', 'cancel running']
+
+
+def test_result_of_job_cancelled_after_finishing_is_dropped(root):
+    scheduler = JobScheduler(root, poll_interval=1)
+    finished = threading.Event()
+    events = []
+    scheduler.submit(lambda context: finished.set() or 'результат', on_done=record(events, 'done'),
+                     on_cancel=record(events, 'cancel'))
+    finished.wait(5)
+    scheduler.cancel()
+    root.run_until(lambda: not scheduler.is_busy)
+    assert [event[0] for event in events] == ['cancel']
+
+
+def test_error_is_passed_to_on_error(root):
+    scheduler = JobScheduler(root, poll_interval=1)
+    events = []
+
+    def failing(context):
+        raise ValueError('сбой')
+
+    scheduler.submit(failing, on_done=record(events, 'done'), on_error=record(events, 'error'))
+    root.run_until(lambda: not scheduler.is_busy)
+    ((name, (error,), _),) = events
+    assert name == 'error' and isinstance(error, ValueError) and str(error) == 'сбой'
+
+
+def test_shutdown_cancels_polling(root):
+    scheduler = JobScheduler(root, poll_interval=1)
+    release = threading.Event()
+    scheduler.submit(lambda context: release.wait(5))
+    scheduler.shutdown()
+    release.set()
+    assert not root.callbacks
@@ -0,0 +1,86 @@
+import sys
+import threading
+
+import pytest
+
+from lazy_import import IMPORT_TIMES, LazyComponent, LazyModule, load_module, warm_up
+
+PROBE = '''
+import time
+time.sleep({delay})
+CREATED = []
+
+
+class Component:
+    def __init__(self, *args, **kwargs):
+        time.sleep({delay})
+        CREATED.append((args, kwargs))
+
+READY = True
+'''
+
+
+@pytest.fixture
+def probe(tmp_path, monkeypatch, request):
+    # Отдельный модуль для каждого теста: его ещё нет в sys.modules
+    name = f"lazy_probe_{request.node.name.replace('[', '_').replace(']', '_')}"
+    (tmp_path / f'{name}.py').write_text(PROBE.format(delay=0.05))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    sys.modules.pop(name, None)
+    IMPORT_TIMES.pop(name, None)
+
+
+def test_lazy_module_imports_on_first_attribute(probe):
+    module = LazyModule(probe)
+    assert probe not in sys.modules and 'не загружен' in repr(module)
+    assert module.READY
+    assert probe in sys.modules and 'загружен)' in repr(module)
+    assert IMPORT_TIMES[probe] >= 0.05
+
+
+def test_import_time_is_recorded_once(probe):
+    load_module(probe)
+    first = IMPORT_TIMES[probe]
+    load_module(probe)
+    assert IMPORT_TIMES[probe] == first
+
+
+def test_load_waits_for_import_in_progress(probe):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(load_module(probe).READY)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Ни один поток не получил частично инициализированный модуль
+    assert results == [True] * 4
+
+
+def test_lazy_component_is_created_once(probe):
+    class Owner:
+        component = LazyComponent(probe, 'Component', 1, key='value')
+
+    owner = Owner()
+    assert isinstance(Owner.component, LazyComponent)
+    assert not Owner.component.is_loaded(owner)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(owner.component)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    created = sys.modules[probe].CREATED
+    assert created == [((1,), {'key': 'value'})]
+    assert all(component is seen[0] for component in seen)
+    assert Owner.component.is_loaded(owner)
+    # У другого объекта — свой экземпляр
+    assert Owner().component is not seen[0]
+
+
+def test_warm_up_reports_failures_and_continues(probe, capsys):
+    thread = warm_up(['lazy_probe_missing_module', probe])
+    thread.join()
+    assert probe in sys.modules and probe in IMPORT_TIMES
+    assert 'lazy_probe_missing_module' in capsys.readouterr().out
+    assert thread.name == 'warm-up'
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import pytest
+
+from data_processing import DataProcessor
+from memory import MemoryTracker, PeakSampler, compact_labels
+
+
+@pytest.mark.parametrize('labels, dtype', [
+    ([0, 1, 2], np.int8), ([-1, 0, 127], np.int8), ([0, 128], np.int16),
+    ([-1, 40000], np.int32), ([0, 2 ** 40], np.int64), ([], np.int8),
+])
+def test_compact_labels_picks_smallest_type(labels, dtype):
+    compact = compact_labels(np.array(labels, dtype=np.int64))
+    assert compact.dtype == dtype
+    np.testing.assert_array_equal(compact, labels)
+
+
+def test_low_memory_preprocessing_is_float32(customers):
+    regular = DataProcessor(interactive=False, dataset_cache=False)
+    compact = DataProcessor(interactive=False, dataset_cache=False, low_memory=True)
+    expected, columns, mask = regular.preprocess_data(customers, nan_policy='median', outlier_policy='cap')
+    scaled, compact_columns, compact_mask = compact.preprocess_data(
+        customers, nan_policy='median', outlier_policy='cap')
+    assert expected.dtype == np.float64 and scaled.dtype == np.float32
+    assert list(compact_columns) == list(columns)
+    np.testing.assert_array_equal(compact_mask, mask)
+    np.testing.assert_allclose(scaled, expected, atol=1e-5)
+
+
+def test_low_memory_streams_csv(tmp_path, customers):
+    path = tmp_path / 'customers.csv'
+    customers.to_csv(path, index=False)
+    processor = DataProcessor(interactive=False, dataset_cache=False, low_memory=True)
+    data = processor.load_data(str(path))
+    assert len(data) == len(customers)
+    assert data['Доход'].dtype == np.float32
+    np.testing.assert_allclose(data['Доход'], customers['Доход'], rtol=1e-6)
+
+
+def test_peak_sampler_sees_temporary_allocation():
+    with PeakSampler(interval=0.001) as sampler:
+        block = np.ones(64 * 1024 ** 2 // 8)
+        block.sum()
+        time.sleep(0.05)
+        del block
+    if sampler.start == 0:
+        pytest.skip("RSS недоступен на этой платформе")
+    assert sampler.peak - sampler.start >= 32 * 1024 ** 2
+    assert sampler.peak >= sampler.end
+
+
+def test_tracker_keeps_last_stages():
+    tracker = MemoryTracker(max_stages=3)
+    for i in range(5):
+        with tracker.stage(f'stage{i}'):
+            pass
+    assert [record['stage'] for record in tracker.stages] == ['stage2', 'stage3', 'stage4']
+    assert tracker.report().count('\n') == 2
+    with pytest.raises(RuntimeError):
+        with tracker.stage('failed'):
+            raise RuntimeError()
+    # Этап, завершившийся ошибкой, тоже записывается
+    assert tracker.stages[-1]['stage'] == 'failed'
+    tracker.clear()
+    assert tracker.stages == []
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from conftest import make_customers
+from model_bundle import ClusterModel
+
+
+def round_trip(model, tmp_path):
+    path = tmp_path / 'model.npz'
+    model.save(path)
+    return ClusterModel.load(path)
+
+
+def test_kmeans_round_trip(tmp_path, customers, fitted):
+    processor, clustering, _, row_mask, labels = fitted
+    model = clustering.export_model(processor.last_state, source='customers.csv')
+    loaded = round_trip(model, tmp_path)
+
+    assert loaded.kind == 'kmeans' and loaded.n_clusters == 3
+    assert loaded.meta['source'] == 'customers.csv'
+    assert loaded.columns == model.columns
+    assert np.allclose(loaded.centers, model.centers)
+    assert np.array_equal(loaded.predict(customers)[row_mask], labels)
+
+    other = make_customers(200, seed=5)
+    assert np.array_equal(loaded.predict(other), model.predict(other))
+
+
+def test_round_trip_with_reduction(tmp_path, customers, fitted):
+    processor, clustering, scaled_data, row_mask, _ = fitted
+    reduced = clustering.reduce_dimensions(scaled_data, 'pca', n_components=2)
+    labels = clustering.kmeans_clustering(reduced, 3)
+    model = clustering.export_model(processor.last_state, reduction=clustering.reduction)
+    loaded = round_trip(model, tmp_path)
+
+    assert loaded.reduction is not None
+    assert np.allclose(loaded.reduction.components, model.reduction.components)
+    assert np.array_equal(loaded.predict(customers)[row_mask], labels)
+
+
+def test_dbscan_round_trip(tmp_path, customers, fitted):
+    processor, clustering, scaled_data, row_mask, _ = fitted
+    labels = clustering.dbscan_clustering(scaled_data, eps=0.5, min_samples=5)
+    loaded = round_trip(clustering.export_model(processor.last_state), tmp_path)
+
+    assert loaded.kind == 'dbscan' and loaded.eps == 0.5
+    predicted, distances = loaded.predict(customers, return_distance=True)
+    # Ядровые точки совпадают с сохранёнными, поэтому их метки воспроизводятся точно
+    core = clustering.last_fit['core_mask']
+    assert np.array_equal(predicted[row_mask][core], labels[core])
+    assert np.all(distances[row_mask][core] == 0)
+
+
+def test_predict_marks_unscorable_rows(tmp_path, customers):
+    from data_processing import DataProcessor
+    from clustering import Clustering
+
+    customers.loc[:4, 'Доход'] = np.nan
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    scaled_data, _, row_mask = processor.preprocess_data(customers, nan_policy='drop', outlier_policy='cap')
+    clustering = Clustering()
+    clustering.kmeans_clustering(scaled_data, 3)
+    loaded = round_trip(clustering.export_model(processor.last_state), tmp_path)
+
+    labels = loaded.predict(customers)
+    assert np.all(labels[:5] == -1)
+    assert np.all(labels[row_mask] >= 0)
+
+
+def test_load_rejects_unknown_version(tmp_path, fitted):
+    processor, clustering = fitted[:2]
+    path = tmp_path / 'model.npz'
+    clustering.export_model(processor.last_state).save(path)
+    with np.load(path) as bundle:
+        arrays = {name: bundle[name] for name in bundle.files}
+    meta = str(arrays['meta'])
+    arrays['meta'] = np.array(meta.replace('"format_version": ', '"format_version": 9'))
+    np.savez(path, **arrays)
+    with pytest.raises(ValueError):
+        ClusterModel.load(path)
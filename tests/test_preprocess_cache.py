@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from data_processing import ConsoleMessages, DataProcessor
+from preprocess_cache import PreprocessCache, dataset_fingerprint
+
+
+class CountingMessages(ConsoleMessages):
+    def __init__(self):
+        super().__init__()
+        self.questions = []
+
+    def askyesno(self, title, message):
+        self.questions.append(title)
+        return title != 'Обработка выбросов'
+
+
+@pytest.fixture
+def dirty(customers):
+    data = customers.copy()
+    data.loc[[5, 6], 'Доход'] = np.nan
+    data.loc[7, 'Покупки'] = 1000.0
+    return data
+
+
+def test_fingerprint_tracks_content_not_index(customers):
+    fingerprint = dataset_fingerprint(customers)
+    assert dataset_fingerprint(customers.copy()) == fingerprint
+    assert dataset_fingerprint(customers.set_axis(customers.index + 100)) == fingerprint
+    changed = customers.copy()
+    changed.loc[10, 'Визиты'] += 1e-9
+    assert dataset_fingerprint(changed) != fingerprint
+    assert dataset_fingerprint(customers.rename(columns={'Визиты': 'Звонки'})) != fingerprint
+    assert dataset_fingerprint(customers.astype({'ID': np.int32})) != fingerprint
+
+
+def test_repeated_call_is_served_from_cache(dirty):
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    first = processor.preprocess_data(dirty, nan_policy='median', outlier_policy='cap')
+    state = processor.last_state
+    second = processor.preprocess_data(dirty.copy(), nan_policy='median', outlier_policy='cap')
+    assert second[0] is first[0] and processor.last_state is state
+    assert processor.preprocess_cache.hits == 1
+    # Кэшированная матрица общая для всех потребителей, поэтому её нельзя изменить
+    with pytest.raises(ValueError):
+        second[0][0, 0] = 0.0
+
+    fresh = DataProcessor(interactive=False, dataset_cache=False).preprocess_data(
+        dirty, nan_policy='median', outlier_policy='cap')
+    assert np.array_equal(fresh[0], first[0]) and np.array_equal(fresh[2], first[2])
+
+
+def test_policies_and_rules_are_cached_separately(dirty):
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    results = {}
+    for nan_policy, outlier_policy, rule in [('median', 'cap', 'zscore'), ('drop', 'cap', 'zscore'),
+                                             ('median', 'remove', 'zscore'), ('median', 'cap', 'iqr')]:
+        results[nan_policy, outlier_policy, rule] = processor.preprocess_data(
+            dirty, nan_policy=nan_policy, outlier_policy=outlier_policy, outlier_rule=rule)
+    assert len(processor.preprocess_cache) == 4 and processor.preprocess_cache.hits == 0
+    assert results['drop', 'cap', 'zscore'][2].sum() == len(dirty) - 2
+    assert results['median', 'remove', 'zscore'][2].sum() < len(dirty)
+
+
+def test_answers_are_asked_once_per_dataset_and_rule(dirty):
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    messages = CountingMessages()
+    processor.preprocess_data(dirty, messages=messages)
+    assert messages.questions == ['Обработка пропущенных значений', 'Обработка выбросов']
+    processor.preprocess_data(dirty.copy(), messages=messages)
+    assert len(messages.questions) == 2 and processor.preprocess_cache.hits == 1
+    processor.preprocess_data(dirty, outlier_rule='mad', messages=messages)
+    assert len(messages.questions) == 4
+
+
+def test_lru_limits_entries_and_bytes():
+    cache = PreprocessCache(max_entries=2)
+    for key in 'abc':
+        cache.put(key, (np.zeros(10), None))
+    assert cache.get('a') is None and cache.get('b') is not None and cache.evictions == 1
+    cache.put('d', (np.zeros(10), None))
+    # 'b' использовался недавно, вытесняется 'c'
+    assert cache.get('c') is None and cache.get('b') is not None
+
+    cache = PreprocessCache(max_entries=10, max_bytes=1000)
+    cache.put('a', (np.zeros(100),))
+    cache.put('b', (np.zeros(100),))
+    assert len(cache) == 1 and cache.get('b') is not None
+    # Единственная запись сохраняется, даже если она больше предела
+    cache.put('c', (np.zeros(1000),))
+    assert len(cache) == 1 and cache.get('c') is not None
+
+
+def test_low_memory_switch_clears_cache(dirty):
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    processor.preprocess_data(dirty, nan_policy='median', outlier_policy='cap')
+    processor.set_low_memory(True)
+    assert len(processor.preprocess_cache) == 0
+    scaled_data, _, _ = processor.preprocess_data(dirty, nan_policy='median', outlier_policy='cap')
+    assert scaled_data.dtype == np.float32
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from clustering import Clustering
+from data_processing import DataProcessor
+from scoring_server import ScoringServer
+
+
+@pytest.fixture
+def wide_customers():
+    rng = np.random.default_rng(3)
+    group = rng.integers(0, 4, 800)
+    centers = rng.normal(scale=6.0, size=(4, 10))
+    values = centers[group] + rng.normal(size=(800, 10))
+    return pd.DataFrame(values, columns=[f'Признак {i}' for i in range(10)])
+
+
+def reduced_model(data, n_components):
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    scaled_data, _, _ = processor.preprocess_data(data, nan_policy='median', outlier_policy='cap')
+    clustering = Clustering()
+    reduced = clustering.reduce_dimensions(scaled_data, 'pca', n_components=n_components)
+    clustering.kmeans_clustering(reduced, 4)
+    return clustering.export_model(processor.last_state, reduction=clustering.reduction)
+
+
+@pytest.mark.parametrize('n_components', [3, 10])
+def test_score_matches_predict_for_reduced_model(wide_customers, n_components):
+    model = reduced_model(wide_customers, n_components)
+    server = ScoringServer(model)
+    labels, distances = server.score(server.parse_rows({'records': wide_customers.to_dict('records')}))
+    expected, expected_distances = model.predict(wide_customers, return_distance=True)
+    assert np.array_equal(labels, expected)
+    assert np.allclose(distances, expected_distances)
+
+
+@pytest.fixture
+def kmeans_model(customers, fitted):
+    processor, clustering = fitted[:2]
+    return clustering.export_model(processor.last_state)
+
+
+def test_parse_rows_accepts_both_layouts(customers, kmeans_model):
+    server = ScoringServer(kmeans_model)
+    head = customers.head(5)
+    from_records = server.parse_rows({'records': head.to_dict('records')})
+    # Порядок столбцов в запросе не важен, лишние столбцы отбрасываются
+    columns = list(reversed(head.columns))
+    from_rows = server.parse_rows({'columns': columns, 'rows': head[columns].values.tolist()})
+    assert from_records.shape == (5, len(kmeans_model.columns))
+    assert np.array_equal(from_records, from_rows)
+    assert np.array_equal(from_records, head[kmeans_model.columns].to_numpy())
+
+
+def test_parse_rows_rejects_missing_columns(customers, kmeans_model):
+    server = ScoringServer(kmeans_model)
+    with pytest.raises(ValueError):
+        server.parse_rows({'records': customers[['ID', 'Доход']].head(2).to_dict('records')})
+
+
+def test_score_marks_unscorable_rows(customers, kmeans_model):
+    server = ScoringServer(kmeans_model)
+    matrix = server.parse_rows({'records': customers.head(20).to_dict('records')})
+    matrix[3, 0] = np.nan
+    labels, distances = server.score(matrix)
+    # В обучающих данных пропусков не было, значения для заполнения не сохранены
+    assert labels[3] == -1 and np.isnan(distances[3])
+    assert np.all(np.delete(labels, 3) >= 0)
+    assert np.array_equal(labels, kmeans_model.predict(customers.head(20).assign(Доход=matrix[:, 0])))
+
+
+def test_concurrent_requests_share_one_batch(customers, kmeans_model):
+    server = ScoringServer(kmeans_model, max_batch=10000, max_wait=0.2)
+    parts = [customers.iloc[start:start + 50] for start in range(0, 200, 50)]
+
+    async def run():
+        server._queue = asyncio.Queue()
+        batcher = asyncio.create_task(server.batch_loop())
+        results = await asyncio.gather(*[
+            server.handle_predict(json.dumps({'records': part.to_dict('records')})) for part in parts
+        ])
+        batcher.cancel()
+        return results
+
+    results = asyncio.run(run())
+    assert server.stats.batches == 1 and server.stats.batch_sizes[0] == 200
+    assert server.stats.requests == 4 and server.stats.rows == 200
+    # Каждый запрос получает метки своих строк
+    for part, result in zip(parts, results):
+        assert result['labels'] == kmeans_model.predict(part).tolist()
+
+
+def test_full_batch_closes_without_waiting(customers, kmeans_model):
+    server = ScoringServer(kmeans_model, max_batch=100, max_wait=10.0)
+
+    async def run():
+        server._queue = asyncio.Queue()
+        batcher = asyncio.create_task(server.batch_loop())
+        result = await asyncio.wait_for(server.submit(server.parse_rows({'records': customers.to_dict('records')})), 5)
+        batcher.cancel()
+        return result
+
+    labels, _ = asyncio.run(run())
+    assert np.array_equal(labels, kmeans_model.predict(customers))
+
+
+def test_predict_over_http(tmp_path, customers, kmeans_model):
+    server = ScoringServer(kmeans_model)
+    socket_path = str(tmp_path / 'scoring.sock')
+
+    async def request(reader, writer, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return status, json.loads(await reader.readexactly(int(headers['content-length'])))
+
+    async def run():
+        serving = asyncio.create_task(server.serve(unix_socket=socket_path))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        responses = [
+            await request(reader, writer, 'GET', '/health'),
+            await request(reader, writer, 'POST', '/predict', {'records': customers.head(30).to_dict('records')}),
+            await request(reader, writer, 'POST', '/predict', {'records': [{'Доход': 1.0}]}),
+            await request(reader, writer, 'GET', '/stats'),
+        ]
+        writer.close()
+        serving.cancel()
+        return responses
+
+    (health, predicted, bad, stats) = asyncio.run(run())
+    assert health == (200, {'status': 'ok', 'model': 'kmeans', 'columns': kmeans_model.columns})
+    assert predicted[0] == 200
+    assert predicted[1]['labels'] == kmeans_model.predict(customers.head(30)).tolist()
+    assert bad[0] == 400 and 'error' in bad[1]
+    assert stats[0] == 200 and stats[1]['requests'] == 1 and stats[1]['errors'] == 1
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sklearn.metrics import silhouette_samples
+
+from silhouette import SilhouetteEngine
+
+
+@pytest.fixture
+def overlapping():
+    # Перекрывающиеся группы: значения силуэта заметно разбросаны
+    rng = np.random.default_rng(1)
+    clusters = rng.integers(0, 4, 3000)
+    data = rng.normal(size=(3000, 5)) + clusters[:, None] * 1.5
+    return data, clusters
+
+
+def test_exact_chunks_match_sklearn(overlapping):
+    data, clusters = overlapping
+    data, clusters = data[:700], clusters[:700]
+    # Порции и блоки не кратны числу строк, последние порции неполные
+    engine = SilhouetteEngine(chunk_size=97, block_size=61, n_jobs=1)
+    np.testing.assert_allclose(engine.exact_samples(data, clusters), silhouette_samples(data, clusters), atol=1e-10)
+
+
+def test_parallel_exact_matches_serial(overlapping):
+    data, clusters = overlapping
+    serial = SilhouetteEngine(chunk_size=256, n_jobs=1).exact_score(data, clusters)
+    parallel = SilhouetteEngine(chunk_size=256, n_jobs=2).exact_score(data, clusters)
+    assert parallel == pytest.approx(serial, abs=1e-12)
+
+
+def test_singleton_cluster_scores_zero():
+    data = np.array([[0.0, 0.0], [0.1, 0.0], [0.0, 0.1], [5.0, 5.0]])
+    clusters = np.array([0, 0, 0, 1])
+    values = SilhouetteEngine(n_jobs=1).exact_samples(data, clusters)
+    np.testing.assert_allclose(values, silhouette_samples(data, clusters))
+    assert values[3] == 0.0
+
+
+def test_sampled_interval_covers_exact_score(overlapping):
+    data, clusters = overlapping
+    exact = SilhouetteEngine(n_jobs=1).exact_score(data, clusters)
+    covered = 0
+    for seed in range(20):
+        result = SilhouetteEngine(n_jobs=1, random_state=seed).sampled(data, clusters, sample_size=600)
+        low, high = result['ci']
+        assert low < result['score'] < high
+        covered += low <= exact <= high
+        assert not result['exact']
+    # Номинальное покрытие 95%; допускаем случайные промахи
+    assert covered >= 17
+
+
+def test_stratified_sample_keeps_small_clusters():
+    clusters = np.array([0] * 5000 + [1] * 30 + [2] * 1000)
+    engine = SilhouetteEngine(n_jobs=1)
+    labels, counts, indices = engine.stratified_sample(clusters, 600, min_per_cluster=50)
+    sizes = [len(idx) for idx in indices]
+    assert list(labels) == [0, 1, 2] and list(counts) == [5000, 30, 1000]
+    # Малый кластер берётся целиком, остальные — пропорционально размеру
+    assert sizes == [498, 30, 100]
+    for c, idx in enumerate(indices):
+        assert (clusters[idx] == c).all() and len(np.unique(idx)) == len(idx)
+
+
+def test_estimate_switches_to_sampling_above_threshold(overlapping):
+    data, clusters = overlapping
+    engine = SilhouetteEngine(n_jobs=1)
+    exact = engine.estimate(data, clusters, exact_threshold=len(data))
+    assert exact['exact'] and exact['ci'][0] == exact['ci'][1] == exact['score']
+    assert sum(exact['cluster_sizes'].values()) == len(data)
+    sampled = engine.estimate(data, clusters, exact_threshold=1000, sample_size=800)
+    assert not sampled['exact'] and sampled['sample_size'] < len(data)
+    assert sampled['score'] == pytest.approx(exact['score'], abs=0.05)
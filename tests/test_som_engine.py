@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from som_engine import BatchSOM
+
+
+def brute_force(data, weights):
+    distances = np.linalg.norm(data[:, None, :] - weights[None, :, :], axis=2)
+    order = np.argsort(distances, axis=1, kind='stable')
+    return order[:, 0], order[:, 1], distances[np.arange(len(data)), order[:, 0]]
+
+
+@pytest.fixture
+def som_and_data():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(1000, 4))
+    som = BatchSOM(5, 6, chunk_size=128)
+    som.weights = rng.normal(size=(som.n_nodes, 4))
+    return som, data
+
+
+def test_vectorized_bmu_matches_brute_force(som_and_data):
+    som, data = som_and_data
+    first, second, distances = brute_force(data, som.weights)
+    np.testing.assert_array_equal(som.bmu(data), first)
+    got_first, got_second, got_distances = som.bmu(data, return_second=True)
+    np.testing.assert_array_equal(got_first, first)
+    np.testing.assert_array_equal(got_second, second)
+    np.testing.assert_allclose(got_distances, distances, atol=1e-9)
+
+
+def test_errors_match_definitions(som_and_data):
+    som, data = som_and_data
+    first, second, distances = brute_force(data, som.weights)
+    quantization, topographic = som.evaluate(data)
+    assert quantization == pytest.approx(distances.mean())
+    gap = np.abs(som.grid[first] - som.grid[second]).max(axis=1)
+    assert topographic == pytest.approx((gap > 1).mean())
+    np.testing.assert_array_equal(som.positions(data), som.grid[first])
+
+
+def test_single_node_map():
+    data = np.arange(12.0).reshape(6, 2)
+    som = BatchSOM(1, 1).fit(data, epochs=3)
+    np.testing.assert_allclose(som.weights[0], data.mean(axis=0))
+    assert som.topographic_error_ == 0.0
+
+
+def test_fit_reduces_quantization_error(fitted):
+    _, _, scaled_data, _, _ = fitted
+    som = BatchSOM(4, 4)
+    som.initialize(scaled_data)
+    initial, _ = som.evaluate(scaled_data)
+    reported = []
+    som.fit(scaled_data, epochs=8, progress=lambda done, total: reported.append((done, total)))
+    assert som.quantization_error_ < initial
+    assert reported[-1] == (8, 8) and len(reported) == 8
+    # Обучение детерминировано при одинаковом random_state
+    again = BatchSOM(4, 4).fit(scaled_data, epochs=8)
+    np.testing.assert_allclose(again.weights, som.weights)
+
+
+def test_som_clustering_returns_grid_positions(fitted):
+    _, clustering, scaled_data, _, _ = fitted
+    positions = clustering.som_clustering(scaled_data, som_size=4, iterations=5)
+    assert positions.shape == (len(scaled_data), 2)
+    assert positions.min() >= 0 and positions.max() < 4
+    assert len(clustering.last_fit['centers']) == len(np.unique(positions, axis=0))
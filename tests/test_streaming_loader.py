@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing import ID_COLUMNS, DataProcessor
+from streaming_loader import ColumnTypeConflict, StreamingCSVLoader
+
+
+def write_csv(tmp_path, data, name='customers.csv'):
+    path = tmp_path / name
+    data.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def customers_csv(tmp_path, customers):
+    data = customers.assign(Город=np.where(customers['ID'] % 2, 'Москва', 'Казань'))
+    return write_csv(tmp_path, data), data
+
+
+def test_load_matches_full_read(customers_csv):
+    path, data = customers_csv
+    loaded = StreamingCSVLoader(ID_COLUMNS, chunk_size=128).load(path)
+    # Текстовый столбец отбрасывается, идентификатор остаётся на своём месте
+    assert list(loaded.columns) == ['ID', 'Доход', 'Покупки', 'Визиты']
+    assert np.array_equal(loaded['ID'].to_numpy(), data['ID'].to_numpy())
+    features = loaded[['Доход', 'Покупки', 'Визиты']].to_numpy()
+    assert features.dtype == np.float32
+    assert np.allclose(features, data[['Доход', 'Покупки', 'Визиты']].to_numpy(), atol=1e-5)
+
+
+def test_numeric_column_turning_text_fails(tmp_path, customers):
+    data = customers.astype({'Покупки': object})
+    data.loc[500, 'Покупки'] = 'нет данных'
+    path = write_csv(tmp_path, data)
+    with pytest.raises(ColumnTypeConflict, match='Покупки'):
+        StreamingCSVLoader(ID_COLUMNS, chunk_size=128).load(path)
+
+
+def test_conflict_is_reported_by_data_processor(tmp_path, customers):
+    data = customers.astype({'Покупки': object})
+    data.loc[500, 'Покупки'] = 'нет данных'
+    path = write_csv(tmp_path, data)
+    processor = DataProcessor(interactive=False, dataset_cache=False)
+    processor.streaming_loader.chunk_size = 128
+    assert processor.load_data(path, streaming=True) is None
+    assert 'Покупки' in processor.messagebox.errors[0]
+
+
+def test_mixed_column_coercions_are_counted(tmp_path, customers):
+    data = customers.astype({'Визиты': object})
+    # Нечисловые значения есть уже в первой порции: столбец смешанный, они заменяются пропусками
+    data.loc[[3, 200, 450], 'Визиты'] = '?'
+    path = write_csv(tmp_path, data)
+    loader = StreamingCSVLoader(ID_COLUMNS, chunk_size=128)
+    loaded = loader.load(path)
+    assert loader.last_coerced == {'Визиты': 3}
+    assert np.flatnonzero(np.isnan(loaded['Визиты'].to_numpy())).tolist() == [3, 200, 450]
+
+
+def test_estimate_rows(customers_csv):
+    path, data = customers_csv
+    loader = StreamingCSVLoader(ID_COLUMNS)
+    assert loader.estimate_rows(path) == len(data)
+    assert abs(loader.estimate_rows(path, sample_lines=50) - len(data)) < 0.1 * len(data)
+
+
+def test_streaming_kmeans_checks_types(tmp_path, customers):
+    from clustering import Clustering
+
+    data = customers.astype({'Покупки': object})
+    data.loc[500, 'Покупки'] = 'нет данных'
+    path = write_csv(tmp_path, data)
+    with pytest.raises(ColumnTypeConflict):
+        Clustering().streaming_kmeans_clustering(path, 3, StreamingCSVLoader(ID_COLUMNS, chunk_size=128))
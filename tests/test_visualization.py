@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from benchmarks.run_benchmarks import OffscreenFigures
+from visualization import Visualization
+
+
+@pytest.fixture
+def visualization():
+    visualization = Visualization(scatter_threshold=1000, density_threshold=5000)
+    visualization.figures = OffscreenFigures()
+    return visualization
+
+
+def drawn_axes(visualization):
+    (canvas,) = visualization.figures.canvases.values()
+    canvas.draw()
+    return canvas.figure.axes[0]
+
+
+def test_stratified_sample_keeps_small_clusters(visualization):
+    clusters = np.repeat([0, 1, 2], [100000, 5000, 20])
+    rows = visualization.stratified_sample(clusters, 1000, min_per_cluster=50)
+    assert np.all(np.diff(rows) > 0)
+    counts = np.bincount(clusters[rows])
+    # Крупные кластеры — пропорционально размеру, малый — целиком
+    assert counts[0] == pytest.approx(952, abs=2) and counts[1] == 50 and counts[2] == 20
+
+
+def test_density_image_matches_dense_count(visualization):
+    rng = np.random.default_rng(0)
+    projection = rng.normal(size=(20000, 2)).astype(np.float32)
+    codes = (projection[:, 0] > 0).astype(np.int64) + 2 * (rng.random(20000) < 0.1)
+    colors = visualization.cluster_colors(np.arange(4))
+    fig, ax = visualization.new_axes('frame', 'canvas')
+    visualization.density_image(ax, projection, codes, colors, bins=20)
+    image = ax.images[0].get_array().reshape(400, 4)
+
+    # Плотная таблица ячейки × кластеры как эталон
+    x_edges = np.linspace(projection[:, 0].min(), projection[:, 0].max(), 21)
+    y_edges = np.linspace(projection[:, 1].min(), projection[:, 1].max(), 21)
+    x_bins = np.clip(np.searchsorted(x_edges, projection[:, 0], side='right') - 1, 0, 19)
+    y_bins = np.clip(np.searchsorted(y_edges, projection[:, 1], side='right') - 1, 0, 19)
+    table = np.zeros((400, 4), dtype=int)
+    np.add.at(table, (y_bins * 20 + x_bins, codes), 1)
+    occupied = table.sum(axis=1) > 0
+    assert np.allclose(image[occupied, :3], colors[table[occupied].argmax(axis=1), :3])
+    assert np.all(image[~occupied, 3] == 0)
+
+
+@pytest.mark.parametrize('rows, kind', [(500, 'scatter'), (3000, 'sample'), (20000, 'density')])
+def test_cluster_plot_mode_follows_size(visualization, rows, kind):
+    rng = np.random.default_rng(1)
+    projection = rng.normal(size=(rows, 2))
+    clusters = rng.integers(0, 4, rows)
+    visualization.visualize_clusters(None, clusters, ['a', 'b'], 'frame', 'canvas', projection=projection)
+    ax = drawn_axes(visualization)
+    if kind == 'density':
+        assert len(ax.images) == 1 and not ax.collections
+    else:
+        expected = rows if kind == 'scatter' else 1000
+        assert abs(len(ax.collections[0].get_offsets()) - expected) <= 4
+
+
+def test_som_plot_draws_one_marker_per_node(visualization):
+    rng = np.random.default_rng(2)
+    positions = rng.integers(0, 6, (20000, 2))
+    _, clusters = np.unique(positions, axis=0, return_inverse=True)
+    clusters = clusters.ravel()
+    visualization.visualize_som(positions, clusters, 6, 'frame', 'canvas')
+    markers = drawn_axes(visualization).collections[0]
+    offsets = markers.get_offsets()
+    assert len(offsets) == len(np.unique(positions, axis=0))
+    # Площадь маркера растёт с числом строк в узле
+    counts = np.bincount(positions[:, 0] * 6 + positions[:, 1], minlength=36)
+    nodes = ((offsets[:, 0] - 0.5) * 6 + (offsets[:, 1] - 0.5)).astype(int)
+    assert np.array_equal(np.argsort(markers.get_sizes(), kind='stable'), np.argsort(counts[nodes], kind='stable'))
+
+
+def test_small_som_plot_keeps_every_row(visualization):
+    positions = np.random.default_rng(3).integers(0, 4, (300, 2))
+    visualization.visualize_som(positions, positions[:, 0], 4, 'frame', 'canvas')
+    assert len(drawn_axes(visualization).collections[0].get_offsets()) == 300
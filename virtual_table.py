@@ -0,0 +1,191 @@
+import numpy as np
+import ttkbootstrap as ttk
+
+from instrumentation import TRACER
+from lazy_import import LazyModule
+
+# pandas нужен только после загрузки данных
+pd = LazyModule('pandas')
+
+
+class TableModel:
+    """
+    Источник строк для виртуальной таблицы.
+
+    Хранит ссылку на DataFrame или массив NumPy и отдаёт только запрошенное
+    окно строк. row_index задаёт подмножество/порядок строк источника,
+    extra_columns — дополнительные столбцы (например, метки кластеров),
+    которые присоединяются к строкам только при отображении.
+    """
+
+    def __init__(self, data, columns=None, row_index=None, extra_columns=None):
+        self.data = data
+        if isinstance(data, pd.DataFrame):
+            self.base_columns = list(data.columns)
+        elif columns is not None:
+            self.base_columns = list(columns)
+        else:
+            self.base_columns = [f"Столбец {i}" for i in range(np.asarray(data).shape[1])]
+        self.row_index = None if row_index is None else np.asarray(row_index)
+        self.extra_columns = dict(extra_columns or {})
+        self.columns = self.base_columns + list(self.extra_columns)
+
+    def __len__(self):
+        if self.row_index is not None:
+            return len(self.row_index)
+        return len(self.data)
+
+    def rows(self, start, stop):
+        """
+        Возвращает строки [start, stop) в виде списков значений.
+        """
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+        return self.take(np.arange(start, stop))
+
+    def take(self, positions):
+        """
+        Возвращает строки с указанными номерами (в нумерации модели).
+        """
+        positions = np.asarray(positions)
+        source_positions = positions if self.row_index is None else self.row_index[positions]
+        if isinstance(self.data, pd.DataFrame):
+            window = self.data.iloc[source_positions].to_numpy(dtype=object)
+        else:
+            window = np.asarray(self.data[source_positions], dtype=object)
+        if self.extra_columns:
+            # Дополнительные столбцы выровнены со строками модели
+            extras = [np.asarray(values[positions], dtype=object).reshape(-1, 1) for values in self.extra_columns.values()]
+            window = np.hstack([window] + extras)
+        return window.tolist()
+
+    def column_widths(self, sample_size=200, char_width=10, max_width=200):
+        """
+        Ширина столбцов по выборке строк, а не по всему столбцу.
+        """
+        n = len(self)
+        if n == 0:
+            return {col: len(str(col)) * char_width for col in self.columns}
+        positions = np.unique(np.linspace(0, n - 1, min(sample_size, n)).astype(int))
+        sample = self.take(positions)
+        widths = {}
+        for j, col in enumerate(self.columns):
+            longest = max(len(str(row[j])) for row in sample)
+            widths[col] = min(max(longest, len(str(col))) * char_width, max_width)
+        return widths
+
+
+class VirtualTable(ttk.Frame):
+    """
+    Таблица на основе ttk.Treeview, которая создаёт элементы только для
+    видимого окна строк и подгружает данные из модели при прокрутке.
+    Стоимость отображения не зависит от количества строк.
+    """
+
+    def __init__(self, master, row_height=20, **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = None
+        self.offset = 0
+        self.row_height = row_height
+        self.page_size = 30
+
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill='both', expand=True)
+
+        self.treeview = ttk.Treeview(tree_frame, show="headings", height=self.page_size)
+        self.treeview.pack(side='left', fill='both', expand=True)
+
+        # Вертикальная прокрутка управляет смещением окна, а не самим Treeview
+        self.scrollbar_y = ttk.Scrollbar(tree_frame, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar_y.pack(side='right', fill='y')
+
+        self.scrollbar_x = ttk.Scrollbar(self, orient="horizontal", command=self.treeview.xview)
+        self.scrollbar_x.pack(side='bottom', fill='x')
+        self.treeview.configure(xscroll=self.scrollbar_x.set)
+
+        self.treeview.bind("<Configure>", self.on_resize)
+        self.treeview.bind("<MouseWheel>", self.on_mousewheel)
+        self.treeview.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.treeview.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.treeview.bind("<Prior>", lambda event: self.scroll_by(-self.page_size))
+        self.treeview.bind("<Next>", lambda event: self.scroll_by(self.page_size))
+        self.treeview.bind("<Home>", lambda event: self.scroll_to(0))
+        self.treeview.bind("<End>", lambda event: self.scroll_to(len(self.model) if self.model is not None else 0))
+
+    def set_model(self, model):
+        with TRACER.span('VirtualTable.set_model', rows=len(model)):
+            self.model = model
+            self.offset = 0
+            treeview = self.treeview
+            treeview.delete(*treeview.get_children())
+            treeview["columns"] = model.columns
+            for col, width in model.column_widths().items():
+                treeview.heading(col, text=col)
+                treeview.column(col, width=width, minwidth=100, stretch=True)
+            self.refresh()
+
+    def clear(self):
+        self.model = None
+        self.treeview.delete(*self.treeview.get_children())
+        self.treeview["columns"] = []
+        self.scrollbar_y.set(0.0, 1.0)
+
+    def refresh(self):
+        treeview = self.treeview
+        if self.model is None:
+            return
+        rows = self.model.rows(self.offset, self.offset + self.page_size)
+        items = treeview.get_children()
+        # Повторно используем существующие элементы, лишние удаляем
+        for i, row in enumerate(rows):
+            if i < len(items):
+                treeview.item(items[i], values=row)
+            else:
+                treeview.insert("", "end", values=row)
+        if len(items) > len(rows):
+            treeview.delete(*items[len(rows):])
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        n = len(self.model) if self.model is not None else 0
+        if n == 0:
+            self.scrollbar_y.set(0.0, 1.0)
+            return
+        first = self.offset / n
+        last = min(1.0, (self.offset + self.page_size) / n)
+        self.scrollbar_y.set(first, last)
+
+    def scroll_to(self, offset):
+        if self.model is None:
+            return
+        max_offset = max(0, len(self.model) - self.page_size)
+        offset = int(min(max(offset, 0), max_offset))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if self.model is None:
+            return
+        if action == 'moveto':
+            self.scroll_to(float(value) * len(self.model))
+        elif action == 'scroll':
+            step = self.page_size if unit == 'pages' else 1
+            self.scroll_by(int(value) * step)
+
+    def on_mousewheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def on_resize(self, event):
+        # Количество видимых строк определяется высотой виджета
+        page_size = max(1, event.height // self.row_height - 1)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            if self.model is not None:
+                self.offset = int(min(self.offset, max(0, len(self.model) - page_size)))
+                self.refresh()
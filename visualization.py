@@ -1,91 +1,297 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
 from sklearn.decomposition import PCA
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
 import numpy as np
-from sklearn.metrics import silhouette_samples
+from silhouette import SilhouetteEngine
+from instrumentation import traced
 import ttkbootstrap as ttk  # Добавлен импорт ttk
 
 
+class FigureManager:
+    """
+    Одна постоянная фигура и холст на каждое место вывода (вкладка + имя атрибута).
+
+    Фигуры создаются через matplotlib.figure.Figure, а не pyplot, поэтому не попадают
+    в глобальный реестр pyplot и освобождаются вместе с холстом. Перед новым
+    графиком фигура очищается и перерисовывается, новые холсты не создаются.
+    """
+
+    def __init__(self, figsize=(10, 8)):
+        self.figsize = figsize
+        self.canvases = {}
+
+    def axes(self, frame, canvas_attr):
+        canvas = self.canvases.get((frame, canvas_attr))
+        if canvas is None:
+            # Холст, созданный в обход менеджера, освобождается
+            retired = getattr(frame, canvas_attr, None)
+            if retired is not None:
+                self.destroy_canvas(retired)
+            canvas = FigureCanvasTkAgg(Figure(figsize=self.figsize), master=frame)
+            canvas.get_tk_widget().pack()
+            self.canvases[(frame, canvas_attr)] = canvas
+            setattr(frame, canvas_attr, canvas)
+        fig = canvas.figure
+        fig.clear()
+        return fig, fig.add_subplot()
+
+    def draw(self, frame, canvas_attr):
+        self.canvases[(frame, canvas_attr)].draw()
+
+    def destroy_canvas(self, canvas):
+        canvas.figure.clear()
+        canvas.get_tk_widget().destroy()
+
+    def release(self, frame, canvas_attr):
+        canvas = self.canvases.pop((frame, canvas_attr), None)
+        if canvas is not None:
+            self.destroy_canvas(canvas)
+            delattr(frame, canvas_attr)
+
+    def release_all(self):
+        for frame, canvas_attr in list(self.canvases):
+            self.release(frame, canvas_attr)
+
+
 class Visualization:
+    def __init__(self, scatter_threshold=20000, density_threshold=1000000, pca_sample_size=200000):
+        self.silhouette_engine = SilhouetteEngine()
+        # До scatter_threshold точек рисуются все, до density_threshold — выборка по кластерам,
+        # выше — изображение плотности по ячейкам
+        self.scatter_threshold = scatter_threshold
+        self.density_threshold = density_threshold
+        self.pca_sample_size = pca_sample_size
+        self._projection_source = None
+        self._projection = None
+        self.figures = FigureManager()
+
+    def new_axes(self, frame, canvas_attr):
+        # Очищенная постоянная фигура места вывода и новые оси на ней
+        return self.figures.axes(frame, canvas_attr)
+
     def display_plot(self, fig, frame, canvas_attr):
-        if hasattr(frame, canvas_attr):
-            getattr(frame, canvas_attr).get_tk_widget().pack_forget()
-        canvas = FigureCanvasTkAgg(fig, master=frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
-        setattr(frame, canvas_attr, canvas)
-
-    def visualize_clusters(self, scaled_data, clusters, columns, frame, canvas_attr):
-        pca = PCA(n_components=2)
-        principal_components = pca.fit_transform(scaled_data)
-        df = pd.DataFrame(data=principal_components, columns=['PC1', 'PC2'])
-        df['Cluster'] = clusters
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.scatterplot(data=df, x='PC1', y='PC2', hue='Cluster', palette='Set2', ax=ax)
-        ax.set_title('Кластеризация клиентов')
+        self.figures.draw(frame, canvas_attr)
+
+    @traced('Visualization.project')
+    def project(self, scaled_data, chunk_size=100000, reduction=None):
+        """
+        Двумерная проекция (рандомизированный PCA), вычисляется один раз для набора данных.
+        PCA обучается на случайной выборке строк, проекция всех строк считается порциями.
+        Если scaled_data уже получены снижением размерности через PCA (reduction),
+        первые два столбца и есть главные компоненты, и PCA заново не обучается.
+        """
+        if self._projection_source is scaled_data:
+            return self._projection
+        if reduction is not None and reduction.is_pca and scaled_data.shape[1] >= 2:
+            self._projection_source = scaled_data
+            self._projection = np.asarray(scaled_data[:, :2], dtype=np.float32)
+            return self._projection
+        rng = np.random.default_rng(42)
+        if len(scaled_data) > self.pca_sample_size:
+            sample = scaled_data[np.sort(rng.choice(len(scaled_data), self.pca_sample_size, replace=False))]
+        else:
+            sample = scaled_data
+        pca = PCA(n_components=2, svd_solver='randomized', random_state=42).fit(sample)
+        projection = np.empty((len(scaled_data), 2), dtype=np.float32)
+        for start in range(0, len(scaled_data), chunk_size):
+            projection[start:start + chunk_size] = pca.transform(scaled_data[start:start + chunk_size])
+        self._projection_source = scaled_data
+        self._projection = projection
+        return projection
+
+    def stratified_sample(self, clusters, max_points, min_per_cluster=50, random_state=42):
+        """
+        Позиции строк для отрисовки: из каждого кластера доля, пропорциональная его размеру,
+        но не меньше min_per_cluster точек, чтобы малые кластеры оставались видны.
+        """
+        rng = np.random.default_rng(random_state)
+        _, codes, sizes = np.unique(clusters, return_inverse=True, return_counts=True)
+        quotas = np.minimum(sizes, np.maximum(min_per_cluster, (sizes * max_points / len(clusters)).astype(int)))
+        # Случайный ключ внутри кластера: берутся строки с наименьшими ключами
+        order = np.lexsort((rng.random(len(clusters)), codes.ravel()))
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        rank = np.arange(len(clusters)) - np.repeat(starts, sizes)
+        return np.sort(order[rank < np.repeat(quotas, sizes)])
+
+    def cluster_colors(self, labels):
+        cmap = colormaps.get_cmap('tab10' if len(labels) <= 10 else 'tab20')
+        colors = np.array([cmap(i % cmap.N) for i in range(len(labels))])
+        colors[np.asarray(labels) == -1] = (0.6, 0.6, 0.6, 1.0)  # Шум DBSCAN — серым
+        return colors
+
+    def density_image(self, ax, projection, codes, colors, bins=300):
+        # Цвет ячейки — преобладающий в ней кластер, прозрачность — логарифм числа точек
+        x, y = projection[:, 0], projection[:, 1]
+        x_edges = np.linspace(x.min(), x.max(), bins + 1)
+        y_edges = np.linspace(y.min(), y.max(), bins + 1)
+        x_bins = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, bins - 1)
+        y_bins = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, bins - 1)
+        cells = y_bins.astype(np.int64) * bins + x_bins
+        totals = np.bincount(cells, minlength=bins * bins)
+        # Счётчики только для встречающихся пар (ячейка, кластер): плотная таблица ячейки × кластеры
+        # при тысячах кластеров DBSCAN или узлов SOM занимала бы гигабайты
+        n_labels = len(colors)
+        pairs, pair_counts = np.unique(cells * n_labels + codes, return_counts=True)
+        pair_cells, pair_codes = pairs // n_labels, pairs % n_labels
+        # Последняя пара каждой ячейки после сортировки — самый частый кластер (при равенстве — меньший номер)
+        order = np.lexsort((-pair_codes, pair_counts, pair_cells))
+        sorted_cells = pair_cells[order]
+        last = np.flatnonzero(np.append(sorted_cells[1:] != sorted_cells[:-1], True))
+        image = np.zeros((bins * bins, 4))
+        image[sorted_cells[last]] = colors[pair_codes[order][last]]
+        image[:, 3] = np.log1p(totals) / np.log1p(totals.max())
+        ax.imshow(image.reshape(bins, bins, 4), origin='lower', aspect='auto',
+                  extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]), interpolation='nearest')
+
+    @traced('Visualization.visualize_clusters')
+    def visualize_clusters(self, scaled_data, clusters, columns, frame, canvas_attr, mode='auto', reduction=None,
+                           projection=None):
+        """
+        Диаграмма рассеяния кластеров в координатах двух главных компонент.
+        mode: 'scatter' — все точки, 'sample' — стратифицированная выборка по кластерам,
+        'density' — изображение плотности; 'auto' — выбор по числу точек.
+        reduction — проекция, которой получены scaled_data (см. project);
+        projection — готовые координаты (например, посчитанные в фоновой задаче).
+        """
+        if projection is None:
+            projection = self.project(scaled_data, reduction=reduction)
+        clusters = np.asarray(clusters)
+        labels, codes = np.unique(clusters, return_inverse=True)
+        codes = codes.ravel()
+        colors = self.cluster_colors(labels)
+        if mode == 'auto':
+            if len(clusters) <= self.scatter_threshold:
+                mode = 'scatter'
+            elif len(clusters) <= self.density_threshold:
+                mode = 'sample'
+            else:
+                mode = 'density'
+
+        fig, ax = self.new_axes(frame, canvas_attr)
+        title = 'Кластеризация клиентов'
+        if mode == 'density':
+            self.density_image(ax, projection, codes, colors)
+            title += f' (плотность, {len(clusters)} точек)'
+        else:
+            rows = slice(None)
+            if mode == 'sample':
+                rows = self.stratified_sample(clusters, self.scatter_threshold)
+                title += f' (выборка {len(rows)} из {len(clusters)} точек)'
+            ax.scatter(projection[rows, 0], projection[rows, 1], c=colors[codes[rows]], s=12, linewidths=0)
+        if len(labels) <= 20:
+            ax.legend(handles=[Patch(color=colors[i], label=str(label)) for i, label in enumerate(labels)],
+                      title='Cluster', loc='best')
+        ax.set_xlabel('PC1')
+        ax.set_ylabel('PC2')
+        ax.set_title(title)
         self.display_plot(fig, frame, canvas_attr)
 
+    @traced('Visualization.plot_elbow_method')
     def plot_elbow_method(self, K, inertia, frame, canvas_attr):
-        fig, ax1 = plt.subplots(figsize=(10, 8))
+        fig, ax1 = self.new_axes(frame, canvas_attr)
         ax1.plot(K, inertia, 'bx-', label='Inertia (Метод локтя)')
         ax1.set_xlabel('Количество кластеров')
         ax1.set_ylabel('Inertia')
         ax1.set_title('Метод локтя')
         self.display_plot(fig, frame, canvas_attr)
 
-    def visualize_som(self, positions, clusters, som_size, frame, canvas_attr):
-        fig, ax = plt.subplots(figsize=(10, 8))
-        x = [pos[0] + 0.5 for pos in positions]
-        y = [pos[1] + 0.5 for pos in positions]
-        scatter = ax.scatter(x, y, c=clusters, cmap='tab20', s=50, alpha=0.7)
+    @traced('Visualization.plot_k_distance')
+    def plot_k_distance(self, k_distances, k, suggested_eps, frame, canvas_attr):
+        fig, ax = self.new_axes(frame, canvas_attr)
+        ax.plot(np.arange(len(k_distances)), k_distances, 'b-')
+        ax.axhline(suggested_eps, color="red", linestyle="--", label=f'Рекомендуемое eps = {suggested_eps:.4f}')
+        ax.set_xlabel('Точки, отсортированные по расстоянию')
+        ax.set_ylabel(f'Расстояние до {k}-го соседа')
+        ax.set_title('k-distance график для выбора eps')
+        ax.legend()
+        self.display_plot(fig, frame, canvas_attr)
+
+    @traced('Visualization.visualize_som')
+    def visualize_som(self, positions, clusters, som_size, frame, canvas_attr, mode='auto'):
+        """
+        Распределение строк по узлам карты SOM.
+        mode: 'scatter' — точка на каждую строку; 'density' — один маркер на занятый узел,
+        площадь пропорциональна числу строк в узле; 'auto' — выбор по числу строк.
+        """
+        fig, ax = self.new_axes(frame, canvas_attr)
+        positions = np.asarray(positions)
+        clusters = np.asarray(clusters)
+        if mode == 'auto':
+            mode = 'scatter' if len(clusters) <= self.scatter_threshold else 'density'
+        title = 'Распределение данных на карте SOM'
+        color_range = {'vmin': clusters.min(), 'vmax': clusters.max()} if len(clusters) else {}
+        if mode == 'density':
+            # Все строки узла лежат в одной точке: рисуются только занятые узлы, без O(n) маркеров
+            nodes = positions[:, 0].astype(np.int64) * som_size + positions[:, 1].astype(np.int64)
+            counts = np.bincount(nodes, minlength=som_size * som_size)
+            node_labels = np.zeros(som_size * som_size, dtype=clusters.dtype)
+            node_labels[nodes] = clusters
+            occupied = np.flatnonzero(counts)
+            sizes = 20 + 400 * np.sqrt(counts[occupied] / counts.max())
+            ax.scatter(occupied // som_size + 0.5, occupied % som_size + 0.5, c=node_labels[occupied], cmap='tab20',
+                       s=sizes, alpha=0.7, **color_range)
+            title += f' ({len(clusters)} строк, {len(occupied)} узлов)'
+        else:
+            ax.scatter(positions[:, 0] + 0.5, positions[:, 1] + 0.5, c=clusters, cmap='tab20', s=50, alpha=0.7,
+                       **color_range)
         ax.set_xlim([0, som_size])
         ax.set_ylim([0, som_size])
-        ax.set_title('Распределение данных на карте SOM')
+        ax.set_title(title)
         ax.invert_yaxis()
         self.display_plot(fig, frame, canvas_attr)
 
-    def plot_silhouette(self, scaled_data, clusters, frame, canvas_attr):
-        cluster_labels = np.unique(clusters)
-        n_clusters = cluster_labels.shape[0]
-
-        silhouette_vals = silhouette_samples(scaled_data, clusters)
-        y_lower, y_upper = 0, 0
+    @traced('Visualization.plot_silhouette')
+    def plot_silhouette(self, scaled_data, clusters, frame, canvas_attr, silhouette=None):
+        # Распределения значений силуэта по кластерам: точные для небольших данных, выборочные для больших
+        if silhouette is None:
+            silhouette = self.silhouette_engine.estimate(scaled_data, clusters)
+        cluster_labels = list(silhouette['per_cluster'])
+        y_lower = 0
         yticks = []
 
-        fig, ax = plt.subplots(figsize=(10, 8))
+        fig, ax = self.new_axes(frame, canvas_attr)
 
-        for i, c in enumerate(cluster_labels):
-            c_silhouette_vals = silhouette_vals[clusters == c]
-            c_silhouette_vals.sort()
-            y_upper += len(c_silhouette_vals)
-            ax.barh(range(y_lower, y_upper), c_silhouette_vals, edgecolor='none', height=1)
+        for c in cluster_labels:
+            c_silhouette_vals = silhouette['per_cluster'][c]
+            # Высота полосы пропорциональна размеру кластера, а не числу точек выборки
+            cluster_size = silhouette['cluster_sizes'][c]
+            y_upper = y_lower + cluster_size
+            y = np.linspace(y_lower, y_upper, len(c_silhouette_vals))
+            ax.fill_betweenx(y, 0, c_silhouette_vals, edgecolor='none', alpha=0.8)
             yticks.append((y_lower + y_upper) / 2)
-            y_lower += len(c_silhouette_vals)
+            y_lower = y_upper
 
-        ax.axvline(silhouette_vals.mean(), color="red", linestyle="--")
+        ax.axvline(silhouette['score'], color="red", linestyle="--")
+        if not silhouette['exact']:
+            low, high = silhouette['ci']
+            ax.axvspan(low, high, color="red", alpha=0.15)
         ax.set_yticks(yticks)
         ax.set_yticklabels(cluster_labels)
         ax.set_ylabel('Кластер')
         ax.set_xlabel('Коэффициент силуэта')
-        ax.set_title('График коэффициентов силуэта для кластеров')
+        if silhouette['exact']:
+            ax.set_title('График коэффициентов силуэта для кластеров')
+        else:
+            ax.set_title(f"График коэффициентов силуэта для кластеров (выборка {silhouette['sample_size']} точек)")
         self.display_plot(fig, frame, canvas_attr)
 
-    def show_cluster_statistics(self, stats):
+    def show_cluster_statistics(self, stats, title="Статистика по кластерам", index_label="Cluster"):
         # Окно с таблицей статистики
         from tkinter import Toplevel
         top = Toplevel()
-        top.title("Статистика по кластерам")
+        top.title(title)
         top.geometry("800x600")
 
         treeview = ttk.Treeview(top)
         treeview.pack(fill='both', expand=True)
 
         treeview["columns"] = list(stats.columns)
-        treeview["show"] = "headings"
+        # Первый столбец дерева — индекс таблицы (номер кластера или название столбца)
+        treeview["show"] = "tree headings"
 
-        treeview.heading("#0", text="Cluster")
+        treeview.heading("#0", text=index_label)
         treeview.column("#0", width=100)
 
         for col in stats.columns: